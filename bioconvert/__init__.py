@@ -51,8 +51,8 @@ def bioconvert_data(filename, where=None):
 
 
 def info():
-    from bioconvert.core.registry import Registry
-    r = Registry()
+    from bioconvert.core.registry import get_registry
+    r = get_registry()
     info = r.get_info()
     converters = [x for x in info.items()]
     data = [info[k] for k,v in info.items()]
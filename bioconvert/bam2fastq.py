@@ -101,10 +101,12 @@ class BAM2FASTQ(ConvBase):
             # Compress the output if required. We do not use compressor
             # since we may have two outputs.
             comp_ext = get_extension(self.outfile, remove_compression=False)
-            if comp_ext in [".gz", ".dsrc", "bz2"]:
+            if comp_ext in ["gz", "dsrc", "bz2"]:
                 from bioconvert.core.utils import compressor
-                compressor("{}_1.{}".format(outbasename, output_ext), comp_ext)
-                compressor("{}_2.{}".format(outbasename, output_ext), comp_ext)
+                compressor("{}_1.{}".format(outbasename, output_ext), comp_ext,
+                           threads=self.threads)
+                compressor("{}_2.{}".format(outbasename, output_ext), comp_ext,
+                           threads=self.threads)
 
     @requires("samtools")
     def _method_samtools(self, *args, **kwargs):
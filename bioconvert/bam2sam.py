@@ -25,7 +25,7 @@
 
 """Convert :term:`SAM` file to :term:`BAM` format"""
 from bioconvert import ConvBase
-from bioconvert.core.decorators import requires
+from bioconvert.core.decorators import requires, streamable
 
 import colorlog
 
@@ -55,6 +55,7 @@ class BAM2SAM(ConvBase):
         super(BAM2SAM, self).__init__(infile, outfile, *args, **kargs)
 
     @requires("samtools")
+    @streamable
     def _method_samtools(self, *args, **kwargs):
         # -S means ignored (input format is auto-detected)
         # -h means include header in SAM output
@@ -22,10 +22,10 @@
 # If not, see <http://www.gnu.org/licenses/>.                             #
 ###########################################################################
 """Convert :term:`BZ2` to :term:`GZ` format"""
-import bz2
-import gzip
+import shutil
 
 from bioconvert import ConvBase
+from bioconvert.core.compression import open_compressed
 from bioconvert.core.decorators import requires, requires_nothing
 
 import colorlog
@@ -65,5 +65,8 @@ class BZ22GZ(ConvBase):
 
     @requires_nothing
     def _method_python(self, *args, **kargs):
-        with bz2.open(self.infile, 'rb') as f, gzip.open(self.outfile, 'wb')as g:
-            g.write(f.read())
+        with open_compressed(self.infile, "rb", self.threads,
+                             compression=".bz2") as f, \
+                open_compressed(self.outfile, "wb", self.threads,
+                                compression=".gz") as g:
+            shutil.copyfileobj(f, g, 1 << 20)
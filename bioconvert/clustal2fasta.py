@@ -27,7 +27,7 @@ from Bio import SeqIO
 
 from bioconvert import ConvBase
 from bioconvert.core.decorators import requires
-from bioconvert.core.decorators import compressor
+from bioconvert.core.decorators import compressor, streamable
 
 _log = colorlog.getLogger(__name__)
 
@@ -55,6 +55,7 @@ class CLUSTAL2FASTA(ConvBase):
 
     @requires(python_library="biopython")
     @compressor
+    @streamable
     def _method_biopython(self, *args, **kwargs):
         """
         Convert :term:`CLUSTAL` interleaved file in :term:`PHYLIP` format.
@@ -66,6 +67,7 @@ class CLUSTAL2FASTA(ConvBase):
 
     @requires("squizz")
     @compressor
+    @streamable
     def _method_squizz(self, *args, **kwargs):
         """
         Convert :term:`CLUSTAL` file in :term:`FASTA` format.
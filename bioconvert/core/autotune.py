@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Machine-specific default methods
+
+The default method of a converter is hardcoded in its class
+(*_default_method*) although the fastest method depends on the machine and
+on the tools installed. :func:`autotune` benchmarks the methods of the
+converters (see :class:`~bioconvert.core.benchmark_suite.BenchmarkSuite`)
+and stores their ranking in a profile of the user config directory, per
+input size bucket. The default method of a converter
+(:attr:`~bioconvert.core.base.ConvBase.default`) is then the best ranked
+method available (see :func:`get_tuned_method`)::
+
+    bioconvert autotune --converters fastq2fasta --sizes 1M 100M
+
+Profiles are stored per node type (system, architecture, CPU model and
+number of CPUs) so that a configuration directory shared by the nodes of
+a cluster holds one ranking per kind of node. The cores allocated to the
+process when a converter was tuned (e.g., by a batch scheduler, see
+:func:`~bioconvert.core.scheduler.get_available_cores`) are stored with
+its ranking but do not change the node type, so that a profile tuned in a
+job applies to the jobs of other sizes on the same nodes. The profile file
+can be set with the BIOCONVERT_AUTOTUNE_PROFILE environment variable.
+"""
+import hashlib
+import json
+import math
+import os
+import time
+
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["autotune", "get_tuned_method", "load_profile", "save_profile",
+           "get_node_type", "reset"]
+
+
+def get_profile_filename():
+    """Return the file of the profiles (None if the configuration directory
+    is not available)"""
+    if os.environ.get("BIOCONVERT_AUTOTUNE_PROFILE"):
+        return os.environ["BIOCONVERT_AUTOTUNE_PROFILE"]
+    from bioconvert import configuration
+    config_dir = configuration.user_config_dir
+    if config_dir is None:
+        return None
+    return os.path.join(config_dir, "autotune.json")
+
+
+def get_node_type():
+    """Return the key and the description of the kind of node
+
+    The node type depends on the CPU model and number of CPUs of the
+    machine, not on the cores allocated to the process.
+    """
+    from bioconvert.core.benchmark_store import get_host_fingerprint
+    host = get_host_fingerprint()
+    node = {x: host[x] for x in ("system", "machine", "cpu", "cpu_count")}
+    key = hashlib.sha256(json.dumps(node, sort_keys=True).encode()).hexdigest()[:16]
+    return key, node
+
+
+# profile loaded from disk and the modification time of the file
+_profile = (None, None)
+
+
+def load_profile(filename=None):
+    """Return the profiles stored in *filename* (defaults to
+    :func:`get_profile_filename`)"""
+    global _profile
+    filename = filename or get_profile_filename()
+    try:
+        mtime = os.path.getmtime(filename)
+    except (OSError, TypeError):
+        return {"nodes": {}}
+    if _profile[0] == (filename, mtime):
+        return _profile[1]
+    try:
+        with open(filename) as fin:
+            profile = json.load(fin)
+    except (OSError, ValueError) as err:
+        _log.warning("autotune profile {} not used: {}".format(filename, err))
+        profile = {"nodes": {}}
+    _profile = ((filename, mtime), profile)
+    return profile
+
+
+def save_profile(profile, filename=None):
+    """Save the *profile* in *filename* (defaults to
+    :func:`get_profile_filename`)"""
+    global _profile
+    filename = filename or get_profile_filename()
+    if filename is None:
+        raise OSError("No configuration directory to save the profile")
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmpfile = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmpfile, "w") as fout:
+        json.dump(profile, fout, sort_keys=True, indent=1)
+    os.replace(tmpfile, filename)
+    _profile = (None, None)
+
+
+def get_tuned_method(converter, available_methods, size=None):
+    """Return the best method of *converter* on this kind of node (None if
+    the converter was not tuned)
+
+    :param str converter: the converter name (e.g., FASTQ2FASTA)
+    :param list available_methods: the methods that can be used. The best
+        ranked available method is returned.
+    :param int size: size of the input in bytes, used to select the size
+        bucket (the bucket of the largest inputs if None)
+    """
+    if os.environ.get("BIOCONVERT_AUTOTUNE_PROFILE") == "0":
+        return None
+    nodes = load_profile().get("nodes")
+    if not nodes:
+        return None
+    key, _ = get_node_type()
+    tuned = nodes.get(key, {}).get("converters", {}).get(converter)
+    if not tuned:
+        return None
+    buckets = tuned["buckets"]
+    bucket = buckets[-1]
+    if size is not None:
+        for candidate in buckets:
+            if candidate["max_size"] is None or size <= candidate["max_size"]:
+                bucket = candidate
+                break
+    for method in bucket["ranking"]:
+        if method in available_methods:
+            return method
+    return None
+
+
+def get_buckets(sizes):
+    """Return the upper bound of the size bucket of each size (the
+    geometric mean with the next size, None for the last one)"""
+    sizes = sorted(sizes)
+    return [int(math.sqrt(a * b)) for a, b in zip(sizes, sizes[1:])] + [None]
+
+
+def autotune(converters=None, sizes=("10M",), N=3, methods=None,
+             cache_mode="warm", filename=None):
+    """Benchmark the methods of *converters* and store their ranking
+
+    :param list converters: names of the converters to tune (defaults to
+        all converters, see
+        :class:`~bioconvert.core.benchmark_suite.BenchmarkSuite`)
+    :param list sizes: the input sizes, one bucket per size
+    :param int N: number of replicates
+    :param list methods: methods to benchmark (defaults to all)
+    :param str cache_mode: "warm" or "cold" page cache
+    :param str filename: the profile file (see :func:`get_profile_filename`)
+    :return: the tuned converters: a dictionary converter name -> list of
+        size buckets (max_size and ranking of the methods) and number of
+        cores allocated to the benchmarks
+    """
+    from bioconvert.core.benchmark_suite import BenchmarkSuite
+    from bioconvert.core.scheduler import get_available_cores
+    suite = BenchmarkSuite(sizes=sizes, converters=converters, N=N,
+                           methods=methods, cache_mode=cache_mode)
+    results = suite.run()
+
+    # median times of the methods for each converter and size
+    medians = {}
+    for result in results:
+        if result["error"] is None and result["method"] is not None:
+            medians.setdefault(result["converter"], {}).setdefault(
+                result["size"], {})[result["method"]] = result["median"]
+
+    tuned = {}
+    for converter, by_size in medians.items():
+        tested = sorted(by_size)
+        buckets = []
+        for size, max_size in zip(tested, get_buckets(tested)):
+            times = by_size[size]
+            buckets.append({"size": size, "max_size": max_size,
+                            "ranking": sorted(times, key=times.get),
+                            "times": times})
+        tuned[converter] = {"buckets": buckets, "time": time.time(),
+                            "cores": get_available_cores()}
+
+    key, node = get_node_type()
+    profile = load_profile(filename)
+    entry = profile.setdefault("nodes", {}).setdefault(key, {"converters": {}})
+    entry["node"] = node
+    entry["converters"].update(tuned)
+    save_profile(profile, filename)
+    return tuned
+
+
+def reset(converters=None, filename=None):
+    """Remove the tuned methods of *converters* (all if None) for this kind
+    of node"""
+    key, _ = get_node_type()
+    profile = load_profile(filename)
+    entry = profile.get("nodes", {}).get(key)
+    if not entry:
+        return
+    if converters is None:
+        del profile["nodes"][key]
+    else:
+        for name in converters:
+            for converter in list(entry["converters"]):
+                if converter.lower() == name.lower():
+                    del entry["converters"][converter]
+    save_profile(profile, filename)
@@ -23,29 +23,35 @@
 # If not, see <http://www.gnu.org/licenses/>.                             #
 ###########################################################################
 """Main factory of Bioconvert"""
+import argparse
 import copy
+import errno
+import os
 import time
 import abc
-import select
 import sys
 import inspect
 import shutil
 import subprocess
 import itertools
+import tempfile
+import threading
 
-from subprocess import Popen, PIPE
 from io import StringIO
-from collections import deque
 
-from easydev import TempFile
-from easydev.multicore import cpu_count
 
 import colorlog
 
 import bioconvert
 
+from bioconvert.core.autotune import get_tuned_method
 from bioconvert.core.benchmark import Benchmark
+from bioconvert.core.cache import get_cache
+from bioconvert.core.scheduler import get_available_cores, get_scheduler
 from bioconvert.core import extensions
+from bioconvert.core.compression import compress_file, decompress_file
+from bioconvert.core.decorators import (_FifoThread, _split_compression,
+                                        check_dependencies, is_streamable)
 
 from bioconvert.core.utils import generate_outfile_name
 from bioconvert import logger
@@ -54,6 +60,9 @@ from . import BioconvertError
 
 _log = colorlog.getLogger(__name__)
 
+#: assumed ratio between the uncompressed and compressed sizes of a file
+COMPRESSION_RATIO = 4
+
 
 class ConvMeta(abc.ABCMeta):
     """This metaclass checks that the converter classes have
@@ -96,22 +105,6 @@ class ConvMeta(abc.ABCMeta):
         # do not check extension since modules does not require to specify
         # extension anymore
 
-        def is_conversion_method(item):
-            """Return True if method name starts with _method_
-
-            This method is used to keep methods that starts with _method_.
-            It uses inspect.getmembers func to list
-            all conversion methods implemented in a convertor class.
-
-            :param item: the object to inspect
-            :return: True if method's name starts with '__method_', False otherwise.
-            :rtype: boolean
-            """
-
-            return inspect.isfunction(item) and \
-                 item.__name__.startswith('_method_') and \
-                 item.__name__ != "_method_dummy"
-
         if name != 'ConvBase':
             input_fmt, output_fmt = cls.split_converter_to_format(name)
             setattr(cls, 'input_fmt', input_fmt)
@@ -135,23 +128,51 @@ class ConvMeta(abc.ABCMeta):
                 # then we turn the list into tuple as output_ext attribute
                 setattr(cls, 'output_ext', tuple(output_ext))
                 # if the key is not in the dictionary return an error message
-            available_conv_meth = []
-            for name in inspect.getmembers(cls, is_conversion_method):
-                # do not use strip() but split()
-                conv_meth = name[0].split("_method_")[1]
+            cls.update_available_methods(probe=False)
+
+    def update_available_methods(cls, probe=True):
+        """Set the *available_methods* attribute of the converter
+
+        :param bool probe: probe the dependencies of the methods again (see
+            :func:`~bioconvert.core.decorators.check_dependencies`) instead
+            of using the result obtained when the module was imported.
+        """
+        def is_conversion_method(item):
+            """Return True if method name starts with _method_
+
+            This method is used to keep methods that starts with _method_.
+            It uses inspect.getmembers func to list
+            all conversion methods implemented in a convertor class.
+
+            :param item: the object to inspect
+            :return: True if method's name starts with '__method_', False otherwise.
+            :rtype: boolean
+            """
+
+            return inspect.isfunction(item) and \
+                 item.__name__.startswith('_method_') and \
+                 item.__name__ != "_method_dummy"
+
+        available_conv_meth = []
+        for name in inspect.getmembers(cls, is_conversion_method):
+            # do not use strip() but split()
+            conv_meth = name[0].split("_method_")[1]
+            if probe:
+                is_disabled = check_dependencies(name[1])
+            else:
                 is_disabled = getattr(name[1], "is_disabled", None)
-                if is_disabled is None:
-                    _log.debug("converter '{}': method {} is not decorated, we expect it to work all time".format(
-                        cls.__name__,
-                        conv_meth,
-                    ))
-                    is_disabled = False
-                if not is_disabled:
-                    available_conv_meth.append(conv_meth)
-                else:
-                    _log.warning("converter '{}': method {} is not available".format(cls.__name__, conv_meth, ))
-            setattr(cls, 'available_methods', available_conv_meth)
-            _log.debug("class = {}  available_methods = {}".format(cls.__name__, available_conv_meth))
+            if is_disabled is None:
+                _log.debug("converter '{}': method {} is not decorated, we expect it to work all time".format(
+                    cls.__name__,
+                    conv_meth,
+                ))
+                is_disabled = False
+            if not is_disabled:
+                available_conv_meth.append(conv_meth)
+            else:
+                _log.warning("converter '{}': method {} is not available".format(cls.__name__, conv_meth, ))
+        setattr(cls, 'available_methods', available_conv_meth)
+        _log.debug("class = {}  available_methods = {}".format(cls.__name__, available_conv_meth))
 
 
 class ConvArg(object):
@@ -246,8 +267,18 @@ class ConvBase(metaclass=ConvMeta):
 
     # threads to be used by default if argument is required in a method
     # this will be overriden if _threading set to True and therefore --threads
-    # set by the user. It is feed back into Bioconvert class
-    threads = cpu_count()
+    # set by the user. It is feed back into Bioconvert class. If it is not
+    # set on the instance, __call__ sets it to the share of the cores granted
+    # by the thread scheduler (see bioconvert.core.scheduler)
+    threads = get_available_cores()
+
+    # whether __call__ asks the thread scheduler for a lease (False for the
+    # steps of a chain that share the lease of the chain)
+    _thread_lease = True
+
+    # the ConversionCache used by __call__. None to use the cache enabled
+    # globally (see bioconvert.core.cache.get_cache), False to disable it
+    cache = None
 
     def __init__(self, infile, outfile):
         """.. rubric:: constructor
@@ -262,6 +293,10 @@ class ConvBase(metaclass=ConvMeta):
         # execute mode can be shell or subprocess.
         self._execute_mode = "shell"
 
+        # exit status and resource usage of the last command run by
+        # _execute() (see bioconvert.core.runner.ProcessResult)
+        self.process_result = None
+
         # The logger to be set to INFO, DEBUG, WARNING, ERROR, CRITICAL
         self.logger = logger
 
@@ -295,13 +330,37 @@ class ConvBase(metaclass=ConvMeta):
         # reference to the method requested
         method_reference = getattr(self, "_method_{}".format(method_name))
 
-        # call the method itself
-
-        t1 = time.time()
-        method_reference(*args, **kwargs)
-        t2 = time.time()
+        # reuse the output of the same conversion if it is in the cache
+        cache = get_cache() if self.cache is None else self.cache
+        key = None
+        if cache and method_name != "dummy":
+            key = cache.get_key(self, method_name, self.infile, self.outfile,
+                                kwargs)
+            if key is not None and cache.fetch(key, self.outfile):
+                _log.info("{}> Output retrieved from the cache".format(self.name))
+                return
+
+        # call the method itself with the threads granted by the scheduler
+        threads_set = "threads" in self.__dict__
+        lease = None
+        if self._thread_lease:
+            lease = get_scheduler().acquire(self.threads if threads_set else None)
+            self.threads = lease.threads
+        try:
+            t1 = time.time()
+            method_reference(*args, **kwargs)
+            t2 = time.time()
+        finally:
+            if lease is not None:
+                lease.release()
+                if not threads_set:
+                    del self.threads
         _log.info("Took {} seconds ".format(t2 - t1))
 
+        if key is not None:
+            cache.store(key, self.outfile, converter=self.name,
+                        method=method_name, inputs=self.infile)
+
     @property
     def name(self):
         """
@@ -310,8 +369,8 @@ class ConvBase(metaclass=ConvMeta):
         return type(self).__name__
 
     def _method_dummy(self, *args, **kwargs):
-        # The execute commands has a large initialisation cost (about a second)
-        # This commands does not and can be used to evaluate that cost
+        # This command does nothing and can be used to evaluate the fixed
+        # cost of execute()
         self.execute("")
 
     def shell(self, cmd):
@@ -319,7 +378,8 @@ class ConvBase(metaclass=ConvMeta):
         _log.info("CMD: {}".format(cmd))
         shell(cmd)
 
-    def execute(self, cmd, ignore_errors=False, verbose=False, shell=False):
+    def execute(self, cmd, ignore_errors=False, verbose=False, shell=False,
+                timeout=None):
 
         if ">" in cmd:
             lhs, rhs = cmd.split(">", 1)
@@ -327,75 +387,53 @@ class ConvBase(metaclass=ConvMeta):
         else:
             cmd = cmd + self._extra_arguments
 
-        if shell is True or self._execute_mode == "shell":
+        if (shell is True or self._execute_mode == "shell") and timeout is None:
             self.shell(cmd)
             return
-        self._execute(cmd, ignore_errors, verbose)
+        return self._execute(cmd, ignore_errors, verbose, timeout=timeout)
 
-    def _execute(self, cmd, ignore_errors=False, verbose=False):
+    def _execute(self, cmd, ignore_errors=False, verbose=False, timeout=None):
         """
-        Execute a command in a sub-shell
+        Execute a command (see :func:`bioconvert.core.runner.run`)
 
         :param str cmd: the command to execute
         :param ignore_errors: If True the result is returned whatever the
-                              return value of the sub-shell.
-                              Otherwise a Runtime error is raised when the sub-shell
-                              return a non zero value
+                              return value of the command.
+                              Otherwise a Runtime error is raised when the
+                              command returns a non zero value
         :param verbose: If true displays errors on standard error
-        :return: the result of the command
+        :param float timeout: number of seconds after which the command
+                              (and its children) are killed
+        :return: the standard output of the command. The exit status and
+                 the resource usage are stored in :attr:`process_result`.
         :rtype: a :class:`StringIO` instance
         """
+        from bioconvert.core.runner import run
+
+        def print_error(line):
+            print(line, file=sys.stderr)
+
         try:
-            process_ = Popen(cmd,
-                             shell=True,
-                             stdout=PIPE,
-                             stderr=PIPE,
-                             stdin=None)
-        except Exception as err:
+            result = run(cmd, timeout=timeout,
+                         stderr_callback=print_error if verbose else None)
+        except OSError as err:
             msg = "Failed to execute Command: '{}'. error: '{}'".format(cmd, err)
             raise RuntimeError(msg)
+        self.process_result = result
 
-        inputs = [process_.stdout, process_.stderr]
-        output = StringIO()
-        errors = StringIO()
-        while process_.poll() is None:
-            # select has 3 parameters, 3 lists, the sockets, the fileobject to watch
-            # in reading, writing, the errors
-            # in addition a timeout option (the call is blocking while a fileObject
-            # is not ready to be processed)
-            # by return we get 3 lists with the fileObject to be processed
-            # in reading, writing, errors.
-            readable, writable, exceptional = select.select(inputs, [], [], 1)
-
-            while readable and inputs:
-                for flow in readable:
-                    data = flow.read()
-                    if not data:
-                        # the flow ready in reading which has no data
-                        # is a closed flow
-                        # thus we must stop to watch it
-                        inputs.remove(flow)
-                    if flow is process_.stdout:
-                        output.write(data.decode("utf-8"))
-                    elif flow is process_.stderr:
-                        errors.write(data.decode("utf-8"))
-                        print(process_.stderr)
-                readable, writable, exceptional = select.select(inputs, [], [], 1)
-
-        errors = errors.getvalue().strip()
-        if verbose:
-            if errors:
-                print(errors, file=sys.stderr)
-
-        if process_.returncode != 0:
+        if result.returncode != 0:
             if not ignore_errors:
+                errors = result.stderr.strip()
+                if result.timed_out:
+                    errors = "Command '{}' timed out. {}".format(cmd, errors)
                 raise RuntimeError(errors)
         else:
-            return output
+            return StringIO(result.stdout)
 
     def boxplot_benchmark(self, N=5, rerun=True, include_dummy=False,
                           to_exclude=[], to_include=[], rot_xticks=90,
-                          boxplot_args={}):
+                          boxplot_args={}, store=None, label=None, warmup=0,
+                          cache_mode="warm"):
         """Simple wrapper to call :class:`Benchmark` and plot the results
 
         see :class:`~bioconvert.core.benchmark.Benchmark` for details.
@@ -405,21 +443,42 @@ class ConvBase(metaclass=ConvMeta):
             to_include = []
 
         self._benchmark = Benchmark(self, N=N, to_exclude=to_exclude,
-                                    to_include=to_include)
+                                    to_include=to_include, store=store,
+                                    label=label, warmup=warmup,
+                                    cache_mode=cache_mode)
         self._benchmark.include_dummy = include_dummy
         data = self._benchmark.plot(rerun=rerun, rot_xticks=rot_xticks,
                                     boxplot_args=boxplot_args)
         return data
 
     def _get_default_method(self):
-        if self._default_method is None:
-            return self.available_methods[0]
-        elif self._default_method not in self.available_methods:
-            return self.available_methods[0]
-        else:
-            return self._default_method
+        # the fastest method on this kind of node (see bioconvert autotune).
+        # This method is also called with the class as argument.
+        if isinstance(self, type):
+            return self.get_method_for_size(None)
+        return self.get_method_for_size(_get_input_size(self.infile))
     default = property(_get_default_method)
 
+    @classmethod
+    def get_method_for_size(cls, size=None):
+        """Return the default method for an input of *size* bytes
+
+        :param int size: the input size (None for the largest inputs)
+        :return: the best method tuned for this size (see
+            :mod:`~bioconvert.core.autotune`) or the default method of the
+            converter
+        """
+        tuned = get_tuned_method(cls.__name__, cls.available_methods, size)
+        if tuned is not None:
+            return tuned
+
+        if cls._default_method is None:
+            return cls.available_methods[0]
+        elif cls._default_method not in cls.available_methods:
+            return cls.available_methods[0]
+        else:
+            return cls._default_method
+
     def install_tool(self, executable):
         """Install the given tool, using the script:
         bioconvert/install_script/install_executable.sh
@@ -506,6 +565,24 @@ class ConvBase(metaclass=ConvMeta):
             help="Allow conversion of a set of files using wildcards. You "
                  "must use quotes to escape the wildcards. For instance: "
                  "--batch 'test*fastq' ")
+        yield ConvArg(
+            names=["--cache", ],
+            nargs="?",
+            const="content",
+            default=None,
+            choices=["content", "fast"],
+            help="Reuse the output of a previous identical conversion (see "
+                 "'bioconvert cache --help'). Inputs are identified by their "
+                 "content or, with 'fast', by their path, size and "
+                 "modification time.")
+        yield ConvArg(
+            names=["-j", "--jobs", ],
+            default=1,
+            type=int,
+            help="Number of files converted in parallel in --batch mode "
+                 "(0 to use all cores). The cores are shared between the "
+                 "jobs: unless --threads is set, each conversion uses "
+                 "cores / jobs threads.")
         yield ConvArg(
             names=["-b", "--benchmark", ],
             default=False,
@@ -525,12 +602,56 @@ class ConvBase(metaclass=ConvMeta):
             type=str,
             help="Methods to include",
         )
+        yield ConvArg(
+            names=["--benchmark-warmup", ],
+            default=0,
+            type=int,
+            help="Number of untimed runs of each method before the trials",
+        )
+        yield ConvArg(
+            names=["--benchmark-cache-mode", ],
+            default="warm",
+            choices=["warm", "cold"],
+            help="warm: run the trials with the files in the page cache. "
+                 "cold: evict the input and output files from the page "
+                 "cache before each trial and run the methods in a random "
+                 "order",
+        )
+        yield ConvArg(
+            names=["--benchmark-report", ],
+            default=None,
+            nargs="+",
+            help="Save the statistics of the benchmark (median, IQR, "
+                 "bootstrap confidence interval, throughput) in these "
+                 "files. The format is given by the extension: .json, .csv "
+                 "or .md. No plot is made (matplotlib is not needed)",
+        )
+        yield ConvArg(
+            names=["--benchmark-store", ],
+            default=None,
+            help="File where the benchmark results are saved (defaults to "
+                 "the BIOCONVERT_BENCHMARK_STORE environment variable or "
+                 "benchmarks.jsonl in the user data directory). Use 'none' "
+                 "to not save them. See bioconvert benchmark --help",
+        )
+        yield ConvArg(
+            names=["--benchmark-label", ],
+            default=None,
+            help="Name of the benchmark run in the store (e.g., baseline)",
+        )
         yield ConvArg(
             names=["-a", "--allow-indirect-conversion", ],
             default=False,
             action="store_true",
             help="Allow to chain converter when direct conversion is absent",
         )
+        yield ConvArg(
+            names=["--explain", ],
+            default=False,
+            action="store_true",
+            help="Print the conversion path with the method and the "
+                 "estimated time of each step and exit",
+        )
         yield ConvArg(
             names=["-e", "--extra-arguments", ],
             default="",
@@ -545,11 +666,14 @@ class ConvBase(metaclass=ConvMeta):
         try:
             # Some converters do not have any method and work
             # in __call__, so preventing to crash by searching for them
+            # the default method is chosen when the input file is known
+            # since it may depend on its size (see bioconvert autotune)
             yield ConvArg(
                 names=["-m", "--method", ],
                 nargs="?",
-                default=cls._get_default_method(cls),
-                help="The method to use to do the conversion.",
+                default=argparse.SUPPRESS,
+                help="The method to use to do the conversion (default: "
+                     "{}).".format(cls._get_default_method(cls)),
                 choices=cls.available_methods,
             )
         except Exception as e:
@@ -567,22 +691,154 @@ class ConvBase(metaclass=ConvMeta):
                names=["-t", "--threads"],
                #nargs=1,
                type=int,
-               default=cls.threads,
-               help="threads to be used",
+               default=None,
+               help="threads to be used (default: a share of the {} "
+                    "cores available)".format(cls.threads),
             )
 
 
+def _get_input_size(infile):
+    """Size of the input file(s) in bytes (None if unknown)"""
+    try:
+        if isinstance(infile, str):
+            return os.path.getsize(infile)
+        return sum(os.path.getsize(x) for x in infile)
+    except (OSError, TypeError):
+        return None
+
+
+def _run_step(step_info, errors, args, kwargs):
+    """Performs one conversion step, storing the exception (if any) in
+    *errors*.
+
+    The step (converter, method, input file, output file, threads) and the
+    arguments of the conversion are passed as is, and not expanded, so
+    that the keyword arguments of the conversion (e.g., the *converter*
+    argument of the command line) do not collide with the parameters of
+    this function.
+    """
+    try:
+        converter, method, infile, outfile, threads = step_info
+        step = converter(infile, outfile)
+        # the whole chain is cached, not its intermediate files
+        step.cache = False
+        # the steps use the threads of the chain
+        step.threads = threads
+        step._thread_lease = False
+        # the method chosen by the chain, not the one for the size of a
+        # named pipe
+        step(*args, **dict(kwargs, method=method))
+    except BaseException as err:
+        errors.append(err)
+
+
+def _is_no_space_error(err):
+    """Return True if *err* reports a full device, either as an OSError or
+    in the error message of an external tool"""
+    if isinstance(err, OSError) and err.errno == errno.ENOSPC:
+        return True
+    return os.strerror(errno.ENOSPC) in str(err)
+
+
+def _release_fifo(filename, mode):
+    """Opens and closes the fifo *filename* so that the process at the other
+    end is not blocked forever (used when a step of a chain fails).
+
+    With mode "r", the fifo is read until the writer ends. With mode "w",
+    the fifo is closed as soon as the reader opens it.
+    """
+    def release():
+        try:
+            with open(filename, "{}b".format(mode)) as fifo:
+                if mode == "r":
+                    while fifo.read(65536):
+                        pass
+        except OSError:
+            pass
+    thread = threading.Thread(target=release, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wire_chain(converter_map, in_fmt, out_fmt):
+    """Return the files read and written by each step of a chain
+
+    Files are numbered: the inputs of the chain first, then the outputs of
+    each step. A step reads the first files available with its input formats
+    (e.g., the FASTA file written by FASTQ2FASTA_QUAL) and makes its outputs
+    available to the next steps.
+
+    :param list converter_map: the steps ((in_fmt, out_fmt), converter)
+    :param tuple in_fmt: the input formats of the chain
+    :param tuple out_fmt: the output formats of the chain
+    :return: the list of (input files, output files) of each step and the
+        files that are the outputs of the chain (in the order of *out_fmt*)
+    """
+    available = list(enumerate(in_fmt))
+    nb_files = len(in_fmt)
+
+    def take(formats):
+        files = []
+        for fmt in formats:
+            for i, (number, available_fmt) in enumerate(available):
+                if available_fmt == fmt:
+                    files.append(number)
+                    del available[i]
+                    break
+            else:
+                raise ValueError("No {} file available in the chain {}".format(
+                    fmt, [pair for pair, _ in converter_map]))
+        return files
+
+    wiring = []
+    for (step_in, step_out), _ in converter_map:
+        inputs = take(step_in)
+        outputs = list(range(nb_files, nb_files + len(step_out)))
+        nb_files += len(step_out)
+        available.extend(zip(outputs, step_out))
+        wiring.append((inputs, outputs))
+    return wiring, take(out_fmt)
+
+
 # Implementing a class creator
 # The created class will have the correct name, will inherit from ConvBase
 # It will have a conversion method chaining conversions through tempfiles
-def make_chain(converter_map):
+# or pipes
+def make_chain(converter_map, in_fmt=None, out_fmt=None):
     """
     Create a class performing step-by-step conversions following a path.
     *converter_map* is a list of pairs ((in_fmt, out_fmt), converter).
     It describes the conversion path.
+
+    A step may use only some of the files available at this point of the
+    chain (see :meth:`~bioconvert.core.registry.Registry.conversion_path`).
+    For instance, FASTQ is converted into CLUSTAL and QUAL by the steps
+    FASTQ2FASTA_QUAL then FASTA2CLUSTAL. *in_fmt* and *out_fmt* are the
+    formats of the chain (by default, the input formats of the first step
+    and the output formats of the last step). Intermediate files that are
+    not used are discarded.
+
+    When a converter writes a single file, read by the next converter only,
+    and both read and write their files sequentially (their default methods
+    are decorated with :func:`~bioconvert.core.decorators.streamable`), the
+    intermediate file is replaced by a named pipe and both steps run
+    concurrently. Other intermediate files are temporary files, in memory
+    (/dev/shm) when they fit. Set the *streaming* attribute of the chain to
+    False to always use temporary files and the *intermediate_directory*
+    attribute to choose their directory.
+
+    A compressed input is decompressed once before the first step and the
+    output is compressed once after the last step (on the fly when these
+    steps are streamable): the steps only read and write uncompressed data
+    (see the *chain_plan* method of the chain).
     """
-    in_fmt = converter_map[0][0][0]
-    out_fmt = converter_map[-1][0][1]
+    in_fmt = tuple(in_fmt or converter_map[0][0][0])
+    out_fmt = tuple(out_fmt or converter_map[-1][0][1])
+    wiring, final_files = _wire_chain(converter_map, in_fmt, out_fmt)
+    # format of each file of the chain
+    file_fmts = list(in_fmt)
+    for (_, step_out), _ in converter_map:
+        file_fmts.extend(step_out)
     chain_name = "{}2{}".format("_".join(in_fmt), "_".join(out_fmt))
     chain_attributes = {}
 
@@ -590,50 +846,310 @@ def make_chain(converter_map):
         super().__init__(infile, outfile)
         self._default_method = "chain"
 
+    def get_data_size(self):
+        """Return the estimated size of the uncompressed input in bytes
+        (None if unknown): :data:`COMPRESSION_RATIO` times the size of a
+        compressed or binary input (e.g., BAM or CRAM)"""
+        from bioconvert.core.registry import BINARY_FORMATS
+
+        size = _get_input_size(self.infile)
+        if size is not None and (_split_compression(self.infile)[1] or
+                                 BINARY_FORMATS.intersection(self.input_fmt)):
+            size *= COMPRESSION_RATIO
+        return size
+
+    def get_step_methods(self):
+        """Return the method used by each step of the chain
+
+        The methods are chosen once for the whole chain, for the size of its
+        uncompressed input (see :meth:`get_data_size`), since the size of an
+        intermediate file is not known in advance (and is 0 for a named
+        pipe).
+        """
+        size = self.get_data_size()
+        return [converter.get_method_for_size(size)
+                for _, converter in self.converter_map]
+
+    def _get_file_kinds(self, methods=None):
+        # kind ("fifo" or "file") of the intermediate files and of the
+        # uncompressed input and output (if compressed), given the methods
+        # of the steps
+        if methods is None:
+            methods = self.get_step_methods()
+        can_stream = self.streaming and hasattr(os, "mkfifo")
+        # steps reading and writing a single file sequentially
+        streamable = [can_stream and len(inputs) == len(outputs) == 1
+                      and is_streamable(converter, method)
+                      for (inputs, outputs), (_, converter), method
+                      in zip(self.wiring, self.converter_map, methods)]
+        producers, consumers = {}, {}
+        for step, (inputs, outputs) in enumerate(self.wiring):
+            consumers.update((number, step) for number in inputs)
+            producers.update((number, step) for number in outputs)
+
+        def kind(fifo):
+            return "fifo" if fifo else "file"
+
+        kinds = {}
+        for number, producer in producers.items():
+            if number not in self.final_files:
+                consumer = consumers.get(number)
+                kinds[number] = kind(consumer == producer + 1
+                                     and streamable[producer]
+                                     and streamable[consumer])
+        if len(self.input_fmt) == 1 and _split_compression(self.infile)[1]:
+            kinds[0] = kind(consumers.get(0) == 0 and streamable[0])
+        if len(self.output_fmt) == 1 and _split_compression(self.outfile)[1]:
+            number = self.final_files[0]
+            kinds[number] = kind(producers.get(number) == self.nb_steps - 1
+                                 and streamable[-1])
+        return kinds
+
+    def chain_plan(self, methods=None):
+        """Return how the data flows between the steps of the chain
+
+        The compression of the input and of the output is handled by the
+        chain: the input is decompressed before the first step and the output
+        compressed after the last step, so that the intermediate data is
+        never compressed. Each of them, as well as each intermediate file,
+        is either a named pipe ("fifo", when the steps at both ends are
+        streamable) or a temporary file ("file") in :meth:`intermediate_dir`.
+
+        :param list methods: the methods of the steps (defaults to
+            :meth:`get_step_methods`)
+        :return: a dictionary with the keys decompress and compress (None
+            when the input or output is not compressed) and links (the
+            intermediate files in the order they are written).
+        """
+        kinds = self._get_file_kinds(methods)
+        plan = {"decompress": None, "compress": None, "links": []}
+        if len(self.input_fmt) == 1:
+            plan["decompress"] = kinds.get(0)
+        if len(self.output_fmt) == 1:
+            plan["compress"] = kinds.get(self.final_files[0])
+        plan["links"] = [kinds[number] for number in sorted(kinds)
+                         if number >= len(self.input_fmt)
+                         and number not in self.final_files]
+        return plan
+
+    def intermediate_dir(self, nb_files=2):
+        """Return the directory of the intermediate files
+
+        The *intermediate_directory* attribute of the chain if set. Otherwise,
+        /dev/shm (memory) if *nb_files* intermediate files of the estimated
+        size fit in half of its free space, the default temporary directory
+        (None) otherwise. The intermediate files are assumed to be as large
+        as the (uncompressed) input, :data:`COMPRESSION_RATIO` times larger
+        than a compressed or binary input (e.g., BAM or CRAM).
+        """
+        if self.intermediate_directory is not None:
+            return self.intermediate_directory
+        size = self.get_data_size()
+        if size is None:
+            return None
+        try:
+            stat = os.statvfs("/dev/shm")
+        except (OSError, AttributeError):
+            return None
+        if nb_files * size <= stat.f_bavail * stat.f_frsize / 2:
+            return "/dev/shm"
+        return None
+
     def _method_chain(self, *args, **kwargs):
         """This method successively uses the default conversion method of each
-        converter in the conversion path."""
-
-        def conv_step(converter, infile, outfile):
-            """Performs one conversion step."""
-            converter(infile, outfile)(*args, **kwargs)
-
-        # Contains the last temporary output file, if any
-        pipe_files = deque()
-        for (step_num, ((_, out_fmt), converter)) \
-                in enumerate(self.converter_map, start=1):
-            if step_num == 1:
-                # May not be necessary:
-                step_infile = None
-                step_input = self.infile
-                del_infile = False
+        converter in the conversion path.
+
+        If /dev/shm was chosen for the intermediate files (see
+        :meth:`intermediate_dir`) and gets full, the conversion is run again
+        with the intermediate files in the default temporary directory.
+        """
+
+        methods = self.get_step_methods()
+        kinds = self._get_file_kinds(methods)
+        _log.info("Chain plan: {}".format(self.chain_plan(methods)))
+        directory = None
+        if "file" in kinds.values():
+            directory = self.intermediate_dir()
+        try:
+            self._run_chain(methods, kinds, directory, args, kwargs)
+        except Exception as err:
+            if self.intermediate_directory is not None or \
+                    directory != "/dev/shm" or not _is_no_space_error(err):
+                raise
+            _log.warning("No space left in /dev/shm for the intermediate "
+                         "files, using the default temporary directory")
+            self._run_chain(methods, kinds, None, args, kwargs)
+
+    def _run_chain(self, methods, kinds, directory, args, kwargs):
+        # runs the steps with their *methods* and the intermediate files of
+        # the given kinds in *directory* (the default temporary directory if
+        # None)
+        fifo_dir = tempfile.mkdtemp(prefix="bioconvert_")
+        # the intermediate files are not created in advance so that a step
+        # that does not write its output is detected
+        file_dir = fifo_dir
+        if directory is not None:
+            file_dir = tempfile.mkdtemp(prefix="bioconvert_", dir=directory)
+        fifos = []
+        tempfiles = set()
+
+        def new_file(name, number):
+            suffix = ".{}".format(self.file_fmts[number].lower())
+            if kinds[number] == "fifo":
+                filename = os.path.join(fifo_dir, name + suffix)
+                os.mkfifo(filename)
+                fifos.append(filename)
+            else:
+                filename = os.path.join(file_dir, name + suffix)
+                tempfiles.add(filename)
+            return filename
+
+        infiles = [self.infile] if isinstance(self.infile, str) else list(self.infile)
+        outfiles = [self.outfile] if isinstance(self.outfile, str) else list(self.outfile)
+        # (de)compression of the input and output and copy of the inputs
+        # that are outputs as well: before the first group, after the last
+        # group or concurrently with them (fifo)
+        pre, post, io_threads = [], [], {}
+        names = dict(enumerate(infiles))
+        for number, outfile in zip(self.final_files, outfiles):
+            if number < len(infiles):
+                post.append((infiles[number], outfile, shutil.copyfile))
             else:
-                step_infile = pipe_files.popleft()
-                step_input = step_infile.name
-                del_infile = True
-
-            if step_num == self.nb_steps:
-                # May not be necessary:
-                step_outfile = None
-                step_output = self.outfile
+                names[number] = outfile
+
+        if len(infiles) == 1 and 0 in kinds:
+            names[0] = new_file("input", 0)
+            if kinds[0] == "fifo":
+                io_threads[0] = [_FifoThread(names[0], self.infile,
+                                             self.threads, decompress=True)]
+            else:
+                pre.append((self.infile, names[0], decompress_file))
+
+        # The steps are split in groups connected by pipes. Steps of a group
+        # run concurrently while groups are run one after the other.
+        groups = [[0]]
+        for step in range(1, self.nb_steps):
+            inputs = self.wiring[step][0]
+            if len(inputs) == 1 and kinds.get(inputs[0]) == "fifo":
+                _log.info("Streaming step {} into step {}".format(step, step + 1))
+                groups[-1].append(step)
             else:
+                groups.append([step])
+
+        if len(outfiles) == 1 and self.final_files[0] in kinds:
+            number = self.final_files[0]
+            names[number] = new_file("output", number)
+            if kinds[number] == "fifo":
+                io_threads.setdefault(len(groups) - 1, []).append(_FifoThread(
+                    names[number], self.outfile, self.threads, decompress=False))
+            else:
+                post.append((names[number], self.outfile, compress_file))
 
-                #FIXME: for mutiple IO converters
-                if len(out_fmt) == 1:
-                    step_outfile = TempFile(suffix=out_fmt[0].lower())
-                    step_output = step_outfile.name
-                    pipe_files.append(step_outfile)
+        for number in sorted(kinds):
+            if number not in names:
+                names[number] = new_file("file{}".format(number), number)
 
-            conv_step(converter, step_input, step_output)
-            if del_infile:
-                step_infile.delete()
+        def get_files(numbers):
+            # converters with several inputs or outputs expect tuples
+            if len(numbers) == 1:
+                return names[numbers[0]]
+            return tuple(names[number] for number in numbers)
+
+        try:
+            for infile, outfile, function in pre:
+                _log.info("Decompressing {}".format(infile))
+                function(infile, outfile, threads=self.threads)
+
+            for group_num, group in enumerate(groups):
+                errors = []
+                threads = []
+                for thread in io_threads.get(group_num, []):
+                    thread.start()
+                for step in group:
+                    converter = self.converter_map[step][1]
+                    inputs, outputs = self.wiring[step]
+                    step_info = (converter, methods[step], get_files(inputs),
+                                 get_files(outputs), self.threads)
+                    thread = threading.Thread(target=_run_step,
+                        args=(step_info, errors, args, kwargs), daemon=True)
+                    thread.start()
+                    threads.append((step, thread))
+
+                while threads:
+                    step, thread = threads.pop(0)
+                    thread.join(0.1)
+                    if thread.is_alive():
+                        threads.append((step, thread))
+                    if errors:
+                        break
+
+                if errors:
+                    # unblock the other steps of the group waiting on a pipe
+                    for step in group:
+                        for number in self.wiring[step][0]:
+                            if names[number] in fifos:
+                                _release_fifo(names[number], "r")
+                        for number in self.wiring[step][1]:
+                            if names[number] in fifos:
+                                _release_fifo(names[number], "w")
+                    for _, thread in threads:
+                        thread.join()
+                for thread in io_threads.get(group_num, []):
+                    thread.release()
+                    if thread.error is not None:
+                        errors.append(thread.error)
+                if errors:
+                    raise errors[0]
+
+                # a step may end without error and without writing its
+                # outputs (e.g., an external tool that does not report
+                # its failure)
+                for step in group:
+                    for number in self.wiring[step][1]:
+                        if names[number] not in fifos and \
+                                not os.path.exists(names[number]):
+                            raise IOError("Step {} ({}) of the conversion did "
+                                          "not write {}".format(
+                                              step + 1,
+                                              self.converter_map[step][1].__name__,
+                                              names[number]))
+
+                # the input files of the group are not needed anymore
+                for step in group:
+                    for number in self.wiring[step][0]:
+                        if names[number] in tempfiles:
+                            tempfiles.remove(names[number])
+                            os.remove(names[number])
+
+            for infile, outfile, function in post:
+                if function is shutil.copyfile:
+                    _log.info("Copying {} into {}".format(infile, outfile))
+                    function(infile, outfile)
+                else:
+                    _log.info("Compressing into {}".format(outfile))
+                    function(infile, outfile, threads=self.threads)
+        finally:
+            shutil.rmtree(fifo_dir, ignore_errors=True)
+            shutil.rmtree(file_dir, ignore_errors=True)
 
     chain_attributes["converter_map"] = converter_map
     chain_attributes["nb_steps"] = len(converter_map)
+    chain_attributes["wiring"] = wiring
+    chain_attributes["final_files"] = final_files
+    chain_attributes["file_fmts"] = file_fmts
+    chain_attributes["streaming"] = True
+    chain_attributes["intermediate_directory"] = None
+    chain_attributes["chain_plan"] = chain_plan
+    chain_attributes["_get_file_kinds"] = _get_file_kinds
+    chain_attributes["intermediate_dir"] = intermediate_dir
+    chain_attributes["get_data_size"] = get_data_size
+    chain_attributes["get_step_methods"] = get_step_methods
     chain_attributes["__init__"] = chain_init
     chain_attributes["_method_chain"] = _method_chain
+    chain_attributes["_run_chain"] = _run_chain
     chain = type(chain_name, (ConvBase,), chain_attributes)
     # https://stackoverflow.com/a/43779009/1878788
     # Allows calling super in chain.__init__
     __class__ = chain
     return chain
+
@@ -22,16 +22,27 @@
 # If not, see <http://www.gnu.org/licenses/>.                             #
 ###########################################################################
 """Tools for benchmarking"""
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
 from collections import defaultdict
+from contextlib import contextmanager
 from itertools import chain
 from pandas import np
 from easydev import Timer, Progress
 
+from bioconvert.core.benchmark_store import _get_size, get_host_fingerprint
+
 import colorlog
 _log = colorlog.getLogger(__name__)
 
 
-__all__ = ["Benchmark", "BenchmarkMulticonvert"]
+__all__ = ["Benchmark", "BenchmarkMulticonvert", "summarize", "count_records",
+           "run_isolated", "evict_from_page_cache"]
 
 
 def gmean(a, axis=0, dtype=None):
@@ -51,6 +62,250 @@ def gmean(a, axis=0, dtype=None):
     return np.exp(log_a.mean(axis=axis))
 
 
+@contextmanager
+def _cache_disabled(converters):
+    """Disable the conversion cache of the *converters* (so that each
+    replicate runs the conversion) and restore it on exit"""
+    saved = [converter.cache for converter in converters]
+    for converter in converters:
+        converter.cache = False
+    try:
+        yield
+    finally:
+        for converter, cache in zip(converters, saved):
+            converter.cache = cache
+
+
+def bootstrap_ci(times, level=0.95, n_resamples=1000, seed=0):
+    """Bootstrap confidence interval of the median of *times*"""
+    times = np.asarray(times, dtype=float)
+    if len(times) < 2:
+        return float(times[0]), float(times[0])
+    state = np.random.RandomState(seed)
+    samples = state.choice(times, size=(n_resamples, len(times)), replace=True)
+    medians = np.median(samples, axis=1)
+    alpha = (1 - level) / 2 * 100
+    low, high = np.percentile(medians, [alpha, 100 - alpha])
+    return float(low), float(high)
+
+
+def summarize(times, input_size=None, records=None):
+    """Robust statistics of the *times* of a method
+
+    :param list times: the duration of each replicate in seconds
+    :param int input_size: size of the input in bytes
+    :param int records: number of records of the input
+    :return: a dictionary with the number of replicates (N), the median,
+        mean, min, max, first and third quartiles (q1, q3), the
+        interquartile range (iqr), the 95% bootstrap confidence interval of
+        the median (ci_low, ci_high) and the throughputs in bytes and
+        records per second (None if unknown)
+    """
+    array = np.asarray(times, dtype=float)
+    median = float(np.median(array))
+    q1, q3 = (float(x) for x in np.percentile(array, [25, 75]))
+    ci_low, ci_high = bootstrap_ci(array)
+    return {
+        "N": len(array),
+        "median": median,
+        "mean": float(array.mean()),
+        "min": float(array.min()),
+        "max": float(array.max()),
+        "q1": q1,
+        "q3": q3,
+        "iqr": q3 - q1,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+        "bytes_per_second": input_size / median if input_size and median else None,
+        "records_per_second": records / median if records and median else None,
+    }
+
+
+def summarize_usages(usages):
+    """Median of the resource usages of the replicates (see
+    :func:`run_isolated`). The values are None if *usages* is empty."""
+    stats = {}
+    for name in _usage_columns:
+        values = [x[name] for x in usages or [] if x.get(name) is not None]
+        stats[name] = float(np.median(values)) if values else None
+    return stats
+
+
+def count_records(filenames):
+    """Number of records of the input file(s) (None if unknown)
+
+    Records are reads for FASTQ files, sequences for FASTA files and
+    lines other than headers (starting with # or @) for other text files.
+    The number of records of binary files is unknown.
+    """
+    from bioconvert.core.compression import open_compressed
+    filenames = [filenames] if isinstance(filenames, str) else filenames
+    total = 0
+    for filename in filenames:
+        if not os.path.isfile(filename):
+            return None
+        name = filename.lower()
+        for ext in (".gz", ".bz2", ".dsrc"):
+            if name.endswith(ext):
+                name = name[:-len(ext)]
+        with open_compressed(filename, "rb") as fin:
+            head = fin.read(1 << 16)
+            if b"\0" in head:
+                return None
+            lines = head.split(b"\n")
+            partial = lines.pop()
+            count = 0
+            for block in iter(lambda: fin.read(1 << 20), b""):
+                block_lines = (partial + block).split(b"\n")
+                partial = block_lines.pop()
+                lines.extend(block_lines)
+                count += _count_lines(lines, name)
+                lines = []
+            if partial:
+                lines.append(partial)
+            count += _count_lines(lines, name)
+        if name.endswith((".fastq", ".fq")):
+            count //= 4
+        total += count
+    return total
+
+
+def _count_lines(lines, name):
+    if name.endswith((".fasta", ".fa", ".fas", ".fna", ".faa")):
+        return sum(1 for x in lines if x.startswith(b">"))
+    if name.endswith((".fastq", ".fq")):
+        return sum(1 for x in lines if x)
+    return sum(1 for x in lines if x.strip() and not x.startswith((b"#", b"@")))
+
+
+def _read_proc_io(pid):
+    """Return the I/O counters of /proc/<pid>/io (empty if not available)"""
+    counters = {}
+    try:
+        with open("/proc/{}/io".format(pid)) as fin:
+            for line in fin:
+                name, value = line.split(":")
+                counters[name.strip()] = int(value)
+    except (OSError, ValueError):
+        return {}
+    return {
+        "read_bytes": counters.get("read_bytes"),
+        "write_bytes": counters.get("write_bytes"),
+        "read_chars": counters.get("rchar"),
+        "write_chars": counters.get("wchar"),
+    }
+
+
+def run_isolated(function):
+    """Call *function* in a forked child process and return its wall time
+    and resource usage
+
+    The resource usage includes the processes started by the child (e.g.,
+    the tools run by :meth:`~bioconvert.core.base.ConvBase.execute`):
+    user_time, system_time and cpu_time in seconds, max_rss (peak resident
+    memory in kilobytes, at least the memory of the forked python process),
+    the page faults, voluntary_switches and involuntary_switches, and
+    read_bytes, write_bytes (storage I/O), read_chars and write_chars (all
+    I/O) where /proc/<pid>/io is available.
+
+    :return: the wall time in seconds and the usage dictionary
+    :raises RuntimeError: if *function* fails
+    """
+    from bioconvert.core.runner import rusage_to_dict, status_to_exitcode
+
+    # do not output the buffered data twice
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover (child)
+        status = 0
+        try:
+            os.close(read_fd)
+            t1 = time.perf_counter()
+            function()
+            message = {"time": time.perf_counter() - t1}
+        except BaseException as err:
+            message = {"error": "{}: {}".format(type(err).__name__, err)}
+            status = 1
+        try:
+            with os.fdopen(write_fd, "w") as fout:
+                json.dump(message, fout)
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as fin:
+        data = fin.read()
+    # the I/O counters of the child (and of its children) are read before
+    # the child is reaped
+    io_counters = {}
+    try:
+        os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+        io_counters = _read_proc_io(pid)
+    except (AttributeError, OSError):
+        pass
+    _, status, usage = os.wait4(pid, 0)
+
+    try:
+        message = json.loads(data)
+    except ValueError:
+        message = {"error": "process ended with status {}".format(
+            status_to_exitcode(status))}
+    if "error" in message:
+        raise RuntimeError(message["error"])
+    usage = rusage_to_dict(usage)
+    usage["cpu_time"] = usage["user_time"] + usage["system_time"]
+    usage.update(io_counters)
+    return message["time"], usage
+
+
+def evict_from_page_cache(filenames):
+    """Ask the kernel to drop the pages of *filenames* from the page cache
+
+    Uses posix_fadvise(POSIX_FADV_DONTNEED), which does not require any
+    privilege. Modified pages are written first since they cannot be
+    dropped. Pages mapped by running processes are kept. Nothing is done
+    on systems without posix_fadvise.
+
+    :return: the number of files evicted
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return 0
+    count = 0
+    for filename in filenames:
+        try:
+            fd = os.open(filename, os.O_RDONLY)
+        except (OSError, TypeError):
+            # e.g., output not created yet or prefix of several files
+            continue
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            count += 1
+        except OSError as err:
+            _log.debug("{} not evicted: {}".format(filename, err))
+        finally:
+            os.close(fd)
+    return count
+
+
+def _as_list(filenames):
+    return [filenames] if isinstance(filenames, str) else list(filenames or [])
+
+
+# resource usage reported by Benchmark.summary
+_usage_columns = ["max_rss", "cpu_time", "user_time", "system_time",
+                  "voluntary_switches", "involuntary_switches", "read_bytes",
+                  "write_bytes"]
+
+_report_columns = ["method", "N", "median", "mean", "min", "max", "q1", "q3",
+                   "iqr", "ci_low", "ci_high", "bytes_per_second",
+                   "records_per_second"] + _usage_columns
+
+
 class Benchmark():
     """Convenient class to benchmark several methods for a given converter
 
@@ -61,14 +316,39 @@ class Benchmark():
         b.run_methods()
         b.plot()
 
+    The timings can be saved in a
+    :class:`~bioconvert.core.benchmark_store.BenchmarkStore` to compare
+    them with later runs::
+
+        b = Benchmark(c, N=5, store=BenchmarkStore(), label="baseline")
+
     """
-    def __init__(self, obj, N=5, to_exclude=None, to_include=None):
+    def __init__(self, obj, N=5, to_exclude=None, to_include=None,
+                 store=None, label=None, warmup=0, isolate=None,
+                 cache_mode="warm", shuffle=None, seed=None):
         """.. rubric:: Constructor
 
         :param obj: can be an instance of a converter class or a class name
         :param int N: number of replicates
         :param list to_exclude: methods to exclude from the benchmark
         :param list to_include: methods to include ONLY
+        :param store: a :class:`~bioconvert.core.benchmark_store.BenchmarkStore`
+            where the timings of each method are saved
+        :param str label: name of the run in the *store*
+        :param int warmup: number of runs of each method before the
+            replicates (e.g., to fill the disk cache), not timed
+        :param bool isolate: run each replicate in a child process to
+            measure its memory, CPU and I/O usage (see :func:`run_isolated`).
+            Defaults to True where processes can be forked.
+        :param str cache_mode: "warm" runs the replicates with the files
+            left in the page cache by the previous run. "cold" evicts the
+            input and output files from the page cache before each
+            replicate (see :func:`evict_from_page_cache`), as in a first
+            read in production.
+        :param bool shuffle: run the replicates of the methods in rounds,
+            in a random order in each round, to remove the bias due to the
+            order of the methods. Defaults to True in cold mode.
+        :param int seed: seed of the random order
 
         Use one of *to_exclude* or *to_include*.
         If both are provided, only the *to_include* one is used.
@@ -79,7 +359,19 @@ class Benchmark():
 
         self.converter = obj
         self.N = N
+        self.warmup = warmup
+        self.isolate = hasattr(os, "fork") if isolate is None else isolate
+        if cache_mode not in ("warm", "cold"):
+            raise ValueError("cache_mode must be 'warm' or 'cold'")
+        self.cache_mode = cache_mode
+        self.shuffle = cache_mode == "cold" if shuffle is None else shuffle
+        self.seed = seed
         self.results = None
+        # resource usage of each replicate (if isolate is True)
+        self.usages = None
+        self.store = store
+        self.label = label
+        self.run_id = None
         self.include_dummy = False
         if to_exclude is None:
             self.to_exclude = []
@@ -91,7 +383,17 @@ class Benchmark():
             self.to_include = to_include
 
     def run_methods(self):
-        """Runs the benchmarks, and stores the timings in *self.results*."""
+        """Runs the benchmarks, and stores the timings in *self.results*.
+
+        The conversion cache is disabled during the benchmark.
+        """
+        with _cache_disabled(self._get_converters()):
+            self._run_methods()
+
+    def _get_converters(self):
+        return [self.converter]
+
+    def _run_methods(self):
         results = {}
         methods = self.converter.available_methods[:]  # a copy !
 
@@ -103,16 +405,164 @@ class Benchmark():
         elif self.to_exclude:
             methods = [x for x in methods if x not in self.to_exclude]
 
-        for method in methods:
-            print("\nEvaluating method {}".format(method))
-            times = []
-            pb = Progress(self.N)
-            for i in range(self.N):
-                with Timer(times):
+        self._new_run()
+        results = {method: [] for method in methods}
+        usages = {method: [] for method in methods}
+        schedule = self._get_schedule(methods)
+        if self.shuffle:
+            print("\nEvaluating methods {} in random order".format(", ".join(methods)))
+            for method in methods:
+                for i in range(self.warmup):
                     self.converter(method=method)
-                pb.animate(i+1)
-            results[method] = times
+            pb = Progress(len(schedule))
+
+        for j, (method, i) in enumerate(schedule):
+            if not self.shuffle and i == 0:
+                print("\nEvaluating method {}".format(method))
+                for _ in range(self.warmup):
+                    self.converter(method=method)
+                pb = Progress(self.N)
+            duration, usage = self._run_replicate(self.converter, method)
+            results[method].append(duration)
+            if usage is not None:
+                usages[method].append(usage)
+            pb.animate(j + 1 if self.shuffle else i + 1)
+
+        for method in methods:
+            self._store(self.converter, method, results[method], usages[method])
         self.results = results
+        self.usages = usages
+
+    def _get_schedule(self, methods):
+        """Return the (method, replicate) pairs in the order they are run"""
+        if not self.shuffle:
+            return [(method, i) for method in methods for i in range(self.N)]
+        rng = random.Random(self.seed)
+        schedule = []
+        for i in range(self.N):
+            order = list(methods)
+            rng.shuffle(order)
+            schedule.extend((method, i) for method in order)
+        return schedule
+
+    def _run_replicate(self, converter, method):
+        """Run one replicate and return its time and resource usage (None
+        if the replicate is not isolated)"""
+        if self.cache_mode == "cold":
+            evict_from_page_cache(_as_list(converter.infile) +
+                                  _as_list(converter.outfile))
+        if self.isolate:
+            return run_isolated(lambda: converter(method=method))
+        times = []
+        with Timer(times):
+            converter(method=method)
+        return times[0], None
+
+    def _new_run(self):
+        self.run_id = "{:.6f}-{}".format(time.time(), os.getpid())
+
+    def _store(self, converter, method, times, usages=None):
+        """Save the timings in the store (if any)"""
+        if self.store is not None and method != "dummy":
+            self.store.add(converter, method, times, label=self.label,
+                           run_id=self.run_id, usages=usages,
+                           cache_mode=self.cache_mode)
+
+    def _get_input(self):
+        """Return the input file(s), their size in bytes and number of
+        records"""
+        infile = self.converter.infile
+        return infile, _get_size(infile), count_records(infile)
+
+    def summary(self, rerun=False):
+        """Return the statistics of each method (see :func:`summarize`),
+        running the benchmarks if needed or if *rerun* is True
+
+        :return: a dictionary with the converter, the input file, its size
+            and number of records, the host and the statistics of the
+            methods (sorted by median time)
+        """
+        if self.results is None or rerun is True:
+            self.run_methods()
+        infile, size, records = self._get_input()
+        methods = []
+        for method, times in self.results.items():
+            stats = summarize(times, input_size=size, records=records)
+            stats.update(summarize_usages((self.usages or {}).get(method)))
+            stats["method"] = method
+            stats["times"] = list(times)
+            methods.append(stats)
+        return {
+            "converter": self._get_name(),
+            "input": infile,
+            "input_size": size,
+            "records": records,
+            "warmup": self.warmup,
+            "cache_mode": self.cache_mode,
+            "host": get_host_fingerprint(),
+            "methods": sorted(methods, key=lambda x: x["median"]),
+        }
+
+    def _get_name(self):
+        return self.converter.name
+
+    def to_json(self):
+        """Return the :meth:`summary` as JSON"""
+        return json.dumps(self.summary(), indent=2, default=str)
+
+    def to_csv(self):
+        """Return the :meth:`summary` as CSV (one line per method)"""
+        summary = self.summary()
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(["converter", "input_size", "records"] + _report_columns)
+        for stats in summary["methods"]:
+            writer.writerow([summary["converter"], summary["input_size"],
+                             summary["records"]] +
+                            [stats[x] for x in _report_columns])
+        return output.getvalue()
+
+    def to_markdown(self):
+        """Return the :meth:`summary` as a Markdown table"""
+        summary = self.summary()
+
+        def fmt(value, scale=1):
+            return "-" if value is None else "{:.3g}".format(value / scale)
+
+        lines = ["## {} benchmark".format(summary["converter"]), ""]
+        if summary["input_size"]:
+            lines.append("Input: {} ({:.3g} MB{})".format(
+                summary["input"], summary["input_size"] / 1e6,
+                "" if summary["records"] is None
+                else ", {} records".format(summary["records"])))
+            lines.append("")
+        lines.append("| method | N | median (s) | 95% CI (s) | IQR (s) | "
+                     "MB/s | records/s | peak RSS (MB) | CPU (s) | "
+                     "read (MB) | written (MB) |")
+        lines.append("|---|---|---|---|---|---|---|---|---|---|---|")
+        for stats in summary["methods"]:
+            lines.append("| {} | {} | {} | {}-{} | {} | {} | {} | {} | {} | "
+                         "{} | {} |".format(
+                stats["method"], stats["N"], fmt(stats["median"]),
+                fmt(stats["ci_low"]), fmt(stats["ci_high"]), fmt(stats["iqr"]),
+                fmt(stats["bytes_per_second"], 1e6),
+                fmt(stats["records_per_second"]),
+                fmt(stats["max_rss"], 1024), fmt(stats["cpu_time"]),
+                fmt(stats["read_bytes"], 1e6), fmt(stats["write_bytes"], 1e6)))
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, filename):
+        """Save the :meth:`summary` in *filename*. The format (JSON, CSV or
+        Markdown) is given by its extension (.json, .csv or .md)."""
+        formats = {".json": self.to_json, ".csv": self.to_csv,
+                   ".md": self.to_markdown}
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in formats:
+            raise ValueError("Unknown report format {} (use .json, .csv or "
+                             ".md)".format(filename))
+        with open(filename, "w") as fout:
+            fout.write(formats[ext]())
+        _log.info("Benchmark report saved in {}".format(filename))
 
     def plot(self, rerun=False, ylabel="Time (seconds)", rot_xticks=0, 
              boxplot_args={}):
@@ -175,7 +625,10 @@ class BenchmarkMulticonvert(Benchmark):
         super().__init__(None, **kwargs)
         self.converters = objs
 
-    def run_methods(self):
+    def _get_converters(self):
+        return self.converters
+
+    def _run_methods(self):
         results = defaultdict(list)
         # We only test the methods common to all converters
         # (The intended use is with a list of converters all
@@ -193,17 +646,27 @@ class BenchmarkMulticonvert(Benchmark):
         elif self.to_exclude:
             methods = [x for x in methods if x not in self.to_exclude]
 
+        self._new_run()
         for method in methods:
             print("\nEvaluating method {}".format(method))
             # key: converter.infile
             # value: list of times
             times = defaultdict(list)
+            for i in range(self.warmup):
+                for converter in self.converters:
+                    converter(method=method)
+            usages = defaultdict(list)
             pb = Progress(self.N)
             for i in range(self.N):
                 for converter in self.converters:
-                    with Timer(times[converter.infile]):
-                        converter(method=method)
+                    duration, usage = self._run_replicate(converter, method)
+                    times[converter.infile].append(duration)
+                    if usage is not None:
+                        usages[converter.infile].append(usage)
                 pb.animate(i+1)
+            for converter in self.converters:
+                self._store(converter, method, times[converter.infile],
+                            usages[converter.infile])
             # Normalize times so that each converter has comparable times
             mean_time = gmean(np.fromiter(chain(*times.values()), dtype=float))
             # median of ratios to geometric mean (c.f. DESeq normalization)
@@ -215,5 +678,12 @@ class BenchmarkMulticonvert(Benchmark):
                     [conv_time / scale for conv_time in conv_times])
         self.results = results
 
+    def _get_input(self):
+        # times are normalised between the inputs, no throughput
+        return [x.infile for x in self.converters], None, None
+
+    def _get_name(self):
+        return self.converters[0].name
+
     def plot(self, rerun=False, ylabel="Time (normalized seconds)"):
         super().plot(rerun, ylabel)
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Persistent store of benchmark results
+
+Each benchmark of a method (see :class:`~bioconvert.core.benchmark.Benchmark`)
+is appended as one JSON line to the store with the converter, the method,
+the input size, the timings, a fingerprint of the host, the versions of the
+tools used by the method and the bioconvert version. Runs are compared with
+:func:`compare` (or ``bioconvert benchmark compare``) to detect
+regressions, e.g., after the upgrade of a tool::
+
+    from bioconvert.core.benchmark_store import BenchmarkStore, compare
+    store = BenchmarkStore()
+    for row in compare(store.records(), baseline="v0.4"):
+        if row["regression"]:
+            print(row["converter"], row["method"], row["ratio"])
+
+The store defaults to benchmarks.jsonl in the user data directory and can
+be changed with the BIOCONVERT_BENCHMARK_STORE environment variable.
+"""
+import hashlib
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import time
+from collections import OrderedDict
+
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["BenchmarkStore", "get_host_fingerprint", "get_tool_versions",
+           "mann_whitney_u", "compare"]
+
+
+def _get_default_filename():
+    from bioconvert import configuration
+    try:
+        directory = configuration.appdirs.user_data_dir
+    except AttributeError:
+        directory = os.path.join(os.path.expanduser("~"), ".local", "share",
+                                 "bioconvert")
+    return os.path.join(directory, "benchmarks.jsonl")
+
+
+def _get_cpu_model():
+    try:
+        with open("/proc/cpuinfo") as fin:
+            for line in fin:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+_host = None
+
+
+def get_host_fingerprint():
+    """Return a description of the host (name, system, CPU model, number of
+    CPUs and cores allocated to the process)
+
+    The *fingerprint* key is a hash of these values: timings are only
+    compared between records of the same fingerprint.
+    """
+    global _host
+    if _host is None:
+        from bioconvert.core.scheduler import get_available_cores
+        host = OrderedDict([
+            ("hostname", socket.gethostname()),
+            ("system", platform.system()),
+            ("release", platform.release()),
+            ("machine", platform.machine()),
+            ("cpu", _get_cpu_model()),
+            ("cpu_count", os.cpu_count()),
+            ("cores", get_available_cores()),
+            ("python", platform.python_version()),
+        ])
+        data = json.dumps(host, sort_keys=True).encode()
+        host["fingerprint"] = hashlib.sha256(data).hexdigest()[:16]
+        _host = host
+    return dict(_host)
+
+
+_versions = {}
+
+
+def _get_binary_version(binary):
+    """First line printed by the --version option of *binary* (None if it
+    cannot be run)"""
+    for option in ("--version", "version", "-v"):
+        try:
+            process = subprocess.run([binary, option], stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT,
+                                     stdin=subprocess.DEVNULL, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        lines = [x.strip() for x in process.stdout.decode(errors="replace").splitlines()
+                 if x.strip()]
+        if process.returncode == 0 and lines:
+            return lines[0]
+    return None
+
+
+def _get_library_version(library):
+    try:
+        from importlib import metadata
+        return metadata.version(library)
+    except Exception:
+        pass
+    try:
+        module = __import__(library)
+        return str(getattr(module, "__version__", None) or "") or None
+    except Exception:
+        return None
+
+
+def get_tool_versions(converter, method):
+    """Return the versions of the tools used by a method of *converter*
+
+    The tools are the dependencies declared with
+    :func:`~bioconvert.core.decorators.requires`.
+
+    :return: a dictionary tool name -> version (None if unknown)
+    """
+    function = getattr(converter, "_method_{}".format(method), None)
+    versions = {}
+    for binary in getattr(function, "external_binaries", []):
+        key = ("binary", binary)
+        if key not in _versions:
+            _versions[key] = _get_binary_version(binary)
+        versions[binary] = _versions[key]
+    for library in getattr(function, "python_libraries", []):
+        key = ("library", library)
+        if key not in _versions:
+            _versions[key] = _get_library_version(library)
+        versions[library] = _versions[key]
+    return versions
+
+
+def _get_size(filenames):
+    size = 0
+    for filename in [filenames] if isinstance(filenames, str) else filenames:
+        try:
+            size += os.path.getsize(filename)
+        except (OSError, TypeError):
+            pass
+    return size
+
+
+class BenchmarkStore(object):
+    """JSON-lines file of benchmark records"""
+    def __init__(self, filename=None):
+        """.. rubric:: constructor
+
+        :param str filename: the store (defaults to the
+            BIOCONVERT_BENCHMARK_STORE environment variable or
+            benchmarks.jsonl in the user data directory)
+        """
+        self.filename = filename or os.environ.get("BIOCONVERT_BENCHMARK_STORE") \
+            or _get_default_filename()
+
+    def add(self, converter, method, times, label=None, run_id=None,
+            usages=None, cache_mode=None):
+        """Append the timings of a method of *converter* to the store
+
+        :param converter: the converter instance benchmarked
+        :param str method: the method
+        :param list times: the duration of each replicate in seconds
+        :param str label: a name for the run (e.g., "baseline" or "v0.4")
+        :param str run_id: identifier shared by the records of the same run
+        :param list usages: the resource usage of each replicate (see
+            :func:`~bioconvert.core.benchmark.run_isolated`)
+        :param str cache_mode: "warm" or "cold" page cache (see
+            :class:`~bioconvert.core.benchmark.Benchmark`)
+        :return: the record
+        """
+        import bioconvert
+        record = {
+            "run": run_id or "{:.6f}-{}".format(time.time(), os.getpid()),
+            "label": label,
+            "time": time.time(),
+            "converter": converter.name,
+            "method": method,
+            "input": converter.infile,
+            "input_size": _get_size(converter.infile),
+            "threads": getattr(converter, "threads", None),
+            "times": list(times),
+            "usages": list(usages or []),
+            "cache_mode": cache_mode,
+            "host": get_host_fingerprint(),
+            "tools": get_tool_versions(converter, method),
+            "bioconvert": bioconvert.version,
+        }
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # a single write of a line smaller than PIPE_BUF is atomic in
+        # append mode, concurrent benchmarks can share the store
+        with open(self.filename, "a") as fout:
+            fout.write(json.dumps(record, default=str) + "\n")
+        return record
+
+    def records(self, converter=None, method=None):
+        """Return the records of the store (oldest first)
+
+        :param str converter: keep only the records of this converter
+            (case insensitive)
+        :param str method: keep only the records of this method
+        """
+        records = []
+        try:
+            with open(self.filename) as fin:
+                for line in fin:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # interrupted write
+                        continue
+                    if converter and record["converter"].lower() != converter.lower():
+                        continue
+                    if method and record["method"] != method:
+                        continue
+                    records.append(record)
+        except OSError:
+            pass
+        return sorted(records, key=lambda x: x["time"])
+
+    def runs(self):
+        """Return the runs of the store as (run, label, time, number of
+        records) tuples (oldest first)"""
+        runs = OrderedDict()
+        for record in self.records():
+            run = runs.setdefault(record["run"],
+                                  [record["run"], record.get("label"), record["time"], 0])
+            run[3] += 1
+        return [tuple(x) for x in runs.values()]
+
+
+def _count_u_distribution(n1, n2):
+    """Number of rankings of two samples of sizes *n1* and *n2* for each
+    value of the Mann-Whitney U statistic (no ties)"""
+    # counts[i][j] is the distribution for samples of sizes i and j
+    counts = [[None] * (n2 + 1) for _ in range(n1 + 1)]
+    for i in range(n1 + 1):
+        for j in range(n2 + 1):
+            if i == 0 or j == 0:
+                counts[i][j] = [1]
+                continue
+            # the largest value is in the first sample (it is larger than
+            # the j values of the second one) or in the second sample
+            first, second = counts[i - 1][j], counts[i][j - 1]
+            size = i * j + 1
+            dist = [0] * size
+            for u, count in enumerate(first):
+                dist[u + j] += count
+            for u, count in enumerate(second):
+                dist[u] += count
+            counts[i][j] = dist
+    return counts[n1][n2]
+
+
+def mann_whitney_u(sample1, sample2):
+    """One-sided Mann-Whitney U test that *sample1* is larger than *sample2*
+
+    The p-value is exact for small samples without ties and uses the normal
+    approximation (with tie and continuity corrections) otherwise.
+
+    :return: the U statistic of *sample1* and the p-value
+    """
+    n1, n2 = len(sample1), len(sample2)
+    if not n1 or not n2:
+        raise ValueError("Empty sample")
+    values = sorted([(x, 0) for x in sample1] + [(x, 1) for x in sample2])
+    # ranks (averaged for ties)
+    ranks = [0] * len(values)
+    ties = []
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        if j > i:
+            ties.append(j - i + 1)
+        i = j + 1
+    rank_sum = sum(r for r, (_, group) in zip(ranks, values) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+
+    if not ties and n1 * n2 <= 2500:
+        dist = _count_u_distribution(n1, n2)
+        pvalue = sum(dist[int(math.ceil(u)):]) / sum(dist)
+        return u, pvalue
+
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - sum(t ** 3 - t for t in ties) / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def _normalised_times(record, size):
+    """Times of *record* scaled to an input of *size* bytes"""
+    if size and record.get("input_size"):
+        scale = size / record["input_size"]
+    else:
+        scale = 1
+    return [x * scale for x in record["times"]]
+
+
+def _select(records, selector):
+    """Records of the run or label *selector*"""
+    return [x for x in records if selector in (x["run"], x.get("label"))]
+
+
+def compare(records, baseline=None, current=None, threshold=0.1, alpha=0.05):
+    """Compare the timings of two benchmark runs
+
+    Records are grouped by converter, method, host fingerprint and page
+    cache mode. In each group, the *current* timings are compared to the
+    *baseline* timings with a one-sided Mann-Whitney U test. A method is a
+    regression if the test is significant and its median time increased by
+    more than *threshold*. When the input sizes differ, the baseline times
+    are scaled linearly to the current input size.
+
+    :param list records: the records (see :meth:`BenchmarkStore.records`)
+    :param str baseline: run identifier or label of the baseline. Defaults
+        to the previous record of each group.
+    :param str current: run identifier or label of the current run.
+        Defaults to the latest record of each group.
+    :param float threshold: minimum relative slowdown (0.1 for 10%)
+    :param float alpha: significance level of the test
+    :return: a list of dictionaries (one per group) with the keys
+        converter, method, host, cache_mode, baseline, current (median
+        times in seconds), ratio, pvalue and regression
+    """
+    groups = OrderedDict()
+    for record in sorted(records, key=lambda x: x["time"]):
+        key = (record["converter"], record["method"], record["host"]["fingerprint"],
+               record.get("cache_mode"))
+        groups.setdefault(key, []).append(record)
+
+    rows = []
+    for (converter, method, host, cache_mode), group in groups.items():
+        currents = _select(group, current) if current else group[-1:]
+        if not currents:
+            continue
+        # the latest run only (several records if the run was repeated)
+        currents = [x for x in currents if x["run"] == currents[-1]["run"]]
+        if baseline:
+            baselines = [x for x in _select(group, baseline)
+                         if x["run"] != currents[0]["run"]]
+            if baselines:
+                baselines = [x for x in baselines if x["run"] == baselines[-1]["run"]]
+        else:
+            previous = [x for x in group if x["time"] < currents[0]["time"]
+                        and x["run"] != currents[0]["run"]]
+            baselines = [x for x in previous if x["run"] == previous[-1]["run"]] \
+                if previous else []
+        if not baselines:
+            continue
+
+        size = currents[-1].get("input_size")
+        times = [t for x in currents for t in x["times"]]
+        reference = [t for x in baselines for t in _normalised_times(x, size)]
+        median, reference_median = _median(times), _median(reference)
+        ratio = median / reference_median if reference_median else float("inf")
+        _, pvalue = mann_whitney_u(times, reference)
+        rows.append({
+            "converter": converter,
+            "method": method,
+            "host": host,
+            "cache_mode": cache_mode,
+            "baseline": reference_median,
+            "current": median,
+            "ratio": ratio,
+            "pvalue": pvalue,
+            "regression": pvalue < alpha and ratio > 1 + threshold,
+            "baseline_run": baselines[-1]["run"],
+            "current_run": currents[-1]["run"],
+            "tools": {k: (baselines[-1]["tools"].get(k), v)
+                      for k, v in currents[-1]["tools"].items()
+                      if baselines[-1]["tools"].get(k) != v},
+        })
+    return rows
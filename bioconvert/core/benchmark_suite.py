@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Benchmark of all the converters at several input sizes
+
+:class:`BenchmarkSuite` walks the registry, creates an input of each size
+for the input format of each converter (see :func:`make_input`), runs the
+:class:`~bioconvert.core.benchmark.Benchmark` of all available methods and
+fits the scaling of the time with the input size::
+
+    from bioconvert.core.benchmark_suite import BenchmarkSuite
+    suite = BenchmarkSuite(sizes=["1M", "10M"], converters=["fastq2fasta"])
+    suite.run()
+    print(suite.to_markdown())
+
+The *exponent* of a method is the slope of log(time) as a function of
+log(size): about 1 for linear methods, 2 for quadratic ones.
+"""
+import csv
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import colorlog
+
+from bioconvert.core.cache import parse_size
+from bioconvert.core.extensions import extensions
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["BenchmarkSuite", "make_input", "find_sample", "fit_scaling"]
+
+
+#: threshold of the scaling exponent above which a method is reported as
+#: superlinear
+SUPERLINEAR_EXPONENT = 1.5
+
+# text formats made of independent records, scaled by repeating the records
+# of a sample file. The value tells which lines are headers kept once.
+_scalable_formats = {
+    "bed": (b"#", b"track", b"browser"),
+    "bedgraph": (b"#", b"track", b"browser"),
+    "csv": None,
+    "embl": (),
+    "genbank": (),
+    "gff2": (b"#",),
+    "gff3": (b"#",),
+    "sam": (b"@",),
+    "tsv": None,
+    "vcf": (b"#",),
+}
+
+
+def _get_data_directory():
+    from bioconvert import bioconvert_data
+    return os.path.dirname(bioconvert_data("README.rst"))
+
+
+def find_sample(fmt, converter=None):
+    """Return a file of the format *fmt* from the bioconvert data directory
+    (None if there is none)
+
+    Files named after *converter* (e.g., test_fastq2fasta_v1.fastq) are
+    preferred, then the largest file.
+    """
+    directory = _get_data_directory()
+    exts = tuple("." + x for x in extensions.get(fmt.lower(), []))
+    if not exts:
+        return None
+    candidates = [os.path.join(directory, x) for x in sorted(os.listdir(directory))
+                  if x.lower().endswith(exts)]
+    candidates = [x for x in candidates if os.path.isfile(x)]
+    if not candidates:
+        return None
+    if converter:
+        named = [x for x in candidates
+                 if os.path.basename(x).lower().startswith("test_" + converter.lower())]
+        if named:
+            return named[0]
+    return max(candidates, key=os.path.getsize)
+
+
+def _simulate(fmt, size, filename):
+    from bioconvert.simulator.fasta import FastaSim
+    from bioconvert.simulator.fastq import FastqSim
+    simulator = (FastqSim if fmt == "fastq" else FastaSim)(filename)
+    # one record of the simulators
+    header = len("@identifier whatever it means but long enough\n")
+    record = header + simulator.read_length + 1
+    if fmt == "fastq":
+        record += 2 + simulator.read_length + 1
+    simulator.nreads = max(1, int(math.ceil(size / record)))
+    simulator.simulate()
+
+
+def _is_header(line, prefixes):
+    return any(line.startswith(x) for x in prefixes)
+
+
+def _repeat_records(sample, size, filename, fmt):
+    with open(sample, "rb") as fin:
+        lines = fin.read().splitlines(True)
+    if lines and not lines[-1].endswith(b"\n"):
+        lines[-1] += b"\n"
+    prefixes = _scalable_formats[fmt]
+    if prefixes is None:
+        # tabulated files: the first line may be a header
+        header, body = lines[:1], lines[1:]
+    else:
+        n = 0
+        while n < len(lines) and _is_header(lines[n], prefixes):
+            n += 1
+        header, body = lines[:n], lines[n:]
+    body = b"".join(body)
+    if not body:
+        raise ValueError("{} has no record to repeat".format(sample))
+    # write about 1MB at a time
+    body *= max(1, (1 << 20) // len(body))
+    with open(filename, "wb") as fout:
+        written = fout.write(b"".join(header))
+        while written < size:
+            written += fout.write(body)
+
+
+def make_input(fmt, size, filename, converter=None):
+    """Create an input file of format *fmt* of about *size* bytes
+
+    FASTQ and FASTA files are made by the simulators of
+    :mod:`bioconvert.simulator`. Other text formats made of independent
+    records (SAM, BED, VCF, GFF, GenBank, ...) are made by repeating the
+    records of a sample file of the bioconvert data directory. Other
+    formats cannot be scaled: the sample file is copied as is.
+
+    :param str fmt: the format (e.g., "FASTQ")
+    :param int size: the size in bytes
+    :param str filename: the file to create
+    :param str converter: converter name used to choose the sample file
+    :return: True if the input was scaled to *size*, False if the sample
+        was copied, None if no input can be made for this format
+    """
+    fmt = fmt.lower()
+    if fmt in ("fastq", "fasta"):
+        _simulate(fmt, size, filename)
+        return True
+    sample = find_sample(fmt, converter)
+    if sample is None:
+        return None
+    if fmt in _scalable_formats:
+        _repeat_records(sample, size, filename, fmt)
+        return True
+    shutil.copyfile(sample, filename)
+    return False
+
+
+def fit_scaling(sizes, times):
+    """Least-squares fit of log(time) = log(a) + b * log(size)
+
+    :return: the exponent *b* (None with less than 2 distinct sizes)
+    """
+    points = [(math.log(s), math.log(t)) for s, t in zip(sizes, times)
+              if s > 0 and t > 0]
+    if len({x for x, _ in points}) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mean_x) ** 2 for x, _ in points)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    return sxy / sxx
+
+
+class BenchmarkSuite(object):
+    """Benchmark all the converters (or a selection) at several input sizes
+
+    The results are a list of dictionaries (one per converter, method and
+    size) with the keys converter, method, size (requested), input_size
+    (actual), median (seconds), bytes_per_second, records_per_second,
+    max_rss and error. The fitted scaling exponents are given by
+    :meth:`get_scaling`.
+    """
+    def __init__(self, sizes=("1M", "10M", "100M"), converters=None,
+                 methods=None, N=3, warmup=0, cache_mode="warm",
+                 directory=None, store=None, label=None, isolate=None):
+        """.. rubric:: constructor
+
+        :param list sizes: the input sizes (in bytes or strings such as
+            "100M" or "1G")
+        :param list converters: names of the converters to benchmark (e.g.,
+            fastq2fasta). Defaults to all converters with one input and one
+            output.
+        :param list methods: methods to benchmark (defaults to all)
+        :param int N: number of replicates
+        :param int warmup: number of untimed runs of each method
+        :param str cache_mode: "warm" or "cold" page cache
+        :param str directory: where the inputs and outputs are written
+            (defaults to a temporary directory removed by :meth:`run`)
+        :param store: a :class:`~bioconvert.core.benchmark_store.BenchmarkStore`
+            where the timings are saved
+        :param str label: name of the run in the *store*
+        :param bool isolate: run each replicate in a child process
+        """
+        self.sizes = sorted(parse_size(x) for x in sizes)
+        self.converters = [x.lower() for x in converters] if converters else None
+        self.methods = methods
+        self.N = N
+        self.warmup = warmup
+        self.cache_mode = cache_mode
+        self.directory = directory
+        self.store = store
+        self.label = label
+        self.isolate = isolate
+        self.results = []
+
+    def get_converters(self):
+        """Return the converters to benchmark as (converter class, input
+        format, output format) tuples"""
+        from bioconvert.core.registry import get_registry, resolve_converter
+        converters = []
+        for in_fmt, out_fmt, converter, _ in get_registry().iter_converters():
+            if len(in_fmt) != 1 or len(out_fmt) != 1:
+                continue
+            converter = resolve_converter(converter)
+            if self.converters and converter.__name__.lower() not in self.converters:
+                continue
+            converters.append((converter, in_fmt[0].lower(), out_fmt[0].lower()))
+        return sorted(converters, key=lambda x: x[0].__name__)
+
+    def _get_input(self, converter, fmt, size, directory, inputs):
+        """Return the input of *converter* of about *size* bytes (made once
+        per format and size) and whether it was scaled"""
+        if (fmt, size) not in inputs:
+            filename = os.path.join(directory, "input_{}_{}.{}".format(
+                fmt, size, extensions[fmt][0]))
+            scaled = make_input(fmt, size, filename, converter.__name__)
+            inputs[(fmt, size)] = (filename if scaled is not None else None, scaled)
+        return inputs[(fmt, size)]
+
+    def run(self):
+        """Run the benchmarks and return the results"""
+        from bioconvert.core.benchmark import Benchmark
+
+        directory = self.directory or tempfile.mkdtemp(prefix="bioconvert_bench_")
+        os.makedirs(directory, exist_ok=True)
+        inputs = {}
+        self.results = []
+        try:
+            for converter, in_fmt, out_fmt in self.get_converters():
+                if in_fmt not in extensions or out_fmt not in extensions:
+                    continue
+                outfile = os.path.join(directory, "output.{}".format(
+                    extensions[out_fmt][0]))
+                for size in self.sizes:
+                    infile, scaled = self._get_input(converter, in_fmt, size,
+                                                     directory, inputs)
+                    if infile is None:
+                        _log.warning("{}: no input available, skipped".format(
+                            converter.__name__))
+                        break
+                    _log.info("Benchmarking {} on {} ({} bytes)".format(
+                        converter.__name__, infile, os.path.getsize(infile)))
+                    self._run_benchmark(Benchmark, converter, infile, outfile, size)
+                    if not scaled:
+                        # the input cannot be scaled, one size only
+                        break
+        finally:
+            if self.directory is None:
+                shutil.rmtree(directory, ignore_errors=True)
+        return self.results
+
+    def _run_benchmark(self, Benchmark, converter, infile, outfile, size):
+        name = converter.__name__
+        try:
+            instance = converter(infile, outfile)
+            methods = instance.available_methods
+            if self.methods:
+                methods = [x for x in methods if x in self.methods]
+            bench = Benchmark(instance, N=self.N, to_include=methods,
+                              warmup=self.warmup, store=self.store,
+                              label=self.label, isolate=self.isolate,
+                              cache_mode=self.cache_mode)
+        except Exception as err:
+            _log.error("{}: {}".format(name, err))
+            self.results.append(self._result(name, None, size, infile, error=err))
+            return
+
+        for method in methods:
+            bench.to_include = [method]
+            try:
+                summary = bench.summary(rerun=True)
+            except Exception as err:
+                # one failing method does not stop the suite
+                _log.error("{} ({}): {}".format(name, method, err))
+                self.results.append(self._result(name, method, size, infile, error=err))
+                continue
+            stats = summary["methods"][0]
+            self.results.append(self._result(name, method, size, infile, stats))
+            if os.path.exists(outfile):
+                os.remove(outfile)
+
+    @staticmethod
+    def _result(converter, method, size, infile, stats=None, error=None):
+        stats = stats or {}
+        return {
+            "converter": converter,
+            "method": method,
+            "size": size,
+            "input_size": os.path.getsize(infile),
+            "median": stats.get("median"),
+            "bytes_per_second": stats.get("bytes_per_second"),
+            "records_per_second": stats.get("records_per_second"),
+            "max_rss": stats.get("max_rss"),
+            "error": None if error is None else "{}: {}".format(
+                type(error).__name__, error),
+        }
+
+    def get_scaling(self):
+        """Return the scaling exponent of each (converter, method)"""
+        points = {}
+        for result in self.results:
+            if result["error"] is None:
+                key = (result["converter"], result["method"])
+                points.setdefault(key, []).append(
+                    (result["input_size"], result["median"]))
+        return {key: fit_scaling(*zip(*values)) for key, values in points.items()}
+
+    def get_matrix(self):
+        """Return the throughput matrix: one row per converter and method
+        with the throughput (MB/s) at each size, the scaling exponent and
+        whether the method is superlinear"""
+        scaling = self.get_scaling()
+        rows = {}
+        for result in self.results:
+            key = (result["converter"], result["method"])
+            row = rows.setdefault(key, {"converter": result["converter"],
+                                        "method": result["method"],
+                                        "throughput": {}, "errors": []})
+            if result["error"] is not None:
+                row["errors"].append(result["error"])
+            elif result["bytes_per_second"] is not None:
+                row["throughput"][result["size"]] = result["bytes_per_second"] / 1e6
+        for key, row in rows.items():
+            exponent = scaling.get(key)
+            row["exponent"] = exponent
+            row["superlinear"] = exponent is not None and exponent > SUPERLINEAR_EXPONENT
+        return [rows[x] for x in sorted(rows, key=lambda x: (x[0], str(x[1])))]
+
+    def to_json(self):
+        return json.dumps({"sizes": self.sizes, "results": self.results,
+                           "matrix": self.get_matrix()}, indent=2, default=str)
+
+    def to_csv(self):
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        columns = ["converter", "method", "size", "input_size", "median",
+                   "bytes_per_second", "records_per_second", "max_rss", "error"]
+        writer.writerow(columns)
+        for result in self.results:
+            writer.writerow([result[x] for x in columns])
+        return output.getvalue()
+
+    def to_markdown(self):
+        def fmt_size(size):
+            for unit, value in (("G", 1024 ** 3), ("M", 1024 ** 2), ("K", 1024)):
+                if size >= value:
+                    return "{:g}{}".format(size / value, unit)
+            return str(size)
+
+        lines = ["## Throughput (MB/s)", "",
+                 "| converter | method | {} | exponent |".format(
+                     " | ".join(fmt_size(x) for x in self.sizes)),
+                 "|---|---|{}---|".format("---|" * len(self.sizes))]
+        for row in self.get_matrix():
+            cells = []
+            for size in self.sizes:
+                value = row["throughput"].get(size)
+                cells.append("-" if value is None else "{:.3g}".format(value))
+            exponent = "-" if row["exponent"] is None else "{:.2f}{}".format(
+                row["exponent"], " (superlinear)" if row["superlinear"] else "")
+            if row["errors"]:
+                exponent += " failed"
+            lines.append("| {} | {} | {} | {} |".format(
+                row["converter"], row["method"] or "-", " | ".join(cells), exponent))
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, filename):
+        """Save the results in *filename* (.json, .csv or .md)"""
+        formats = {".json": self.to_json, ".csv": self.to_csv,
+                   ".md": self.to_markdown}
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in formats:
+            raise ValueError("Unknown report format {} (use .json, .csv or "
+                             ".md)".format(filename))
+        with open(filename, "w") as fout:
+            fout.write(formats[ext]())
+        _log.info("Benchmark report saved in {}".format(filename))
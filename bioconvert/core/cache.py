@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Cache of conversion results
+
+The outputs of a conversion are stored in the cache under a key made of
+the hash of the inputs, the converter, the method, the extra arguments,
+the method parameters and the bioconvert version. When the same
+conversion is requested again, the stored outputs are copied (or hard
+linked) instead of running the conversion.
+
+The cache is opt-in. It is enabled with the --cache option of bioconvert,
+the *cache* argument of :class:`~bioconvert.core.converter.Bioconvert`,
+or the BIOCONVERT_CACHE environment variable (set to "content" or "fast",
+see :class:`ConversionCache`). Its directory can be changed with the
+BIOCONVERT_CACHE_DIR environment variable and its maximum size (e.g.,
+"10G") with BIOCONVERT_CACHE_SIZE.
+
+::
+
+    from bioconvert.core.cache import ConversionCache
+    cache = ConversionCache(max_size="1G")
+    for entry in cache.entries():
+        print(entry["key"], entry["size"])
+    cache.prune("500M")
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["ConversionCache", "get_cache", "set_cache", "parse_size"]
+
+
+DEFAULT_MAX_SIZE = 10 * 1024 ** 3
+
+_units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(size):
+    """Convert a size such as "500M" or "10G" into a number of bytes"""
+    if isinstance(size, int):
+        return size
+    size = size.strip().upper().rstrip("B")
+    unit = size[-1] if size and size[-1] in _units else ""
+    try:
+        return int(float(size[:len(size) - len(unit)]) * _units[unit])
+    except ValueError:
+        raise ValueError("Invalid size {}. Use for instance 500M or 10G".format(size))
+
+
+def _get_default_directory():
+    from bioconvert import configuration
+    try:
+        return configuration.appdirs.user_cache_dir
+    except AttributeError:
+        return os.path.join(os.path.expanduser("~"), ".cache", "bioconvert")
+
+
+def _as_list(filenames):
+    if isinstance(filenames, str):
+        return [filenames]
+    return list(filenames)
+
+
+def _suffixes(filename):
+    """Return the extensions of *filename* (e.g., [".fastq", ".gz"])"""
+    name = os.path.basename(filename)
+    return ["." + x for x in name.split(".")[1:]]
+
+
+def _get_parameter_names(converter):
+    """Names of the method parameters added by the converter (see
+    :meth:`~bioconvert.core.base.ConvBase.get_additional_arguments`)"""
+    names = set()
+    for arg in converter.get_additional_arguments():
+        dest = arg.kwargs_for_sub_parser.get("dest")
+        if dest is None:
+            longs = [x for x in arg.args_for_sub_parser if x.startswith("--")]
+            dest = (longs or arg.args_for_sub_parser)[0]
+        names.add(dest.lstrip("-").replace("-", "_"))
+    return names
+
+
+class ConversionCache(object):
+    """Content-addressed cache of conversion results
+
+    Each entry is a directory (named after its key) containing the output
+    files and a meta.json file. The modification time of meta.json is the
+    last time the entry was used. Least recently used entries are removed
+    when the total size of the cache exceeds *max_size*.
+    """
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE,
+                 mode="content", link=False):
+        """.. rubric:: constructor
+
+        :param str directory: where entries are stored (defaults to the user
+            cache directory)
+        :param max_size: maximum total size of the entries (in bytes, or a
+            string such as "10G")
+        :param str mode: "content" hashes the content of the input files.
+            "fast" uses their path, size, modification time and inode
+            instead (inputs modified without changing those are not
+            detected).
+        :param bool link: hard link the stored outputs instead of copying
+            them. Modifying a linked output in place also modifies the
+            cache entry.
+        """
+        if mode not in ("content", "fast"):
+            raise ValueError("mode must be 'content' or 'fast'")
+        self.directory = directory or _get_default_directory()
+        self.max_size = parse_size(max_size)
+        self.mode = mode
+        self.link = link
+
+    @classmethod
+    def from_environment(cls, mode=None):
+        """Create a cache configured by the BIOCONVERT_CACHE_DIR and
+        BIOCONVERT_CACHE_SIZE environment variables
+
+        :param str mode: "content" or "fast" (defaults to the
+            BIOCONVERT_CACHE environment variable or "content")
+        """
+        mode = mode or os.environ.get("BIOCONVERT_CACHE")
+        return cls(directory=os.environ.get("BIOCONVERT_CACHE_DIR"),
+                   max_size=os.environ.get("BIOCONVERT_CACHE_SIZE",
+                                           DEFAULT_MAX_SIZE),
+                   mode="fast" if mode == "fast" else "content")
+
+    def _hash_file(self, filename):
+        if self.mode == "fast":
+            stat = os.stat(filename)
+            return "{}:{}:{}:{}".format(os.path.realpath(filename),
+                                        stat.st_size, stat.st_mtime_ns,
+                                        stat.st_ino)
+        sha = hashlib.sha256()
+        with open(filename, "rb") as fin:
+            for chunk in iter(lambda: fin.read(1 << 20), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def get_key(self, converter, method, infile, outfile, parameters=None):
+        """Return the key of a conversion (None if it cannot be cached)
+
+        Conversions whose inputs are not regular files (e.g., prefixes or
+        named pipes) cannot be cached.
+
+        :param converter: the converter instance
+        :param str method: the conversion method
+        :param infile: the input file(s)
+        :param outfile: the output file(s). Only their extensions are used.
+        :param dict parameters: the parameters of the method
+        """
+        import bioconvert
+        infiles = _as_list(infile)
+        if not all(os.path.isfile(x) for x in infiles):
+            return None
+        parameters = parameters or {}
+        names = _get_parameter_names(converter)
+        data = {
+            "version": bioconvert.version,
+            "converter": converter.name,
+            "steps": [x[1].__name__ for x in getattr(converter, "converter_map", [])],
+            "method": method,
+            "extra": getattr(converter, "_extra_arguments", ""),
+            "parameters": {k: v for k, v in parameters.items() if k in names},
+            "inputs": [self._hash_file(x) for x in infiles],
+            "outputs": ["".join(_suffixes(x)) for x in _as_list(outfile)],
+        }
+        data = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _get_entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def _copy(self, source, destination):
+        if self.link:
+            try:
+                os.link(source, destination)
+                return
+            except OSError:
+                # e.g., not the same file system
+                pass
+        shutil.copyfile(source, destination)
+
+    def fetch(self, key, outfile):
+        """Copy the outputs stored under *key* into *outfile*
+
+        :return: True if the entry was found
+        """
+        entry = self._get_entry(key)
+        outfiles = _as_list(outfile)
+        stored = [os.path.join(entry, "output{}".format(i))
+                  for i in range(len(outfiles))]
+        if not all(os.path.isfile(x) for x in stored):
+            return False
+        for source, destination in zip(stored, outfiles):
+            if os.path.lexists(destination):
+                os.remove(destination)
+            self._copy(source, destination)
+        # keep track of the last use for the LRU eviction
+        try:
+            os.utime(os.path.join(entry, "meta.json"))
+        except OSError:
+            pass
+        return True
+
+    def store(self, key, outfile, **meta):
+        """Store the outputs of a conversion under *key*
+
+        :param meta: information stored with the entry (shown by
+            :meth:`entries`)
+        :return: True if the outputs were stored
+        """
+        outfiles = _as_list(outfile)
+        if not all(os.path.isfile(x) for x in outfiles):
+            return False
+        entry = self._get_entry(key)
+        if os.path.exists(entry):
+            return True
+
+        tmpdir = "{}.{}.tmp".format(entry, os.getpid())
+        try:
+            os.makedirs(tmpdir)
+            size = 0
+            for i, filename in enumerate(outfiles):
+                self._copy(filename, os.path.join(tmpdir, "output{}".format(i)))
+                size += os.path.getsize(filename)
+            meta.update({"size": size, "created": time.time(),
+                         "outputs": outfiles})
+            with open(os.path.join(tmpdir, "meta.json"), "w") as fout:
+                json.dump(meta, fout, default=str)
+            os.rename(tmpdir, entry)
+        except OSError as err:
+            # another process stored the same entry or disk error
+            _log.debug("conversion not cached: {}".format(err))
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            return os.path.exists(entry)
+
+        self.prune()
+        return True
+
+    def entries(self):
+        """Return the entries of the cache (most recently used first)
+
+        Each entry is a dictionary with the key, size, last_used time and
+        the information given to :meth:`store`.
+        """
+        entries = []
+        try:
+            keys = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for key in keys:
+            filename = os.path.join(self.directory, key, "meta.json")
+            try:
+                with open(filename) as fin:
+                    meta = json.load(fin)
+                meta["last_used"] = os.path.getmtime(filename)
+            except (OSError, ValueError):
+                # temporary or broken entry
+                continue
+            meta["key"] = key
+            entries.append(meta)
+        return sorted(entries, key=lambda x: x["last_used"], reverse=True)
+
+    def get_size(self):
+        """Return the total size of the entries (in bytes)"""
+        return sum(x["size"] for x in self.entries())
+
+    def remove(self, key):
+        """Remove the entry *key*"""
+        shutil.rmtree(self._get_entry(key), ignore_errors=True)
+
+    def prune(self, max_size=None):
+        """Remove the least recently used entries until the total size is
+        below *max_size* (defaults to the maximum size of the cache)
+
+        :return: the removed entries
+        """
+        max_size = self.max_size if max_size is None else parse_size(max_size)
+        entries = self.entries()
+        size = sum(x["size"] for x in entries)
+        removed = []
+        while entries and size > max_size:
+            entry = entries.pop()
+            self.remove(entry["key"])
+            size -= entry["size"]
+            removed.append(entry)
+        return removed
+
+    def clear(self):
+        """Remove all entries"""
+        return self.prune(0)
+
+
+_cache = None
+
+
+def set_cache(cache):
+    """Set the cache used by all conversions
+
+    :param cache: a :class:`ConversionCache`, or None to use the
+        BIOCONVERT_CACHE environment variable, or False to disable the cache
+    """
+    global _cache
+    _cache = cache
+
+
+def get_cache():
+    """Return the cache used by the conversions (None if disabled)"""
+    if _cache is not None:
+        return _cache or None
+    mode = os.environ.get("BIOCONVERT_CACHE")
+    if not mode or mode == "0":
+        return None
+    return ConversionCache.from_environment(mode)
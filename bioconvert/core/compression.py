@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Compression backends used to read and write compressed files
+
+The fastest implementation available at runtime is used:
+
+* gzip: the python-isal (igzip) or zlib-ng libraries (multi-threaded and
+  in-process), the external pigz tool, a multi-threaded block compressor
+  written in Python (output only) and finally the gzip standard library.
+* bzip2: the external pbzip2 tool or the bz2 standard library.
+* dsrc: the external dsrc tool.
+
+::
+
+    from bioconvert.core.compression import open_compressed
+    with open_compressed("test.fastq.gz", "rt", threads=4) as fin:
+        for line in fin:
+            pass
+
+"""
+import bz2
+import gzip
+import io
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["open_compressed", "compress_file", "decompress_file",
+           "get_compression", "get_backend", "COMPRESSIONS"]
+
+
+COMPRESSIONS = (".gz", ".bz2", ".dsrc")
+
+
+def get_compression(filename):
+    """Return the compression extension of *filename* (None if the file is
+    not compressed)
+
+    ::
+
+        >>> get_compression("test.fastq.gz")
+        '.gz'
+
+    """
+    for compression in COMPRESSIONS:
+        if filename.endswith(compression):
+            return compression
+    return None
+
+
+def _is_installed(executable):
+    from bioconvert.core.decorators import dependency_cache
+    return not dependency_cache.is_binary_missing(executable)
+
+
+def _has_module(name):
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+class _PipeFile(io.RawIOBase):
+    """File object reading from (or writing into) an external process
+
+    The command is a list of arguments, run without shell so that the
+    filenames do not need to be quoted. In write mode, the output of the
+    command is written into *outfile* (if given).
+
+    Closing the file waits for the process and raises an error if the
+    process failed.
+    """
+    def __init__(self, args, mode, outfile=None):
+        super().__init__()
+        self._args = args
+        self._mode = mode
+        if mode == "r":
+            self._process = subprocess.Popen(args,
+                stdout=subprocess.PIPE, start_new_session=True)
+            self._pipe = self._process.stdout
+        else:
+            output = open(outfile, "wb") if outfile is not None else None
+            try:
+                self._process = subprocess.Popen(args, stdin=subprocess.PIPE,
+                    stdout=output, start_new_session=True)
+            finally:
+                # the process has its own copy of the file descriptor
+                if output is not None:
+                    output.close()
+            self._pipe = self._process.stdin
+
+    def readable(self):
+        return self._mode == "r"
+
+    def writable(self):
+        return self._mode == "w"
+
+    def readinto(self, buffer):
+        return self._pipe.readinto(buffer)
+
+    def write(self, data):
+        return self._pipe.write(data)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self._pipe.close()
+        status = self._process.wait()
+        # the reader may be closed before the end of the data
+        allowed = (0, -signal.SIGPIPE, 128 + signal.SIGPIPE) \
+            if self._mode == "r" else (0,)
+        if status not in allowed:
+            raise IOError("command '{}' failed with status {}".format(
+                " ".join(map(shlex.quote, self._args)), status))
+
+
+class _ThreadedGzipWriter(io.RawIOBase):
+    """Multi-threaded gzip writer
+
+    Data is split into blocks compressed in parallel (zlib releases the GIL)
+    as independent gzip members. The concatenation of gzip members is a
+    valid gzip file.
+    """
+    def __init__(self, filename, threads, block_size=1 << 20, compresslevel=6):
+        super().__init__()
+        self._file = open(filename, "wb")
+        self._block_size = block_size
+        self._compresslevel = compresslevel
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._max_pending = 2 * threads
+        self._pending = deque()
+
+    def writable(self):
+        return True
+
+    def _compress(self, data):
+        compressor = zlib.compressobj(self._compresslevel, zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def _submit(self, data):
+        self._pending.append(self._executor.submit(self._compress, data))
+        while len(self._pending) > self._max_pending:
+            self._file.write(self._pending.popleft().result())
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            self._submit(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self._file.close()
+            super().close()
+
+
+def _open_isal(filename, mode, threads):
+    from isal import igzip_threaded
+    return igzip_threaded.open(filename, mode, threads=threads)
+
+
+def _open_zlib_ng(filename, mode, threads):
+    from zlib_ng import gzip_ng_threaded
+    return gzip_ng_threaded.open(filename, mode, threads=threads)
+
+
+def _open_pigz(filename, mode, threads):
+    if mode == "rb":
+        args = ["unpigz", "-c", "-p", str(threads), filename]
+        return io.BufferedReader(_PipeFile(args, "r"))
+    args = ["pigz", "-c", "-p", str(threads)]
+    return io.BufferedWriter(_PipeFile(args, "w", outfile=filename))
+
+
+def _open_python_threaded(filename, mode, threads):
+    if mode == "rb":
+        return gzip.open(filename, mode)
+    return io.BufferedWriter(_ThreadedGzipWriter(filename, threads))
+
+
+def _open_gzip(filename, mode, threads):
+    return gzip.open(filename, mode)
+
+
+def _open_pbzip2(filename, mode, threads):
+    if mode == "rb":
+        args = ["pbzip2", "-dc", "-p{}".format(threads), filename]
+        return io.BufferedReader(_PipeFile(args, "r"))
+    args = ["pbzip2", "-c", "-p{}".format(threads)]
+    return io.BufferedWriter(_PipeFile(args, "w", outfile=filename))
+
+
+def _open_bz2(filename, mode, threads):
+    return bz2.open(filename, mode)
+
+
+def _open_dsrc(filename, mode, threads):
+    if mode == "rb":
+        args = ["dsrc", "d", "-s", "-t{}".format(threads), filename]
+        return io.BufferedReader(_PipeFile(args, "r"))
+    args = ["dsrc", "c", "-s", "-t{}".format(threads), filename]
+    return io.BufferedWriter(_PipeFile(args, "w"))
+
+
+# For each compression, the backends by order of preference. Each backend
+# is (name, function telling whether the backend is available, opener).
+_backends = {
+    ".gz": [
+        ("isal", lambda: _has_module("isal"), _open_isal),
+        ("zlib-ng", lambda: _has_module("zlib_ng"), _open_zlib_ng),
+        ("pigz", lambda: _is_installed("pigz") and _is_installed("unpigz"), _open_pigz),
+        ("python-threaded", lambda: True, _open_python_threaded),
+        ("python", lambda: True, _open_gzip),
+    ],
+    ".bz2": [
+        ("pbzip2", lambda: _is_installed("pbzip2"), _open_pbzip2),
+        ("python", lambda: True, _open_bz2),
+    ],
+    ".dsrc": [
+        ("dsrc", lambda: _is_installed("dsrc"), _open_dsrc),
+    ],
+}
+
+_available_backends = {}
+_available_backends_lock = threading.Lock()
+
+
+def get_backend(compression, threads=1, backend=None):
+    """Return the name of the backend used for a compression
+
+    :param str compression: one of :data:`COMPRESSIONS`
+    :param int threads: number of threads requested. With one thread,
+        in-process backends are preferred to external tools.
+    :param str backend: name of the backend to use. If None, the
+        environment variable BIOCONVERT_<COMPRESSION>_BACKEND (e.g.,
+        BIOCONVERT_GZ_BACKEND) is used if set. Otherwise, the fastest
+        available backend is selected.
+    """
+    if compression not in _backends:
+        raise ValueError("Unknown compression {}. Use one of {}".format(
+            compression, COMPRESSIONS))
+
+    backend = backend or os.environ.get(
+        "BIOCONVERT_{}_BACKEND".format(compression.lstrip(".").upper()))
+    names = [name for name, _, _ in _backends[compression]]
+    if backend is not None:
+        if backend not in names:
+            raise ValueError("Unknown backend {} for {}. Use one of {}".format(
+                backend, compression, names))
+        return backend
+
+    key = (compression, threads > 1)
+    with _available_backends_lock:
+        if key not in _available_backends:
+            candidates = _backends[compression]
+            if threads <= 1:
+                # no need to start an external process for a single thread
+                candidates = [x for x in candidates if x[0] not in ("pigz", "pbzip2")] \
+                    or candidates
+            for name, is_available, _ in candidates:
+                if is_available():
+                    _available_backends[key] = name
+                    break
+            else:
+                raise IOError("No backend available for {} compression".format(compression))
+        return _available_backends[key]
+
+
+def open_compressed(filename, mode="rb", threads=1, backend=None,
+                    compression=None):
+    """Open a compressed file using the fastest backend available
+
+    :param str filename: the file to read or write. The compression is
+        inferred from the extension (.gz, .bz2 or .dsrc). Files without those
+        extensions are opened as regular files.
+    :param str mode: r, rb, rt, w, wb or wt (binary by default)
+    :param int threads: number of threads that the backend can use
+    :param str backend: force a backend (see :func:`get_backend`)
+    :param str compression: the compression (one of :data:`COMPRESSIONS`)
+        if it cannot be inferred from the filename extension
+    :return: a file object
+    """
+    if mode not in ("r", "rb", "rt", "w", "wb", "wt"):
+        raise ValueError("Invalid mode {}".format(mode))
+    text = mode.endswith("t")
+    binary_mode = mode[0] + "b"
+
+    compression = compression or get_compression(filename)
+    if compression is None:
+        return open(filename, mode)
+
+    name = get_backend(compression, threads=threads, backend=backend)
+    opener = [x[2] for x in _backends[compression] if x[0] == name][0]
+    _log.debug("Opening {} with {} backend".format(filename, name))
+    fileobj = opener(filename, binary_mode, max(1, threads))
+    if text:
+        return io.TextIOWrapper(fileobj)
+    return fileobj
+
+
+def decompress_file(infile, outfile, threads=1, backend=None):
+    """Decompress *infile* into *outfile*"""
+    with open_compressed(infile, "rb", threads=threads, backend=backend) as fin, \
+            open(outfile, "wb") as fout:
+        shutil.copyfileobj(fin, fout, 1 << 20)
+
+
+def compress_file(infile, outfile, threads=1, backend=None):
+    """Compress *infile* into *outfile* (compression inferred from *outfile*
+    extension)"""
+    with open(infile, "rb") as fin, \
+            open_compressed(outfile, "wb", threads=threads, backend=backend) as fout:
+        shutil.copyfileobj(fin, fout, 1 << 20)
@@ -24,20 +24,25 @@
 ###########################################################################
 """.. rubric:: Standalone application dedicated to conversion"""
 import os
+import time
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
 
 import colorlog
 
 from bioconvert.core.base import ConvMeta
-from bioconvert.core.registry import Registry
+from bioconvert.core.registry import get_registry
 
 _log = colorlog.getLogger(__name__)
 
 from bioconvert.core.base import make_chain
+from bioconvert.core.cache import ConversionCache, get_cache
 from bioconvert.core.utils import get_extension as getext
 from bioconvert.core.utils import get_format_from_extension
+from bioconvert.core.utils import get_jobs_and_threads
 import sys
 
-__all__ = ['Bioconvert']
+__all__ = ['Bioconvert', 'BatchConverter', 'ConversionResult']
 
 
 class Bioconvert(object):
@@ -51,13 +56,17 @@ class Bioconvert(object):
 
     """
     def __init__(self, infile, outfile, force=False,
-            threads=None, extra=None):
+            threads=None, extra=None, cache=None):
         """.. rubric:: constructor
 
         :param str infile: The path of the input file.
         :param str outfile: The path of The output file
         :param bool force: overwrite output file if it exists already
             otherwise raises an error
+        :param cache: a :class:`~bioconvert.core.cache.ConversionCache`
+            used to skip conversions already done, True to use the default
+            cache, False to disable it. By default, the cache is used only
+            if enabled globally (see :func:`~bioconvert.core.cache.get_cache`).
 
         """
         # don't check the input file because there are cases where input parameter is just a prefix
@@ -77,25 +86,7 @@ class Bioconvert(object):
 
         # some checking on the output files (existence, special case of dsrc)
         for filename in outfile:
-            if os.path.exists(filename) is True:
-                msg = "output file {} exists already.".format(filename)
-                if force is False:
-                    _log.critical("output file exists. If you are using bioconvert, use --force ")
-                    raise ValueError(msg)
-                else:
-                    _log.warning(msg + " --force used so will be over written")
-
-            # Only fastq files can be compressed with dsrc
-            if filename.endswith(".dsrc"):
-                # only valid for FastQ files extension
-                # dsrc accepts only .fastq file extension
-                if filename.endswith(".fastq.dsrc") is False:
-                    msg = "When compressing with .dsrc extension, " +\
-                        "only files ending with .fastq extension are " +\
-                        "accepted. This is due to the way dsrc executable "+\
-                        "is implemented."
-                    _log.critical(msg)
-                    raise IOError
+            self._check_output_file(filename, force)
 
         Lin = len(infile)
         Lout = len(outfile)
@@ -128,7 +119,7 @@ class Bioconvert(object):
                 self.inext = [getext(infile[0])]
                 self.outext = [getext(outfile[0])]
 
-        self.mapper = Registry()
+        self.mapper = get_registry()
 
         # From the input parameters 1 and 2, we get the module name
         if not list(set(list(self.mapper.get_converters_names())).intersection(sys.argv)):
@@ -151,31 +142,10 @@ class Bioconvert(object):
         _log.info("Input: {}".format(self.in_fmt))
         _log.info("Output: {}".format(self.out_fmt))
 
-        try:
-            class_converter = self.mapper[(self.in_fmt, self.out_fmt)]
+        class_converter = self.get_converter_class(self.in_fmt, self.out_fmt)
+        if (self.in_fmt, self.out_fmt) in self.mapper:
             self.name = class_converter.__name__
 
-        except KeyError:
-            # This module name was not found
-            # Try to find path of converters
-            conv_path = self.mapper.conversion_path(self.in_fmt, self.out_fmt)
-            _log.debug("path: {}".format(conv_path))
-            if conv_path:
-                _log.info("Direct conversion not implemented. "
-                          "Chaining converters.")
-                # implemented in bioconvert/core/base.py
-                # using temporary files
-                class_converter = make_chain([
-                    (pair, self.mapper[pair]) for pair in conv_path])
-            else:
-                msg = "Requested input format ('{}') to output format ('{}') is not available in bioconvert".format(
-                    self.in_fmt,
-                    self.out_fmt,
-                )
-                _log.critical(msg)
-                _log.critical("Use --formats to know the available formats and --help for examples")
-                raise Exception(msg)
-
         # If --threads provided, we update the threads attribute
 
 
@@ -193,13 +163,266 @@ class Bioconvert(object):
             self.converter.threads = threads
         if extra:
             self.converter._extra_arguments = extra
+        if cache is True:
+            cache = get_cache() or ConversionCache.from_environment()
+        if cache is not None:
+            self.converter.cache = cache
 
         _log.info("Using {} class (with {} threads if needed)".format(
             self.converter.name,
             self.converter.threads))
 
+    @staticmethod
+    def _check_output_file(filename, force=False):
+        """Check existence of the output file and special case of dsrc"""
+        if os.path.exists(filename) is True:
+            msg = "output file {} exists already.".format(filename)
+            if force is False:
+                _log.critical("output file exists. If you are using bioconvert, use --force ")
+                raise ValueError(msg)
+            else:
+                _log.warning(msg + " --force used so will be over written")
+
+        # Only fastq files can be compressed with dsrc
+        if filename.endswith(".dsrc"):
+            # only valid for FastQ files extension
+            # dsrc accepts only .fastq file extension
+            if filename.endswith(".fastq.dsrc") is False:
+                msg = "When compressing with .dsrc extension, " +\
+                    "only files ending with .fastq extension are " +\
+                    "accepted. This is due to the way dsrc executable "+\
+                    "is implemented."
+                _log.critical(msg)
+                raise IOError
+
+    @staticmethod
+    def get_converter_class(in_fmt, out_fmt):
+        """Return the converter class from *in_fmt* to *out_fmt*
+
+        If there is no direct conversion, converters are chained (see
+        :func:`~bioconvert.core.base.make_chain`).
+
+        :param tuple in_fmt: the input formats (e.g., ("FASTQ",))
+        :param tuple out_fmt: the output formats
+        """
+        mapper = get_registry()
+        try:
+            return mapper[(in_fmt, out_fmt)]
+        except KeyError:
+            # This module name was not found
+            # Try to find path of converters
+            conv_path = mapper.conversion_path(in_fmt, out_fmt)
+            _log.debug("path: {}".format(conv_path))
+            if conv_path:
+                _log.info("Direct conversion not implemented. "
+                          "Chaining converters.")
+                # implemented in bioconvert/core/base.py
+                return make_chain([(pair, mapper[pair]) for pair in conv_path],
+                                  in_fmt, out_fmt)
+            else:
+                msg = "Requested input format ('{}') to output format ('{}') is not available in bioconvert".format(
+                    in_fmt,
+                    out_fmt,
+                )
+                _log.critical(msg)
+                _log.critical("Use --formats to know the available formats and --help for examples")
+                raise Exception(msg)
+
+    @staticmethod
+    def get_formats(infile, outfile):
+        """Return the input and output formats of a conversion inferred
+        from the file extensions
+
+        ::
+
+            >>> Bioconvert.get_formats("test.fastq.gz", "test.fasta")
+            (('FASTQ',), ('FASTA',))
+
+        """
+        infile = [infile] if isinstance(infile, str) else infile
+        outfile = [outfile] if isinstance(outfile, str) else outfile
+        inext = [getext(x, remove_compression=True) for x in infile]
+        outext = [getext(x, remove_compression=True) for x in outfile]
+        # decompression/compression mode (e.g., fastq.gz to fastq.bz2)
+        if len(infile) == len(outfile) == 1 and inext == outext:
+            inext = [getext(infile[0])]
+            outext = [getext(outfile[0])]
+        return (tuple(get_format_from_extension(x) for x in inext),
+                tuple(get_format_from_extension(x) for x in outext))
+
+    @classmethod
+    def map(cls, pairs, method=None, executor="process", max_workers=None,
+            force=False, threads=None, extra=None, ordered=False, **kwargs):
+        """Convert several files concurrently
+
+        ::
+
+            from bioconvert import Bioconvert
+            pairs = [("A.fastq", "A.fasta"), ("B.fastq", "B.fasta")]
+            for result in Bioconvert.map(pairs, max_workers=2):
+                print(result.infile, result.time, result.error)
+
+        :param pairs: list of (infile, outfile) pairs
+        :param str method: the conversion method (defaults to the default
+            method of each converter)
+        :return: an iterator over :class:`ConversionResult` (in the order of
+            completion unless *ordered* is True)
+
+        See :class:`BatchConverter` for the other parameters.
+        """
+        batch = BatchConverter(pairs, executor=executor,
+                               max_workers=max_workers, force=force,
+                               threads=threads, extra=extra)
+        return batch.run(method=method, ordered=ordered, **kwargs)
+
     def __call__(self, *args, **kwargs):
         self.converter(*args, **kwargs)
 
     def boxplot_benchmark(self, *args, **kwargs):
         self.converter.boxplot_benchmark(*args, **kwargs)
+
+
+class ConversionResult(object):
+    """Result of a conversion run by :class:`BatchConverter`
+
+    :attr:`error` is the exception raised by the conversion (None if the
+    conversion succeeded) and :attr:`time` its duration in seconds.
+    """
+    def __init__(self, infile, outfile, converter, method, time, error=None):
+        self.infile = infile
+        self.outfile = outfile
+        self.converter = converter
+        self.method = method
+        self.time = time
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "ConversionResult({} -> {}, time={:.3f}, error={!r})".format(
+            self.infile, self.outfile, self.time, self.error)
+
+
+# converter classes resolved by the current (worker) process
+_converter_classes = {}
+
+
+def _convert(infile, outfile, formats, method, force, threads, extra, kwargs):
+    """Convert *infile* into *outfile* (run by the workers of
+    :class:`BatchConverter`)"""
+    t1 = time.time()
+    name = None
+    try:
+        if formats not in _converter_classes:
+            _converter_classes[formats] = Bioconvert.get_converter_class(*formats)
+        class_converter = _converter_classes[formats]
+        name = class_converter.__name__
+        for filename in [outfile] if isinstance(outfile, str) else outfile:
+            Bioconvert._check_output_file(filename, force)
+        converter = class_converter(infile, outfile)
+        if threads is not None:
+            converter.threads = threads
+        if extra:
+            converter._extra_arguments = extra
+        converter(method_name=method, **kwargs)
+        error = None
+    except Exception as err:
+        error = err
+    return ConversionResult(infile, outfile, name, method, time.time() - t1,
+                            error=error)
+
+
+class BatchConverter(object):
+    """Convert several files concurrently
+
+    The converter classes are resolved once for each pair of input/output
+    formats and the conversions are run by a pool of processes (pure
+    python methods are not limited by the GIL) or threads (enough for
+    methods calling external tools).
+
+    ::
+
+        from bioconvert.core.converter import BatchConverter
+        pairs = [("A.fastq", "A.fasta"), ("B.fastq", "B.fasta")]
+        with BatchConverter(pairs, executor="thread", max_workers=2) as batch:
+            futures = batch.submit(method="biopython")
+            for future in futures:
+                print(future.result())
+
+    """
+    def __init__(self, pairs, executor="process", max_workers=None,
+                 force=False, threads=None, extra=None):
+        """.. rubric:: constructor
+
+        :param pairs: list of (infile, outfile) pairs
+        :param str executor: "process" or "thread"
+        :param int max_workers: number of concurrent conversions (defaults
+            to the number of cores)
+        :param bool force: overwrite the output files if they exist
+        :param int threads: number of threads of each conversion. Defaults
+            to the number of cores divided by *max_workers*.
+        :param str extra: extra arguments passed to the tools
+        """
+        if executor not in ("process", "thread"):
+            raise ValueError("executor must be 'process' or 'thread'")
+        self.pairs = list(pairs)
+        self.executor = executor
+        self.max_workers, self.threads = get_jobs_and_threads(
+            max_workers or 0, threads or 1, threads_set=threads is not None,
+            max_jobs=len(self.pairs))
+        self.force = force
+        self.extra = extra
+        self._executor = None
+
+        # resolve the converters once (and fail early if a conversion is
+        # not available)
+        self.formats = [Bioconvert.get_formats(infile, outfile)
+                        for infile, outfile in self.pairs]
+        for formats in set(self.formats):
+            if formats not in _converter_classes:
+                _converter_classes[formats] = Bioconvert.get_converter_class(*formats)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        """Release the workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def submit(self, method=None, **kwargs):
+        """Submit all conversions and return their futures (in the order of
+        the pairs). The result of each future is a :class:`ConversionResult`.
+
+        :param str method: the conversion method (defaults to the default
+            method of each converter)
+        :param kwargs: other parameters of the conversion methods
+        """
+        if self._executor is None:
+            if self.executor == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return [self._executor.submit(_convert, infile, outfile, formats,
+                                      method, self.force, self.threads,
+                                      self.extra, kwargs)
+                for (infile, outfile), formats in zip(self.pairs, self.formats)]
+
+    def run(self, method=None, ordered=False, **kwargs):
+        """Run all conversions and yield their :class:`ConversionResult`
+
+        :param bool ordered: yield the results in the order of the pairs
+            instead of the order of completion
+        """
+        try:
+            futures = self.submit(method=method, **kwargs)
+            for future in futures if ordered else as_completed(futures):
+                yield future.result()
+        finally:
+            self.shutdown()
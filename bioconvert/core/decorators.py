@@ -22,6 +22,12 @@
 # If not, see <http://www.gnu.org/licenses/>.                             #
 ###########################################################################
 """Provides a general tool to perform pre/post compression"""
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
 from distutils.spawn import find_executable
 from functools import wraps
 from os.path import splitext
@@ -30,6 +36,10 @@ import colorlog
 import pkg_resources
 from easydev import TempFile
 
+from bioconvert.core.compression import (compress_file, decompress_file,
+                                         get_compression, open_compressed)
+from bioconvert.core.utils import get_environment_state
+
 _log = colorlog.getLogger(__name__)
 
 
@@ -52,11 +62,170 @@ def make_in_gz_tester(converter):
     return is_in_gz
 
 
+def streamable(func):
+    """Marks a function as reading its input and writing its output
+    sequentially so that they can be pipes (see :func:`compressor` and
+    :func:`~bioconvert.core.base.make_chain`).
+
+    The tag is copied by the other decorators so it must be applied first
+    (i.e., placed just above the method definition)."""
+    func.streamable = True
+    return func
+
+
+def is_streamable(converter, method=None):
+    """Tells whether the *method* of *converter* has the *streamable* tag.
+
+    :param converter: a converter class
+    :param str method: the method name. Defaults to the default method of
+        the converter.
+    """
+    if method is None:
+        method = converter._get_default_method(converter)
+    return getattr(getattr(
+        converter, "_method_{}".format(method), None), "streamable", False)
+
+
+def _split_compression(filename):
+    """Return the filename without its compression extension and the
+    compression extension (None if the file is not compressed)"""
+    if isinstance(filename, str):
+        compression = get_compression(filename)
+        if compression:
+            return filename[:-len(compression)], compression
+    return filename, None
+
+
+class _FifoThread(threading.Thread):
+    """Thread copying data between a named pipe and a compressed file
+
+    If *decompress* is True, *filename* is decompressed into the *fifo*.
+    Otherwise, data read from the *fifo* is compressed into *filename*.
+    The exception raised by the copy (if any) is stored in *error*.
+    """
+    def __init__(self, fifo, filename, threads, decompress):
+        super().__init__(daemon=True)
+        self.fifo = fifo
+        self.filename = filename
+        self.threads = threads
+        self.decompress = decompress
+        self.error = None
+
+    def run(self):
+        try:
+            if self.decompress:
+                # the fifo is opened first so that the reader gets EOF
+                # (instead of being blocked) if the input cannot be read
+                with open(self.fifo, "wb") as fout, \
+                        open_compressed(self.filename, "rb", self.threads) as fin:
+                    shutil.copyfileobj(fin, fout, 1 << 20)
+            else:
+                with open(self.fifo, "rb") as fin, \
+                        open_compressed(self.filename, "wb", self.threads) as fout:
+                    shutil.copyfileobj(fin, fout, 1 << 20)
+        except BrokenPipeError:
+            # the converter did not read all data
+            pass
+        except BaseException as err:
+            self.error = err
+
+    def release(self):
+        """Wait for the end of the thread.
+
+        The fifo is opened (non blocking) and closed until the thread ends so
+        that it is not blocked forever if the converter did not open the fifo
+        (or did not consume all data).
+        """
+        flags = os.O_RDONLY if self.decompress else os.O_WRONLY
+        while self.is_alive():
+            try:
+                os.close(os.open(self.fifo, flags | os.O_NONBLOCK))
+            except OSError:
+                # no thread at the other end of the fifo yet
+                pass
+            self.join(0.1)
+
+
+def _run_streaming(func, inst, input_compressed, output_compressed,
+                   *args, **kwargs):
+    """Run *func* with its input and/or output replaced by named pipes.
+
+    The (de)compression runs in threads (see
+    :func:`~bioconvert.core.compression.open_compressed`) concurrently with
+    the conversion, reading from or writing into the pipes, so that no
+    uncompressed copy of the data is written on disk.
+    """
+    infile_name = inst.infile
+    outfile_name = inst.outfile
+    fifo_dir = tempfile.mkdtemp(prefix="bioconvert_")
+    threads = []
+    try:
+        if input_compressed:
+            (_, base_suffix) = splitext(infile_name[:-len(input_compressed)])
+            input_fifo = os.path.join(fifo_dir, "input" + base_suffix)
+            os.mkfifo(input_fifo)
+            _log.info("Streaming decompression of {}".format(infile_name))
+            threads.append(_FifoThread(input_fifo, infile_name,
+                                       inst.threads, decompress=True))
+            inst.infile = input_fifo
+
+        if output_compressed:
+            (_, base_suffix) = splitext(outfile_name)
+            output_fifo = os.path.join(fifo_dir, "output" + base_suffix)
+            os.mkfifo(output_fifo)
+            _log.info("Streaming compression into {}".format(
+                outfile_name + output_compressed))
+            threads.append(_FifoThread(output_fifo,
+                                       outfile_name + output_compressed,
+                                       inst.threads, decompress=False))
+            inst.outfile = output_fifo
+
+        for thread in threads:
+            thread.start()
+        try:
+            results = func(inst, *args, **kwargs)
+        finally:
+            for thread in threads:
+                thread.release()
+
+        for thread in threads:
+            if thread.error is not None:
+                raise thread.error
+    finally:
+        inst.infile = infile_name
+        inst.outfile = outfile_name
+        shutil.rmtree(fifo_dir, ignore_errors=True)
+
+    if output_compressed:
+        inst.outfile = outfile_name + output_compressed
+    return results
+
+
+def _compress_output(inst, output_compressed):
+    """Compress the output file and restore inst output file name"""
+    if output_compressed:
+        _log.info("Compressing output into {}".format(output_compressed))
+        compress_file(inst.outfile, inst.outfile + output_compressed,
+                      threads=inst.threads)
+        os.remove(inst.outfile)
+        inst.outfile = inst.outfile + output_compressed
+
+
 def compressor(func):
-    """Decompress/compress input file without pipes
+    """Decompress/compress input file
+
+    If the method is tagged with :func:`streamable` (which must then be the
+    first decorator applied), the data is (de)compressed on the fly through
+    named pipes: the (de)compression and the conversion run concurrently and
+    no uncompressed copy is written on disk.
+
+    Otherwise, pipes are not used: we decompress the input file into a
+    temporary file and compress back the output file. The advantage is that
+    it should work for any files (even very large).
 
-    Does not use pipe: we decompress and compress back the input file.
-    The advantage is that it should work for any files (even very large).
+    Input and output files can be compressed with gzip (.gz), bzip2 (.bz2)
+    or dsrc (.dsrc, only for fastq files). The fastest backend available is
+    used (see :func:`~bioconvert.core.compression.open_compressed`).
 
     This decorator should be used by method that uses pure python code
     """
@@ -65,18 +234,19 @@ def compressor(func):
     @wraps(func)
     def wrapped(inst, *args, **kwargs):
         infile_name = inst.infile
-        if type(inst.outfile) is not list:
-
-            output_compressed = None
-            if inst.outfile.endswith(".gz"):
-                (inst.outfile, output_compressed) = splitext(inst.outfile)
-            elif inst.outfile.endswith(".bz2"):
-                (inst.outfile, output_compressed) = splitext(inst.outfile)
-            elif inst.outfile.endswith(".dsrc"):  # !!! only for fastq files
-                (inst.outfile, output_compressed) = splitext(inst.outfile)
-            # Now inst has the uncompressed output file name
-
-        if infile_name.endswith(".gz"):
+        (_, input_compressed) = _split_compression(inst.infile)
+        (outfile_name, output_compressed) = _split_compression(inst.outfile)
+
+        if (input_compressed or output_compressed) and hasattr(os, "mkfifo") \
+                and getattr(func, "streamable", False):
+            inst.outfile = outfile_name
+            return _run_streaming(func, inst, input_compressed,
+                                  output_compressed, *args, **kwargs)
+
+        # Now inst has the uncompressed output file name
+        inst.outfile = outfile_name
+
+        if input_compressed:
             # decompress input
             # TODO: https://stackoverflow.com/a/29371584/1878788
             _log.info("Generating uncompressed version of {} ".format(infile_name))
@@ -84,8 +254,7 @@ def compressor(func):
             (_, base_suffix) = splitext(ungz_name)
             with TempFile(suffix=base_suffix) as ungz_infile:
                 inst.infile = ungz_infile.name
-                inst.shell("unpigz -c -p {} {} > {}".format(
-                    inst.threads, infile_name, inst.infile))
+                decompress_file(infile_name, inst.infile, threads=inst.threads)
                 # computation
                 results = func(inst, *args, **kwargs)
             inst.infile = infile_name
@@ -93,27 +262,17 @@ def compressor(func):
             results = func(inst, *args, **kwargs)
 
         # Compress output and restore inst output file name
-        if output_compressed == ".gz":
-            # TODO: this uses -f ; should be a
-            _log.info("Compressing output into .gz")
-            inst.shell("pigz -f -p {} {}".format(inst.threads, inst.outfile))
-            inst.outfile = inst.outfile + ".gz"
-        elif output_compressed == ".bz2":
-            _log.info("Compressing output into .bz2")
-            inst.shell("pbzip2 -f -p{} {}".format(inst.threads, inst.outfile))
-            inst.outfile = inst.outfile + ".bz2"
-        elif output_compressed == ".dsrc":  # !!! only for FastQ files
-            _log.info("Compressing output into .dsrc")
-            inst.shell("dsrc c -t{} {} {}.dsrc".format(
-                inst.threads, inst.outfile, inst.outfile))
-            inst.outfile = inst.outfile + ".dsrc"
+        _compress_output(inst, output_compressed)
         return results
 
     return in_gz(wrapped)
 
 
 def out_compressor(func):
-    """Compress output file without pipes
+    """Compress output file
+
+    As for :func:`compressor`, the output is compressed on the fly if the
+    method is tagged with :func:`streamable`.
 
     This decorator should be used by method that uses pure python code
     """
@@ -121,44 +280,198 @@ def out_compressor(func):
     # https://stackoverflow.com/a/309000/1878788
     @wraps(func)
     def wrapped(inst, *args, **kwargs):
-        output_compressed = None
-        if inst.outfile.endswith(".gz"):
-            (inst.outfile, output_compressed) = splitext(inst.outfile)
-        elif inst.outfile.endswith(".bz2"):
-            (inst.outfile, output_compressed) = splitext(inst.outfile)
-        elif inst.outfile.endswith(".dsrc"):  # !!! only for fastq files
-            (inst.outfile, output_compressed) = splitext(inst.outfile)
+        (outfile_name, output_compressed) = _split_compression(inst.outfile)
         # Now inst has the uncompressed output file name
+        inst.outfile = outfile_name
+
+        if output_compressed and hasattr(os, "mkfifo") \
+                and getattr(func, "streamable", False):
+            return _run_streaming(func, inst, None, output_compressed,
+                                  *args, **kwargs)
 
         # computation
         results = func(inst, *args, **kwargs)
 
         # Compress output and restore inst output file name
-        if output_compressed == ".gz":
-            # TODO: this uses -f ; should be a
-            _log.info("Compressing output into .gz")
-            inst.shell("pigz -f -p {} {}".format(inst.threads, inst.outfile))
-            inst.outfile = inst.outfile + ".gz"
-        elif output_compressed == ".bz2":
-            _log.info("Compressing output into .bz2")
-            inst.shell("pbzip2 -f -p{} {}".format(inst.threads, inst.outfile))
-            inst.outfile = inst.outfile + ".bz2"
-        elif output_compressed == ".dsrc":  # !!! only for FastQ files
-            _log.info("Compressing output into .dsrc")
-            inst.shell("dsrc c -t{} {} {}.dsrc".format(
-                inst.threads, inst.outfile, inst.outfile))
-            inst.outfile = inst.outfile + ".dsrc"
+        _compress_output(inst, output_compressed)
         return results
 
     return wrapped
 
 
+def fasta_selection(func):
+    """Convert only some sequences or regions of the input FASTA file
+
+    The sequences and regions are given by the *names* and *regions*
+    keyword arguments (see
+    :func:`~bioconvert.io.fasta.get_selection_arguments`). They are
+    extracted through the index of the input file (see
+    :class:`~bioconvert.io.fasta.FastaIndex`) into a temporary file, which
+    is converted instead of the input file. The rest of the input file is
+    not read.
+
+    It must be applied after :func:`compressor` (i.e., placed above it) so
+    that the input file compressed with bgzip is indexed rather than
+    decompressed.
+    """
+    @wraps(func)
+    def wrapped(inst, *args, **kwargs):
+        names = kwargs.get("names")
+        regions = kwargs.get("regions")
+        if not names and not regions:
+            return func(inst, *args, **kwargs)
+
+        from bioconvert.io.fasta import extract
+        infile_name = inst.infile
+        _log.info("Extracting the selected sequences of {}".format(infile_name))
+        with TempFile(suffix=".fasta") as selection:
+            extract(infile_name, selection.name, names=names, regions=regions)
+            inst.infile = selection.name
+            try:
+                return func(inst, *args, **kwargs)
+            finally:
+                inst.infile = infile_name
+
+    return wrapped
+
+
 def requires_nothing(func):
     """Marks a function as not needing dependencies."""
     func.is_disabled = False
     return func
 
 
+class DependencyCache(object):
+    """Availability of the external binaries and python libraries
+
+    Dependencies are probed once and the results are stored on disk (in the
+    user config directory) so that other bioconvert processes do not probe
+    them again. The stored results are discarded as soon as the PATH or the
+    site-packages directories change (see
+    :func:`~bioconvert.core.utils.get_environment_state`).
+
+    ::
+
+        cache = DependencyCache()
+        cache.is_binary_missing("samtools")
+        cache.is_library_missing("pysam")
+
+    """
+    def __init__(self, filename=None):
+        """.. rubric:: constructor
+
+        :param str filename: the JSON file where results are stored.
+            Defaults to dependencies.json in the user config directory.
+        """
+        self.filename = filename
+        # name -> True if missing
+        self.binaries = {}
+        self.libraries = {}
+        self._loaded = False
+        self._modified = False
+        self._atexit_registered = False
+        self._pip_libraries = None
+
+    def _get_filename(self):
+        if self.filename:
+            return self.filename
+        from bioconvert import configuration
+        config_dir = configuration.user_config_dir
+        if config_dir is None:
+            return None
+        return os.path.join(config_dir, "dependencies.json")
+
+    def load(self):
+        """Read the results stored on disk if they are still valid"""
+        if self._loaded:
+            return
+        self._loaded = True
+        filename = self._get_filename()
+        if filename is None:
+            return
+        try:
+            with open(filename) as fin:
+                data = json.load(fin)
+        except (OSError, ValueError) as err:
+            _log.debug("dependency cache not used: {}".format(err))
+            return
+        if data.get("key") != get_environment_state():
+            _log.debug("dependency cache {} is outdated".format(filename))
+            return
+        # results probed in this process take precedence
+        for name, missing in data.get("binaries", {}).items():
+            self.binaries.setdefault(name, missing)
+        for name, missing in data.get("libraries", {}).items():
+            self.libraries.setdefault(name, missing)
+
+    def save(self):
+        """Store the results on disk (if new dependencies were probed)"""
+        if not self._modified:
+            return
+        filename = self._get_filename()
+        if filename is None:
+            return
+        data = {
+            "key": get_environment_state(),
+            "binaries": self.binaries,
+            "libraries": self.libraries,
+        }
+        tmpfile = "{}.{}.tmp".format(filename, os.getpid())
+        try:
+            with open(tmpfile, "w") as fout:
+                json.dump(data, fout, sort_keys=True, indent=1)
+            os.replace(tmpfile, filename)
+            self._modified = False
+        except OSError as err:
+            _log.debug("could not write dependency cache {}: {}".format(filename, err))
+
+    def _set_modified(self):
+        self._modified = True
+        if not self._atexit_registered:
+            atexit.register(self.save)
+            self._atexit_registered = True
+
+    def is_binary_missing(self, name):
+        """Return True if the executable *name* is not in the PATH"""
+        self.load()
+        try:
+            return self.binaries[name]
+        except KeyError:
+            missing = find_executable(name) is None
+            self.binaries[name] = missing
+            self._set_modified()
+            return missing
+
+    def clear(self):
+        """Forget all results so that the dependencies are probed again
+
+        The results stored on disk are not read anymore and are replaced by
+        the new ones.
+        """
+        self.binaries = {}
+        self.libraries = {}
+        self._pip_libraries = None
+        self._loaded = True
+        self._set_modified()
+
+    def is_library_missing(self, name):
+        """Return True if the python library *name* is not installed"""
+        self.load()
+        try:
+            return self.libraries[name]
+        except KeyError:
+            if self._pip_libraries is None:
+                # a new working set sees the packages installed since startup
+                self._pip_libraries = [p.project_name for p in pkg_resources.WorkingSet()]
+            missing = name not in self._pip_libraries
+            self.libraries[name] = missing
+            self._set_modified()
+            return missing
+
+
+dependency_cache = DependencyCache()
+
+
 def requires(
         external_binary=None,
         python_library=None,
@@ -172,6 +485,9 @@ def requires(
     :param external_binaries: an array of system binaries required for the method
     :param python_libraries: an array of python libraries required for the method
     :return:
+
+    Availability of the dependencies is read from the
+    :class:`DependencyCache` so that they are probed only once.
     """
     external_binaries = external_binaries or []
     python_libraries = python_libraries or []
@@ -180,58 +496,61 @@ def requires(
     if python_library:
         python_libraries.append(python_library)
 
-    __missing_binaries = getattr(requires, "__missing_binaries", {})
-    requires.__missing_binaries = __missing_binaries
-    __missing_libraries = getattr(requires, "__missing_libraries", {})
-    requires.__missing_libraries = __missing_libraries
-    __pip_libraries = getattr(requires, "__pip_libraries", None)
-    if __pip_libraries is None:
-        __pip_libraries = [p.project_name for p in pkg_resources.working_set]
-        requires.__pip_libraries = __pip_libraries
-
     def real_decorator(function):
         @wraps(function)
         def wrapped(inst, *args, **kwargs):
             return function(inst, *args, **kwargs)
 
-        try:
-            for bin in external_binaries:
-                try:
-                    if __missing_binaries[bin]:
-                        raise Exception("{} has already be seen as missing".format(bin))
-                except KeyError:
-                    __missing_binaries[bin] = True
-                    # shell("which %s" % bin)
-                    if find_executable(bin) is None:
-                        raise Exception("{} was not found in path".format(bin))
-                    __missing_binaries[bin] = False
-            for lib in python_libraries:
-                try:
-                    if __missing_libraries[lib]:
-                        raise Exception("{} has already be seen as missing".format(lib))
-                except KeyError:
-                    missing = lib not in __pip_libraries
-                    __missing_libraries[lib] = missing
-                    if missing:
-                        raise Exception("{} was not found by pip".format(lib))
-            wrapped.is_disabled = False
-        except Exception as e:
-            _log.debug(e)
-            wrapped.is_disabled = True
+        # used to record the versions of the tools in the benchmarks
+        wrapped.external_binaries = external_binaries
+        wrapped.python_libraries = python_libraries
+        check_dependencies(wrapped)
         return wrapped
 
     return real_decorator
 
 
+def check_dependencies(func):
+    """Probe the dependencies of a method decorated with :func:`requires`
+
+    The *is_disabled* attribute of the method is updated.
+
+    :param func: a conversion method
+    :return: the *is_disabled* attribute of the method (None if the method
+        is not decorated)
+    """
+    if hasattr(func, "external_binaries"):
+        missing = [x for x in func.external_binaries
+                   if dependency_cache.is_binary_missing(x)]
+        missing += [x for x in func.python_libraries
+                    if dependency_cache.is_library_missing(x)]
+        if missing:
+            _log.debug("missing dependencies: {}".format(", ".join(missing)))
+        func.is_disabled = len(missing) > 0
+    return getattr(func, "is_disabled", None)
+
+
 def get_known_dependencies_with_availability(as_dict=False):
+    """Return the availability of the dependencies stored in the cache
+
+    The converter modules that were not imported yet are imported first so
+    that the dependencies of all converters are probed.
+    """
+    dependency_cache.load()
+    from bioconvert.core.registry import get_registry
+    registry = get_registry()
+    for format_pair in list(registry.get_conversions()):
+        # importing the module of a converter probes its dependencies
+        registry[format_pair]
+
     if as_dict:
         external_binaries = {}
         python_libraries = {}
-        for binary, missing in getattr(requires, "__missing_binaries", {}).items():
+        for binary, missing in dependency_cache.binaries.items():
             external_binaries[binary] = dict(
                 available=not missing,
             )
-        for library, missing in getattr(requires, "__missing_libraries", {}).items():
+        for library, missing in dependency_cache.libraries.items():
             python_libraries[library] = dict(
                 available=not missing,
             )
@@ -240,8 +559,8 @@ def get_known_dependencies_with_availability(as_dict=False):
             python_libraries=python_libraries,
         )
     ret = []
-    for binary, status in sorted(getattr(requires, "__missing_binaries", {}).items()):
+    for binary, status in sorted(dependency_cache.binaries.items()):
         ret.append((binary, not status, "binary",))
-    for library, status in sorted(getattr(requires, "__missing_libraries", {}).items()):
+    for library, status in sorted(dependency_cache.libraries.items()):
         ret.append((library, not status, "library",))
     return ret
@@ -44,8 +44,8 @@ def create_graph(filename, layout="dot", use_singularity=False, color_for_disabl
     see github.com/cokelaer/graphviz4all
 
     """
-    from bioconvert.core.registry import Registry
-    rr = Registry()
+    from bioconvert.core.registry import get_registry
+    rr = get_registry()
 
     try:
         if filename.endswith(".dot") or use_singularity is True:
@@ -154,8 +154,8 @@ def create_graph_for_cytoscape(all_converter=False):
         available in the current installation
     :return:
     """
-    from bioconvert.core.registry import Registry
-    registry = Registry()
+    from bioconvert.core.registry import get_registry
+    registry = get_registry()
     graph_nodes = []
     graph_edges = []
     graph = {
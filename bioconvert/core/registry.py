@@ -24,15 +24,185 @@
 """Main bioconvert registry that fetches automatically the relevant converter"""
 import inspect
 import itertools
+import json
+import os
 import pkgutil
 import importlib
+import threading
+import heapq
+from collections import Counter
+from statistics import median
+
 import colorlog
 
 import bioconvert
+from bioconvert.core.decorators import dependency_cache
+from bioconvert.core.utils import get_environment_state
 
 _log = colorlog.getLogger(__name__)
 
-__all__ = ['Registry']
+__all__ = ['Registry', 'ConverterProxy', 'get_registry']
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+#: throughput (MB/s) assumed for the converters that were never benchmarked
+DEFAULT_THROUGHPUT = 50.0
+
+#: compressed or binary formats. As intermediate of a chain, they are
+#: compressed then decompressed and cannot be streamed by most tools
+BINARY_FORMATS = frozenset(["ABI", "BAM", "BCF", "BIGBED", "BIGWIG", "BPLINK",
+                            "BZ2", "CRAM", "DSRC", "GZ", "ODS", "SCF", "SRA",
+                            "TWOBIT"])
+
+#: additional cost (s/MB) of a compressed or binary intermediate format
+BINARY_INTERMEDIATE_COST = 0.5 / DEFAULT_THROUGHPUT
+
+#: cost (s/MB) of an intermediate output that is not used
+DISCARDED_FORMAT_COST = 0.5 / DEFAULT_THROUGHPUT
+
+
+def get_registry():
+    """Return the :class:`Registry` shared by the whole process
+
+    The registry is created on the first call only. Use
+    :meth:`Registry.refresh` to rebuild it (e.g., after installing a new
+    tool); the dependencies of the conversion methods are then probed again.
+
+    ::
+
+        from bioconvert.core.registry import get_registry
+        registry = get_registry()
+        registry.conversion_exists(("FASTQ",), ("FASTA",))
+
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = Registry()
+    return _registry
+
+
+def get_manifest_filename():
+    """Return the path of the registry manifest stored in the user config dir
+
+    :return: the filename or None if the configuration directory is not
+        available.
+    """
+    config_dir = bioconvert.configuration.user_config_dir
+    if config_dir is None:
+        return None
+    return os.path.join(config_dir, "registry_manifest.json")
+
+
+def get_manifest_key(path):
+    """Return the data used to check whether a manifest is still valid
+
+    The manifest must be rebuilt whenever the bioconvert version, one of
+    the converter (or core) modules, the PATH or the installed python
+    packages change since those drive the list of converters and their
+    available methods (see
+    :func:`~bioconvert.core.utils.get_environment_state`).
+
+    :param list path: the directories where converters are searched for
+    :return: a JSON serialisable dictionary
+    """
+    mtimes = {}
+    for directory in path:
+        for subdir in (directory, os.path.join(directory, "core")):
+            try:
+                filenames = os.listdir(subdir)
+            except OSError:
+                continue
+            for filename in filenames:
+                if filename.endswith(".py"):
+                    fullpath = os.path.join(subdir, filename)
+                    mtimes[fullpath] = os.stat(fullpath).st_mtime
+    return {
+        "version": bioconvert.version,
+        "environment": get_environment_state(),
+        "mtimes": mtimes,
+    }
+
+
+class ConverterProxy(object):
+    """Stand-in for a converter class described in the registry manifest
+
+    The proxy exposes the attributes required by the :class:`Registry`
+    (formats, extensions and available methods) without importing the
+    converter module. Any other attribute access, or a call to create an
+    instance, imports the module and delegates to the real class.
+
+    ::
+
+        proxy = ConverterProxy("bioconvert.fastq2fasta", "FASTQ2FASTA",
+            ("FASTQ",), ("FASTA",), (("fastq", "fq"),), (("fasta", "fa"),),
+            ["readfq"], "readfq")
+        proxy.available_methods   # no import
+        converter = proxy(infile, outfile)   # imports bioconvert.fastq2fasta
+    """
+    def __init__(self, module, name, input_fmt, output_fmt, input_ext,
+                 output_ext, available_methods, default_method=None):
+        self._converter = None
+        self.__module__ = module
+        self.__name__ = name
+        self.input_fmt = tuple(input_fmt)
+        self.output_fmt = tuple(output_fmt)
+        self.input_ext = tuple(tuple(x) for x in input_ext)
+        self.output_ext = tuple(tuple(x) for x in output_ext)
+        self.available_methods = list(available_methods)
+        self._default_method = default_method
+
+    @classmethod
+    def from_converter(cls, converter):
+        """Create a proxy from an already imported converter class"""
+        proxy = cls(converter.__module__, converter.__name__,
+                    converter.input_fmt, converter.output_fmt,
+                    converter.input_ext, converter.output_ext,
+                    converter.available_methods,
+                    getattr(converter, "_default_method", None))
+        proxy._converter = converter
+        return proxy
+
+    def to_dict(self):
+        return {
+            "module": self.__module__,
+            "name": self.__name__,
+            "input_fmt": self.input_fmt,
+            "output_fmt": self.output_fmt,
+            "input_ext": self.input_ext,
+            "output_ext": self.output_ext,
+            "available_methods": self.available_methods,
+            "default_method": self._default_method,
+        }
+
+    def load(self):
+        """Import the converter module and return the converter class"""
+        if self._converter is None:
+            module = importlib.import_module(self.__module__)
+            self._converter = getattr(module, self.__name__)
+        return self._converter
+
+    def __getattr__(self, name):
+        # only called for attributes not stored in the proxy itself
+        if name == "_converter" or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return "<converter proxy '{}.{}'>".format(self.__module__, self.__name__)
+
+
+def resolve_converter(converter):
+    """Return the converter class behind a :class:`ConverterProxy` (if any)"""
+    if isinstance(converter, ConverterProxy):
+        return converter.load()
+    return converter
 
 
 class Registry(object):
@@ -49,33 +219,82 @@ class Registry(object):
         converter = conv_class(input_file, output_file)
         converter.convert()
 
-    """
+    The list of converters is cached on disk in a manifest (see
+    :func:`get_manifest_filename`) so that creating a registry does not
+    import all converter modules. The manifest is rebuilt automatically when
+    the bioconvert version, the converter modules or the environment change. Use
+    *use_manifest=False* to always scan the converter modules.
 
-    def __init__(self):
-        self._ext_registry = {}
-        self._fmt_registry = {}
-        self._fill_registry(bioconvert.__path__)
-        self._build_path_dict()
+    """
 
-    def _fill_registry(self, path, target=None, including_not_available_converter=False):
+    def __init__(self, use_manifest=True, manifest_file=None,
+                 benchmark_store=None):
+        """.. rubric:: constructor
+
+        :param bool use_manifest: read (and write) the converters from the
+            on-disk manifest instead of importing all converter modules.
+        :param str manifest_file: path of the manifest. Defaults to the one
+            returned by :func:`get_manifest_filename`.
+        :param str benchmark_store: the benchmark results used to weight the
+            conversion paths (see :meth:`get_step_cost`). Defaults to the
+            one of :class:`~bioconvert.core.benchmark_store.BenchmarkStore`.
         """
-        Explore the directory converters to discover all converter classes
-        (a concrete class which inherits from :class:`ConvBase`)
-        and fill the register with the input format and output format
-        associated to this converter.
-
-        This is called in the constructor once with
-        including_not_available_converter set to False and called at any time 
-        to :meth:`get_all_conversions` with including_not_available_converter
-        set to True.
+        self._use_manifest = use_manifest
+        self._manifest_file = manifest_file
+        self._benchmark_store = benchmark_store
+        self._lock = threading.RLock()
+        self._all_converters = None
+        self._init_registry()
+
+    def _init_registry(self):
+        # the registries are built aside and swapped at once so that
+        # concurrent readers (which do not take the lock) never see a
+        # partial registry
+        fmt_registry = {}
+        ext_registry = {}
+        self._fill_registry(bioconvert.__path__, target=fmt_registry,
+                            ext_target=ext_registry)
+        with self._lock:
+            self._fmt_registry = fmt_registry
+            self._ext_registry = ext_registry
+            self._clear_cache()
+
+    def _clear_cache(self):
+        # memoized results of conversion_path, get_ext and iter_converters
+        # and the weighted graph of the conversions
+        self._graph = None
+        self._costs = None
+        self._path_cache = {}
+        self._search_cache = {}
+        self._ext_cache = {}
+        self._converters_cache = {}
+
+    def refresh(self):
+        """Rebuild the registry
+
+        The dependencies of the conversion methods are probed again so that
+        the tools installed (or removed) since they were imported are taken
+        into account. The converter modules are then scanned again, the
+        manifest is rewritten and all memoized results are discarded.
+        """
+        with self._lock:
+            dependency_cache.clear()
+            converters = [bioconvert.ConvBase]
+            while converters:
+                converter = converters.pop()
+                converters.extend(converter.__subclasses__())
+                if converter is not bioconvert.ConvBase:
+                    converter.update_available_methods()
+            self._all_converters = None
+            self._get_all_converters(bioconvert.__path__, rescan=True)
+            self._init_registry()
+
+    def _scan_converters(self, path):
+        """Import all modules found in *path* and return the converter classes
 
         :param str path: the path of a directory to explore (not recursive)
-        :param str target:
-        :param bool including_not_available_converter:
+        :return: list of converter classes
         """
-
-        target = self if target is None else target
-
         def is_converter(item):
             """Check if a module is a converter"""
             obj_name, obj = item
@@ -88,6 +307,7 @@ class Registry(object):
             return (issubclass(obj, bioconvert.ConvBase)
                     and obj_name not in ["ConvBase"])
 
+        all_converters = []
         modules = pkgutil.iter_modules(path=path)
         for _, module_name, *_ in modules:
             if module_name != '__init__':
@@ -99,52 +319,204 @@ class Registry(object):
 
                 converters = inspect.getmembers(module)
                 converters = [c for c in converters if is_converter(c)]
+                for _, converter in converters:
+                    if converter is not None:
+                        all_converters.append(converter)
+        return all_converters
 
-                for converter_name, converter in converters:
+    def _read_manifest(self, filename, key):
+        """Return the list of :class:`ConverterProxy` stored in the manifest
 
-                    if converter is not None:
-                        format_pair = (converter.input_fmt, converter.output_fmt)
-                        target[(format_pair)] = converter
-                        # have all the combinaisons between the extensions of 
-                        # output formats of the convertes
-                        combo_input_ext = tuple(itertools.product(*converter.input_ext))
-                        # have all the combinaisons between the extensions of output 
-                        # formats of the convertes
-                        combo_output_ext = tuple(itertools.product(*converter.output_ext))
-                        all_ext_pair = tuple(itertools.product(combo_input_ext,(combo_output_ext)))
-                        for ext_pair in all_ext_pair:
-                            if len(converter.available_methods) == 0 and not including_not_available_converter:
-                                _log.debug("converter '{}' for {} -> {} was not added as no method is available"
-                                             .format(converter_name, *ext_pair))
-                            else:
-                                self.set_ext(ext_pair, converter)
-
-    def _build_path_dict(self):
-        """
-        Construct dictionaries of dictionaries containing shortest paths
-        from one format to another.
-        """
-        from networkx import DiGraph, all_pairs_shortest_path
-        # all_pairs_shortest_path yields pairs (n, d) where
-        # * n is a node
-        # * d is a dict where
-        #     * keys are other nodes
-        #     * values are shortest paths (i.e. lists of nodes)
-        #       from n to these nodes
-        # Converting this to dict results in a dict of dicts where
-        # * the first key is the source node
-        # * the second key is the destination node
-        # * the value is a shortest path between these nodes.
-
-        # self._path_dict[in_fmt][out_fmt] = [in_fmt, ..., out_fmt]
-        self._path_dict = dict(all_pairs_shortest_path(
-            # Directed graph of available in_fmt -> out_fmt conversions
-            DiGraph(self.get_conversions())))
-
-        # self._path_dict_ext[in_ext][out_ext] = [in_ext, ..., out_ext]
-        self._path_dict_ext = dict(all_pairs_shortest_path(
-            # Directed graph of available in_ext -> out_ext conversions
-            DiGraph(self.get_conversions_from_ext())))
+        :return: None if the manifest does not exist, cannot be read or is
+            outdated.
+        """
+        try:
+            with open(filename) as fin:
+                manifest = json.load(fin)
+        except (OSError, ValueError) as err:
+            _log.debug("registry manifest not used: {}".format(err))
+            return None
+
+        if manifest.get("key") != key:
+            _log.debug("registry manifest {} is outdated".format(filename))
+            return None
+        try:
+            return [ConverterProxy(**item) for item in manifest["converters"]]
+        except (KeyError, TypeError) as err:
+            _log.debug("registry manifest {} is invalid: {}".format(filename, err))
+            return None
+
+    def _write_manifest(self, filename, key, converters):
+        """Store the converters in the manifest (atomically)"""
+        manifest = {
+            "key": key,
+            "converters": [ConverterProxy.from_converter(c).to_dict()
+                           for c in converters],
+        }
+        tmpfile = "{}.{}.tmp".format(filename, os.getpid())
+        try:
+            with open(tmpfile, "w") as fout:
+                json.dump(manifest, fout)
+            os.replace(tmpfile, filename)
+        except OSError as err:
+            _log.debug("could not write registry manifest {}: {}".format(filename, err))
+
+    def _get_all_converters(self, path, rescan=False):
+        """Return all converters (including those without available methods)
+
+        Converters are read from the manifest when possible. Otherwise, the
+        modules are scanned and the manifest is updated.
+
+        :param bool rescan: do not read the manifest
+        """
+        if self._all_converters is not None:
+            return self._all_converters
+
+        filename = None
+        if self._use_manifest:
+            filename = self._manifest_file or get_manifest_filename()
+
+        if filename:
+            key = get_manifest_key(path)
+            converters = None
+            if not rescan:
+                converters = self._read_manifest(filename, key)
+            if converters is None:
+                converters = self._scan_converters(path)
+                self._write_manifest(filename, key, converters)
+        else:
+            converters = self._scan_converters(path)
+
+        self._all_converters = converters
+        return converters
+
+    def _fill_registry(self, path, target, ext_target=None,
+                       including_not_available_converter=False):
+        """
+        Explore the directory converters to discover all converter classes
+        (a concrete class which inherits from :class:`ConvBase`)
+        and fill the register with the input format and output format
+        associated to this converter. Converters are read from the
+        manifest when it is up to date (see :meth:`_get_all_converters`).
+
+        This is called by :meth:`_init_registry` with
+        including_not_available_converter set to False and called at any time 
+        to :meth:`get_all_conversions` with including_not_available_converter
+        set to True.
+
+        :param str path: the path of a directory to explore (not recursive)
+        :param dict target: the dictionary (input format, output format) ->
+            converter to fill
+        :param dict ext_target: the dictionary (input extensions, output
+            extensions) -> list of converters to fill (if not None)
+        :param bool including_not_available_converter:
+        """
+        for converter in self._get_all_converters(path):
+            format_pair = (converter.input_fmt, converter.output_fmt)
+            if format_pair in target:
+                raise KeyError('an other converter already exists for {} -> {}'
+                               .format("_".join(format_pair[0]), "_".join(format_pair[1])))
+            target[format_pair] = converter
+
+            if ext_target is None:
+                continue
+
+            # have all the combinaisons between the extensions of 
+            # output formats of the convertes
+            combo_input_ext = tuple(itertools.product(*converter.input_ext))
+            # have all the combinaisons between the extensions of output 
+            # formats of the convertes
+            combo_output_ext = tuple(itertools.product(*converter.output_ext))
+            all_ext_pair = tuple(itertools.product(combo_input_ext,(combo_output_ext)))
+            for ext_pair in all_ext_pair:
+                if len(converter.available_methods) == 0 and not including_not_available_converter:
+                    _log.debug("converter '{}' for {} -> {} was not added as no method is available"
+                                 .format(converter.__name__, *ext_pair))
+                else:
+                    ext_target.setdefault(ext_pair, []).append(converter)
+
+    def _get_costs(self):
+        """Return the median time (s/MB) of the benchmarked methods on this
+        kind of node as a dictionary converter name -> method -> time"""
+        if self._costs is not None:
+            return self._costs
+        from bioconvert.core.autotune import get_node_type
+        from bioconvert.core.benchmark_store import BenchmarkStore
+
+        _, node = get_node_type()
+        times = {}
+        for record in BenchmarkStore(self._benchmark_store).records():
+            host = record.get("host") or {}
+            if any(host.get(key) != value for key, value in node.items()):
+                continue
+            if not record.get("input_size") or not record.get("times"):
+                continue
+            seconds = median(record["times"]) / (record["input_size"] / 1e6)
+            times.setdefault(record["converter"], {}).setdefault(
+                record["method"], []).append(seconds)
+        costs = {converter: {method: median(values)
+                             for method, values in methods.items()}
+                 for converter, methods in times.items()}
+        with self._lock:
+            self._costs = costs
+        return costs
+
+    def get_step_cost(self, converter):
+        """Return the method used by *converter* in a chain and its cost
+
+        The method is the default method of the converter (see
+        :attr:`~bioconvert.core.base.ConvBase.default`). Its cost is the
+        median time per MB of input measured by the benchmarks stored on
+        this kind of node (see
+        :class:`~bioconvert.core.benchmark_store.BenchmarkStore`) or the time
+        given by :data:`DEFAULT_THROUGHPUT` if the method was not
+        benchmarked.
+
+        :param converter: the converter class (or proxy)
+        :return: the method, its time in s/MB and whether the time was
+            measured (None, None, False if no method is available)
+        """
+        from bioconvert.core.autotune import get_tuned_method
+
+        methods = converter.available_methods
+        if not methods:
+            return None, None, False
+        method = get_tuned_method(converter.__name__, methods)
+        if method is None:
+            method = converter._default_method
+            if method not in methods:
+                method = methods[0]
+        cost = self._get_costs().get(converter.__name__, {}).get(method)
+        if cost is None:
+            return method, 1 / DEFAULT_THROUGHPUT, False
+        return method, cost, True
+
+    def _get_graph(self):
+        """Return the directed graph of the available conversions
+
+        The weight of an edge is the cost of the converter (see
+        :meth:`get_step_cost`) plus :data:`BINARY_INTERMEDIATE_COST` if its
+        output is compressed or binary. The latter is the same for all the
+        paths to a given format, so that only the intermediate formats are
+        penalized. Converters without available methods are ignored.
+        """
+        if self._graph is not None:
+            return self._graph
+        from networkx import DiGraph
+
+        graph = DiGraph()
+        for (in_fmt, out_fmt), converter in list(self._fmt_registry.items()):
+            method, cost, measured = self.get_step_cost(converter)
+            if method is None:
+                continue
+            weight = cost
+            if BINARY_FORMATS.intersection(out_fmt):
+                weight += BINARY_INTERMEDIATE_COST
+            graph.add_edge(in_fmt, out_fmt, weight=weight, cost=cost,
+                           method=method, measured=measured)
+        with self._lock:
+            self._graph = graph
+        return graph
 
     def conversion_path(self, input_fmt, output_fmt):
         """
@@ -154,13 +526,117 @@ class Registry(object):
         :param tuple input_fmt:
         :param tuple output_fmt:
 
-        Each step in the list is a pair of formats.
+        Each step in the list is a pair of formats. The path is the cheapest
+        one (see :meth:`_search_path`).
         """
+        key = (input_fmt, output_fmt)
         try:
-            fmt_steps = self._path_dict[input_fmt][output_fmt]
+            return list(self._path_cache[key])
         except KeyError:
-            fmt_steps = []
-        return list(zip(fmt_steps, fmt_steps[1:]))
+            pass
+        steps = self._search_path(tuple(input_fmt), tuple(output_fmt))
+        with self._lock:
+            self._path_cache[key] = steps
+        return list(steps)
+
+    def _search_path(self, input_fmt, output_fmt):
+        """Return the cheapest conversion steps with the Dijkstra algorithm
+
+        Conversions are a hypergraph: a node is the set of files available
+        at some point of the chain, described by their formats, and a
+        converter can be applied to some of these files only. For instance,
+        FASTQ can be converted into CLUSTAL and QUAL with FASTQ2FASTA_QUAL
+        then FASTA2CLUSTAL (the QUAL file is kept as is). Outputs that are
+        not requested are discarded at the cost of
+        :data:`DISCARDED_FORMAT_COST` each. The cost of a converter is the
+        weight of its edge in :meth:`_get_graph`.
+
+        The number of files of a node is bounded by the number of inputs or
+        outputs plus one.
+        """
+        max_files = max(len(input_fmt), len(output_fmt)) + 1
+        target = Counter(output_fmt)
+        best = None
+        for cost, node, steps in self._search_paths(input_fmt, max_files):
+            if not target - Counter(node):
+                cost += (len(node) - len(output_fmt)) * DISCARDED_FORMAT_COST
+                if best is None or cost < best[0]:
+                    best = (cost, steps)
+        return best[1] if best is not None else []
+
+    def _search_paths(self, input_fmt, max_files):
+        """Return the cheapest conversion steps from *input_fmt* to all the
+        nodes of at most *max_files* files (see :meth:`_search_path`)
+
+        :return: a list of (cost, node, steps) in the order the nodes are
+            reached
+        """
+        key = (tuple(sorted(input_fmt)), max_files)
+        try:
+            return self._search_cache[key]
+        except KeyError:
+            pass
+        graph = self._get_graph()
+        edges = [(Counter(in_fmt), in_fmt, out_fmt, data["weight"])
+                 for in_fmt, out_fmt, data in graph.edges(data=True)]
+
+        # entries are (cost, tie breaker, node, steps)
+        order = itertools.count()
+        queue = [(0, next(order), key[0], [])]
+        visited = set()
+        reached = []
+        while queue:
+            cost, _, node, steps = heapq.heappop(queue)
+            if node in visited:
+                continue
+            visited.add(node)
+            reached.append((cost, node, steps))
+            files = Counter(node)
+            for inputs, in_fmt, out_fmt, weight in edges:
+                if inputs - files:
+                    continue
+                new_node = tuple(sorted((files - inputs + Counter(out_fmt)).elements()))
+                if len(new_node) <= max_files and new_node not in visited:
+                    heapq.heappush(queue, (cost + weight, next(order), new_node,
+                                           steps + [(in_fmt, out_fmt)]))
+        with self._lock:
+            self._search_cache[key] = reached
+        return reached
+
+    def explain_path(self, input_fmt, output_fmt, size=None):
+        """Return the steps of the conversion of *input_fmt* into
+        *output_fmt* with their estimated time
+
+        The direct converter is used if it exists, the cheapest path
+        otherwise (see :meth:`conversion_path`).
+
+        :param tuple input_fmt:
+        :param tuple output_fmt:
+        :param int size: size of the input in bytes (defaults to 1MB)
+        :return: list of dictionaries (one per step) with the keys
+            input_fmt, output_fmt, converter, method, throughput (MB/s),
+            measured and time (s). Empty if there is no conversion path.
+        """
+        if (input_fmt, output_fmt) in self._fmt_registry:
+            pairs = [(input_fmt, output_fmt)]
+        else:
+            pairs = self.conversion_path(input_fmt, output_fmt)
+        size = 1e6 if size is None else size
+
+        steps = []
+        for in_fmt, out_fmt in pairs:
+            converter = self._fmt_registry[(in_fmt, out_fmt)]
+            method, cost, measured = self.get_step_cost(converter)
+            steps.append({
+                "input_fmt": in_fmt,
+                "output_fmt": out_fmt,
+                "converter": converter.__name__,
+                "method": method,
+                "throughput": 1 / cost if cost else None,
+                "measured": measured,
+                "time": cost * size / 1e6 if cost is not None else None,
+            })
+        return steps
 
     def __setitem__(self, format_pair, convertor):
         """
@@ -175,7 +651,9 @@ class Registry(object):
         if format_pair in self._fmt_registry:
             raise KeyError('an other converter already exists for {} -> {}'
                            .format("_".join(format_pair[0]),"_".join(format_pair[1])))
-        self._fmt_registry[format_pair] = convertor
+        with self._lock:
+            self._fmt_registry[format_pair] = convertor
+            self._clear_cache()
 
     def _check_input_ext(self, ext_pair):
         assert len(ext_pair) == 2, "parameter must be a tuple with 2 items"
@@ -195,10 +673,12 @@ class Registry(object):
         :type convertor: list of :class:`ConvBase` object
         """
         self._check_input_ext(ext_pair)
-        if ext_pair in self._ext_registry:
-            self._ext_registry[ext_pair].append(convertor)
-        else:
-            self._ext_registry[ext_pair] = [convertor]
+        with self._lock:
+            if ext_pair in self._ext_registry:
+                self._ext_registry[ext_pair].append(convertor)
+            else:
+                self._ext_registry[ext_pair] = [convertor]
+            self._ext_cache.pop(ext_pair, None)
 
     def __getitem__(self, format_pair):
         """
@@ -207,7 +687,7 @@ class Registry(object):
         :return: an object of subclass o :class:`ConvBase`
         """
         format_pair = (format_pair[0], format_pair[1])
-        return self._fmt_registry[format_pair]
+        return resolve_converter(self._fmt_registry[format_pair])
 
     def get_ext(self, ext_pair):
         """
@@ -221,7 +701,14 @@ class Registry(object):
         :return: list of objects of subclass o :class:`ConvBase`
         """
         self._check_input_ext(ext_pair)
-        return self._ext_registry[ext_pair]
+        try:
+            return list(self._ext_cache[ext_pair])
+        except KeyError:
+            pass
+        converters = [resolve_converter(c) for c in self._ext_registry[ext_pair]]
+        with self._lock:
+            self._ext_cache[ext_pair] = converters
+        return list(converters)
 
     def __contains__(self, format_pair):
         """
@@ -304,6 +791,21 @@ class Registry(object):
         for conv in self._ext_registry:
             yield conv
 
+    def get_formats_from_ext(self, ext):
+        """Return the formats of the files with the extensions *ext*
+
+        :param tuple ext: the extensions (e.g., ("fq",))
+        :return: a sorted list of tuples of formats (e.g., [("FASTQ",)])
+        """
+        formats = set()
+        for (in_ext, out_ext), converters in list(self._ext_registry.items()):
+            for converter in converters:
+                if in_ext == ext:
+                    formats.add(converter.input_fmt)
+                if out_ext == ext:
+                    formats.add(converter.output_fmt)
+        return sorted(formats)
+
     def get_all_conversions(self):
         """
         :return: a generator which allow to iterate on all available 
@@ -334,29 +836,53 @@ class Registry(object):
                     and len(self.conversion_path(input_fmt, output_fmt))))
 
     def get_info(self):
-        converters = set([self[this] for this in self._fmt_registry])
+        # converters are not resolved so that no module is imported
+        converters = set(self._fmt_registry.values())
         data = {}
         for converter in converters:
             data[converter] = len(converter.available_methods)
         return data
 
+    def get_indirect_path(self, input_fmt, output_fmt):
+        """Return the steps of the indirect conversion from *input_fmt* to
+        *output_fmt* (see :meth:`conversion_path`)
+
+        :return: the steps, or None if there is a direct converter or no
+            path through intermediate formats
+        """
+        graph = self._get_graph()
+        if input_fmt == output_fmt or (input_fmt, output_fmt) in self._fmt_registry \
+                or input_fmt not in graph or output_fmt not in graph:
+            return None
+        steps = self.conversion_path(input_fmt, output_fmt)
+        # at least one intermediate format
+        return steps if len(steps) > 1 else None
+
     def iter_converters(self, allow_indirect: bool = False):
         """
 
         :param bool allow_indirect: also return indirect conversion
         :return: a generator to iterate over (in_fmt, out_fmt, converter 
-            class when direct, path when indirect)
+            class when direct, conversion steps when indirect). The steps
+            are the ones of :meth:`conversion_path`.
         :rtype: a generator
         """
-        # if allow_indirect:
-        for start, stops in self._path_dict.items():
-            for stop, path in stops.items():
-                if len(path) == 1:
-                    pass
-                elif len(path) == 2:
-                    yield start, stop, self._fmt_registry[(start, stop)], None
-                elif allow_indirect:
-                    yield start, stop, None, path
+        try:
+            converters = self._converters_cache[allow_indirect]
+        except KeyError:
+            converters = [(start, stop, converter, None) for (start, stop), converter
+                          in self._fmt_registry.items() if start != stop]
+            if allow_indirect:
+                graph = self._get_graph()
+                for start in graph:
+                    for stop in graph:
+                        steps = self.get_indirect_path(start, stop)
+                        if steps is not None:
+                            converters.append((start, stop, None, steps))
+            with self._lock:
+                self._converters_cache[allow_indirect] = converters
+        for item in converters:
+            yield item
         #     return
         # for conv, converter in self._fmt_registry.items():
         #     in_fmt, out_fmt = conv
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Asynchronous runner of external commands
+
+The standard output and error of the command are read incrementally by an
+asyncio event loop and only their last bytes are kept in memory. The
+command runs in its own process group so that it can be killed with all its
+children on timeout or cancellation. The exit status and the resource usage
+of the command are returned in a :class:`ProcessResult`.
+
+::
+
+    from bioconvert.core.runner import run
+    result = run("samtools view -h test.bam > test.sam", timeout=60)
+    result.returncode, result.rusage["max_rss"]
+
+"""
+import asyncio
+import concurrent.futures
+import os
+import re
+import shlex
+import signal
+import subprocess
+import time
+from collections import deque
+
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["run", "run_async", "ProcessResult"]
+
+
+# maximum number of bytes of stdout and stderr kept in memory
+MAX_BUFFER_SIZE = 1 << 20
+# delay between SIGTERM and SIGKILL when a command is stopped
+KILL_DELAY = 2
+
+# characters that require a shell to interpret the command
+_shell_characters = re.compile(r"[|&;<>()$`\\\"'*?\[\]#~{}\n]")
+
+
+def needs_shell(cmd):
+    """Tells whether *cmd* must be run through a shell (pipes, redirections,
+    variables, quotes, ...) or can be executed directly"""
+    if _shell_characters.search(cmd):
+        return True
+    words = cmd.split()
+    # environment variable assignment (e.g., "TMPDIR=/tmp cmd")
+    return not words or "=" in words[0]
+
+
+class ProcessResult(object):
+    """Result of a command run by :func:`run`
+
+    :attr:`stdout` and :attr:`stderr` contain (at most) the last
+    :data:`MAX_BUFFER_SIZE` bytes written by the command. :attr:`rusage`
+    is a dictionary with the resource usage of the command (and of its
+    children): user_time and system_time in seconds, max_rss in kilobytes,
+    minor_faults, major_faults, input_blocks, output_blocks,
+    voluntary_switches and involuntary_switches.
+    """
+    def __init__(self, cmd, returncode, stdout, stderr, rusage, duration,
+                 timed_out=False):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.rusage = rusage
+        self.duration = duration
+        self.timed_out = timed_out
+
+    def __repr__(self):
+        return "ProcessResult(cmd={!r}, returncode={}, duration={:.3f})".format(
+            self.cmd, self.returncode, self.duration)
+
+
+class _BoundedBuffer(object):
+    """Keep the last *max_size* bytes written into the buffer"""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.chunks = deque()
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        while self.size - len(self.chunks[0]) >= self.max_size:
+            self.size -= len(self.chunks.popleft())
+
+    def getvalue(self):
+        data = b"".join(self.chunks)[-self.max_size:]
+        return data.decode("utf-8", errors="replace")
+
+
+async def _drain(pipe, buffer, callback):
+    """Read *pipe* until EOF into *buffer*, calling *callback* on each line"""
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    partial = b""
+    while True:
+        data = await reader.read(1 << 16)
+        if not data:
+            break
+        buffer.write(data)
+        if callback is not None:
+            lines = (partial + data).split(b"\n")
+            partial = lines.pop()
+            for line in lines:
+                callback(line.decode("utf-8", errors="replace"))
+    if callback is not None and partial:
+        callback(partial.decode("utf-8", errors="replace"))
+
+
+def rusage_to_dict(usage):
+    """Convert the resource usage returned by :func:`os.wait4` or
+    :func:`resource.getrusage` into a dictionary"""
+    return {
+        "user_time": usage.ru_utime,
+        "system_time": usage.ru_stime,
+        "max_rss": usage.ru_maxrss,
+        "minor_faults": usage.ru_minflt,
+        "major_faults": usage.ru_majflt,
+        "input_blocks": usage.ru_inblock,
+        "output_blocks": usage.ru_oublock,
+        "voluntary_switches": usage.ru_nvcsw,
+        "involuntary_switches": usage.ru_nivcsw,
+    }
+
+
+def status_to_exitcode(status):
+    """Convert the status returned by :func:`os.wait4` into an exit code
+    (minus the number of the signal if the process was killed), as
+    :attr:`subprocess.Popen.returncode`"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _wait(process):
+    """Wait for *process* and return its resource usage"""
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = status_to_exitcode(status)
+    return rusage_to_dict(usage)
+
+
+def _kill(process, sig):
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        # the process group already ended
+        pass
+
+
+async def run_async(cmd, timeout=None, stdout_callback=None,
+                    stderr_callback=None, max_buffer_size=MAX_BUFFER_SIZE,
+                    cwd=None, env=None):
+    """Run the command *cmd* and return a :class:`ProcessResult`
+
+    The command is executed directly (without shell) unless it contains
+    shell syntax (see :func:`needs_shell`).
+
+    :param str cmd: the command to run
+    :param float timeout: number of seconds after which the command is
+        killed (:attr:`ProcessResult.timed_out` is then True)
+    :param stdout_callback: function called with each line written by the
+        command on its standard output
+    :param stderr_callback: function called with each line written by the
+        command on its standard error
+    :param int max_buffer_size: number of bytes of stdout and stderr kept
+    :param str cwd: the working directory of the command
+    :param dict env: the environment of the command
+
+    If the coroutine is cancelled, the command and its children are killed.
+    """
+    use_shell = needs_shell(cmd)
+    args = cmd if use_shell else shlex.split(cmd)
+    _log.debug("Running {} ({})".format(cmd, "shell" if use_shell else "exec"))
+
+    start = time.monotonic()
+    process = subprocess.Popen(args, shell=use_shell, cwd=cwd, env=env,
+                               stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               start_new_session=True)
+    loop = asyncio.get_event_loop()
+    stdout = _BoundedBuffer(max_buffer_size)
+    stderr = _BoundedBuffer(max_buffer_size)
+    drains = [
+        loop.create_task(_drain(process.stdout, stdout, stdout_callback)),
+        loop.create_task(_drain(process.stderr, stderr, stderr_callback)),
+    ]
+    waiter = loop.run_in_executor(None, _wait, process)
+
+    timed_out = False
+    try:
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            remaining = None if timeout is None \
+                else max(0, timeout - (time.monotonic() - start))
+            await asyncio.wait_for(asyncio.gather(*drains), remaining)
+        except asyncio.TimeoutError:
+            timed_out = True
+            _log.warning("Command '{}' timed out after {}s".format(cmd, timeout))
+            _kill(process, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), KILL_DELAY)
+            except asyncio.TimeoutError:
+                _kill(process, signal.SIGKILL)
+            # kill the children still writing in the pipes
+            _kill(process, signal.SIGKILL)
+            await asyncio.gather(*drains)
+        rusage = await waiter
+    except asyncio.CancelledError:
+        _kill(process, signal.SIGKILL)
+        for task in drains:
+            task.cancel()
+        raise
+
+    return ProcessResult(cmd, process.returncode, stdout.getvalue(),
+                         stderr.getvalue(), rusage, time.monotonic() - start,
+                         timed_out=timed_out)
+
+
+def _run_in_new_loop(coroutine):
+    """Run *coroutine* in a new event loop (asyncio.run is not available
+    before Python 3.7)"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def run(cmd, **kwargs):
+    """Run the command *cmd* and return a :class:`ProcessResult`
+
+    Synchronous version of :func:`run_async` (same arguments). It can also
+    be called from a running event loop, the command is then run in a
+    separate thread.
+    """
+    if asyncio._get_running_loop() is None:
+        return _run_in_new_loop(run_async(cmd, **kwargs))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_run_in_new_loop, run_async(cmd, **kwargs)).result()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Share the cores between concurrent conversions
+
+The number of cores available is limited by the CPU affinity of the
+process and by the CPU quota of its cgroup (e.g., in containers), see
+:func:`get_available_cores`.
+
+Each running conversion holds a lease on a number of threads. Leases are
+files of a directory shared by all bioconvert processes of the user so
+that conversions started by different processes (command line, batch
+mode, server or python API) do not use more threads than cores::
+
+    from bioconvert.core.scheduler import get_scheduler
+    with get_scheduler().lease() as lease:
+        run_tool(threads=lease.threads)
+
+"""
+import contextlib
+import itertools
+import math
+import os
+import tempfile
+import threading
+
+import colorlog
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["get_available_cores", "ThreadScheduler", "get_scheduler"]
+
+
+def _read_cgroup_v2_quota():
+    """Return the CPU quota of the cgroup v2 of the process (None if
+    there is no quota)"""
+    try:
+        with open("/proc/self/cgroup") as fin:
+            paths = [line.strip().split(":", 2)[2] for line in fin
+                     if line.startswith("0::")]
+    except (OSError, IndexError):
+        paths = []
+    quotas = []
+    # the quota of the parent cgroups applies as well
+    for path in paths or ["/"]:
+        path = path.strip("/")
+        while True:
+            filename = os.path.join("/sys/fs/cgroup", path, "cpu.max")
+            try:
+                with open(filename) as fin:
+                    quota, period = fin.read().split()[:2]
+                if quota != "max":
+                    quotas.append(int(quota) / int(period))
+            except (OSError, ValueError):
+                pass
+            if not path:
+                break
+            path = os.path.dirname(path)
+    return min(quotas) if quotas else None
+
+
+def _read_cgroup_v1_quota():
+    """Return the CPU quota of the cgroup v1 of the process (None if
+    there is no quota)"""
+    for directory in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        try:
+            with open(os.path.join(directory, "cpu.cfs_quota_us")) as fin:
+                quota = int(fin.read())
+            with open(os.path.join(directory, "cpu.cfs_period_us")) as fin:
+                period = int(fin.read())
+        except (OSError, ValueError):
+            continue
+        if quota > 0 and period > 0:
+            return quota / period
+    return None
+
+
+_available_cores = None
+
+
+def get_available_cores():
+    """Return the number of cores the process can use
+
+    This is the minimum of the number of CPUs of the process affinity and of
+    the CPU quota of its cgroup (v1 or v2). It can be set with the
+    BIOCONVERT_CORES environment variable.
+    """
+    global _available_cores
+    if os.environ.get("BIOCONVERT_CORES"):
+        return max(1, int(os.environ["BIOCONVERT_CORES"]))
+    if _available_cores is None:
+        try:
+            cores = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cores = os.cpu_count() or 1
+        quota = _read_cgroup_v2_quota() or _read_cgroup_v1_quota()
+        if quota is not None:
+            cores = min(cores, int(math.ceil(quota)))
+        _available_cores = max(1, cores)
+    return _available_cores
+
+
+class Lease(object):
+    """Threads granted to a conversion by :meth:`ThreadScheduler.acquire`"""
+    def __init__(self, scheduler, filename, threads):
+        self.scheduler = scheduler
+        self.filename = filename
+        self.threads = threads
+
+    def release(self):
+        """Give the threads back to the scheduler"""
+        if self.filename is not None:
+            try:
+                os.remove(self.filename)
+            except OSError:
+                pass
+            self.filename = None
+
+
+class ThreadScheduler(object):
+    """Hand out thread budgets to concurrent conversions
+
+    A conversion asking for a fair share gets the cores not used by the
+    other conversions, or at least cores / (number of conversions) threads.
+    """
+    _counter = itertools.count()
+
+    def __init__(self, cores=None, directory=None):
+        """.. rubric:: constructor
+
+        :param int cores: number of cores to share (defaults to
+            :func:`get_available_cores`)
+        :param str directory: where leases are stored (defaults to the
+            BIOCONVERT_SCHEDULER_DIR environment variable or a directory of
+            the temporary directory specific to the user)
+        """
+        self.cores = cores or get_available_cores()
+        self.directory = directory or os.environ.get("BIOCONVERT_SCHEDULER_DIR") \
+            or os.path.join(tempfile.gettempdir(),
+                            "bioconvert-{}-threads".format(os.getuid()))
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Lock the lease directory (for all processes)"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, ".lock"), "w") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                yield
+
+    def get_leases(self):
+        """Return the leases of the running conversions as (pid, threads)
+        pairs. Leases of processes that ended are removed."""
+        leases = []
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return leases
+        for filename in filenames:
+            if filename.startswith("."):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                pid = int(filename.split("-")[0])
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                _log.debug("removing lease of process {}".format(filename))
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                continue
+            except (ValueError, PermissionError):
+                pass
+            try:
+                with open(path) as fin:
+                    leases.append((pid, int(fin.read())))
+            except (OSError, ValueError):
+                pass
+        return leases
+
+    def get_budget(self, leases):
+        """Return the fair share of threads given the *leases* of the other
+        running conversions"""
+        used = sum(threads for _, threads in leases)
+        return max(1, min(self.cores, max(self.cores - used,
+                                          self.cores // (len(leases) + 1))))
+
+    def acquire(self, threads=None):
+        """Return a :class:`Lease` of *threads* threads
+
+        :param int threads: number of threads requested. If None, a fair
+            share of the cores is granted.
+        """
+        if fcntl is None:
+            return Lease(self, None, threads or self.cores)
+        try:
+            with self._locked():
+                if threads is None:
+                    threads = self.get_budget(self.get_leases())
+                filename = os.path.join(self.directory, "{}-{}".format(
+                    os.getpid(), next(self._counter)))
+                with open(filename, "w") as fout:
+                    fout.write(str(threads))
+        except OSError as err:
+            _log.debug("thread scheduler not used: {}".format(err))
+            return Lease(self, None, threads or self.cores)
+        return Lease(self, filename, threads)
+
+    @contextlib.contextmanager
+    def lease(self, threads=None):
+        """Context manager acquiring and releasing a :class:`Lease`"""
+        lease = self.acquire(threads)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Return the scheduler shared by the conversions of the process"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ThreadScheduler()
+    return _scheduler
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Conversion server listening on a Unix domain socket
+
+Starting bioconvert (python interpreter, registry, dependencies, command
+line parser) takes much longer than converting a small file. The server
+keeps a warm registry and the converters imported in a pool of worker
+processes. Clients send conversion requests as JSON lines:
+
+* ``{"infile": ..., "outfile": ..., "converter": ..., "method": ...,
+  "kwargs": {...}}`` runs a conversion (*converter*, e.g. "fastq2fasta",
+  is optional and inferred from the extensions by default)
+* ``{"argv": [...]}`` runs a bioconvert command line
+
+Relative paths are relative to the *cwd* of the request. The server
+replies with one JSON line per request.
+
+::
+
+    bioconvert serve --workers 8 &
+    bioconvert --client test.fastq test.fasta
+
+or, in python::
+
+    from bioconvert.core.server import ConversionClient
+    client = ConversionClient()
+    client.convert("test.fastq", "test.fasta", method="biopython")
+
+"""
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import time
+
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["ConversionServer", "ConversionClient", "get_socket_filename"]
+
+
+def get_socket_filename():
+    """Return the socket of the server (BIOCONVERT_SOCKET environment
+    variable or a file of the temporary directory specific to the user)"""
+    return os.environ.get("BIOCONVERT_SOCKET") or os.path.join(
+        tempfile.gettempdir(), "bioconvert-{}.sock".format(os.getuid()))
+
+
+def _run_request(request):
+    """Process a request (in a worker process) and return the reply"""
+    t1 = time.time()
+    cwd = request.get("cwd")
+    if cwd:
+        os.chdir(cwd)
+
+    if "argv" in request:
+        from bioconvert.scripts.converter import main
+        stdout = io.StringIO()
+        returncode = 0
+        # the converter name may be read from sys.argv
+        sys.argv = ["bioconvert"] + list(request["argv"])
+        with contextlib.redirect_stdout(stdout):
+            try:
+                main(list(request["argv"]))
+            except SystemExit as err:
+                if isinstance(err.code, int):
+                    returncode = err.code
+                elif err.code is not None:
+                    print(err.code, file=sys.stderr)
+                    returncode = 1
+            except Exception as err:
+                _log.error(err)
+                returncode = 1
+        return {"returncode": returncode, "stdout": stdout.getvalue(),
+                "time": time.time() - t1}
+
+    from bioconvert.core.base import ConvMeta
+    from bioconvert.core.converter import Bioconvert, _convert
+    infile, outfile = request["infile"], request["outfile"]
+    try:
+        if request.get("converter"):
+            formats = ConvMeta.split_converter_to_format(request["converter"])
+        else:
+            formats = Bioconvert.get_formats(infile, outfile)
+    except (Exception, SystemExit) as err:
+        return {"ok": False, "error": "unknown conversion: {}".format(err),
+                "time": time.time() - t1}
+    result = _convert(infile, outfile, formats, request.get("method"),
+                      request.get("force", False), request.get("threads"),
+                      request.get("extra"), request.get("kwargs") or {})
+    return {"ok": result.ok, "converter": result.converter,
+            "error": None if result.ok else "{}: {}".format(
+                type(result.error).__name__, result.error),
+            "time": result.time}
+
+
+def _warm_up():
+    """Import all converters and probe their dependencies"""
+    from bioconvert.core.registry import get_registry, resolve_converter
+    registry = get_registry()
+    for _, _, converter, _ in registry.iter_converters():
+        resolve_converter(converter)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                future = self.server.executor.submit(_run_request, request)
+                reply = future.result()
+            except Exception as err:
+                reply = {"ok": False, "returncode": 1,
+                         "error": "{}: {}".format(type(err).__name__, err)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Server running the conversion requests on a pool of processes
+
+    ::
+
+        server = ConversionServer(max_workers=4)
+        server.serve_forever()
+
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_filename=None, max_workers=None):
+        """.. rubric:: constructor
+
+        :param str socket_filename: the Unix socket (see
+            :func:`get_socket_filename`)
+        :param int max_workers: number of conversions run concurrently
+            (defaults to the number of cores available, see
+            :func:`~bioconvert.core.scheduler.get_available_cores`)
+        """
+        import concurrent.futures
+        import multiprocessing
+        from bioconvert.core.scheduler import get_available_cores
+
+        self.socket_filename = socket_filename or get_socket_filename()
+        if os.path.exists(self.socket_filename):
+            with ConversionClient(self.socket_filename) as client:
+                alive = client.is_alive()
+            if alive:
+                raise OSError("A server is already listening on {}".format(
+                    self.socket_filename))
+            os.remove(self.socket_filename)
+
+        _warm_up()
+        # the workers are forked after the warm up so that they inherit the
+        # registry and the imported converters
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            context = None
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers or get_available_cores(), mp_context=context)
+        # start the workers now (before the threads of the server)
+        self.executor.submit(os.getpid).result()
+        super().__init__(self.socket_filename, _RequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+        try:
+            os.remove(self.socket_filename)
+        except OSError:
+            pass
+
+
+class ConversionClient(object):
+    """Client of a :class:`ConversionServer`"""
+    def __init__(self, socket_filename=None, timeout=None):
+        """.. rubric:: constructor
+
+        :param str socket_filename: the Unix socket of the server
+        :param float timeout: maximum duration of a request in seconds
+        """
+        self.socket_filename = socket_filename or get_socket_filename()
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+
+    def _connect(self):
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(self.timeout)
+            try:
+                self._socket.connect(self.socket_filename)
+            except OSError:
+                self.close()
+                raise
+            self._file = self._socket.makefile("rwb")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_alive(self):
+        """Tells whether a server listens on the socket"""
+        try:
+            self._connect()
+            return True
+        except OSError:
+            return False
+
+    def request(self, request):
+        """Send a request (dictionary) and return the reply"""
+        self._connect()
+        request.setdefault("cwd", os.getcwd())
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        reply = self._file.readline()
+        if not reply:
+            self.close()
+            raise ConnectionError("The server closed the connection")
+        return json.loads(reply)
+
+    def convert(self, infile, outfile, converter=None, method=None,
+                force=False, threads=None, extra=None, **kwargs):
+        """Run a conversion on the server
+
+        :return: the reply of the server, a dictionary with the keys ok,
+            converter, error and time
+        """
+        return self.request({"infile": infile, "outfile": outfile,
+                             "converter": converter, "method": method,
+                             "force": force, "threads": threads,
+                             "extra": extra, "kwargs": kwargs})
+
+    def run(self, argv):
+        """Run a bioconvert command line on the server
+
+        :param list argv: the arguments (without the bioconvert program)
+        :return: the reply of the server, a dictionary with the keys
+            returncode, stdout and time
+        """
+        return self.request({"argv": list(argv)})
@@ -29,7 +29,7 @@ from bioconvert.core.extensions import extensions
 
 
 __all__ = ["get_extension", "get_format_from_extension",
-    "generate_outfile_name"]
+    "generate_outfile_name", "get_environment_state", "get_jobs_and_threads"]
 
 
 def get_extension(filename, remove_compression=False):
@@ -67,6 +67,67 @@ def generate_outfile_name(infile, out_extension):
     return '{}.{}'.format(os.path.splitext(infile)[0], out_extension)
 
 
+def get_environment_state():
+    """Return a fingerprint of the executables and python libraries available
+
+    The fingerprint is made of the directories of the PATH and of the
+    site-packages directories together with their modification time.
+    Installing or removing an executable or a python package changes the
+    modification time of its directory and therefore the fingerprint.
+
+    :return: a JSON serialisable dictionary
+    """
+    def get_mtimes(directories):
+        mtimes = []
+        for directory in directories:
+            try:
+                mtimes.append([directory, os.stat(directory).st_mtime])
+            except OSError:
+                # ignore directories that do not exist
+                pass
+        return mtimes
+
+    path = [x for x in os.environ.get("PATH", "").split(os.pathsep) if x]
+    return {
+        "python": sys.executable,
+        "PATH": get_mtimes(path),
+        "site_packages": get_mtimes([x for x in sys.path
+            if os.path.basename(x) in ("site-packages", "dist-packages")]),
+    }
+
+
+def get_jobs_and_threads(jobs, threads, threads_set=False, cores=None,
+                         max_jobs=None):
+    """Share the cores between files converted in parallel
+
+    :param int jobs: number of files converted in parallel (0 to use all
+        cores)
+    :param int threads: number of threads of each conversion (None if the
+        converter does not use threads)
+    :param bool threads_set: True if *threads* was set by the user, in which
+        case it is kept as is
+    :param int cores: number of cores available (defaults to
+        :func:`~bioconvert.core.scheduler.get_available_cores`)
+    :param int max_jobs: maximum number of jobs (e.g., the number of files),
+        the cores are shared between these jobs only
+    :return: the number of jobs and the number of threads per job
+    """
+    from bioconvert.core.scheduler import get_available_cores
+    cores = cores or get_available_cores()
+    if jobs <= 0:
+        jobs = cores
+    if max_jobs is not None:
+        jobs = max(1, min(jobs, max_jobs))
+    if threads is None:
+        return jobs, None
+    if not threads_set:
+        threads = max(1, cores // jobs)
+    elif jobs * threads > cores:
+        bioconvert.logger.warning("{} jobs with {} threads each exceed the {} "
+                                  "cores available".format(jobs, threads, cores))
+    return jobs, threads
+
+
 def get_format_from_extension(extension):
     """get format from extension.
 
@@ -87,16 +148,19 @@ def get_format_from_extension(extension):
 
 
 def compressor(infile, comp_ext, threads=4):
-    # FIXME: could be a method in ConvBase
-
-    if comp_ext == ".gz":
-        _log.info("Compressing output into .gz")
-        shell("pigz -f -p {} {}".format(threads, infile))
-    elif comp_ext == ".bz2":
-        _log.info("Compressing output into .bz2")
-        shell("pbzip2 -f -p{} {}".format(threads, infile))
-    elif comp_ext == ".dsrc":  # !!! only for FastQ files
-        _log.info("Compressing output into .dsrc")
-        shell("dsrc c -t{} {} {}.dsrc".format(
-            inst.threads, inst.outfile, inst.infile))
+    """Compress *infile* into *infile* + *comp_ext* and remove *infile*
 
+    :param str infile: the file to compress
+    :param str comp_ext: the compression extension (.gz, .bz2 or .dsrc, with
+        or without the leading dot)
+    :param int threads: number of threads used by the compression backend
+    :return: the name of the compressed file
+    """
+    # FIXME: could be a method in ConvBase
+    from bioconvert.core.compression import compress_file
+    comp_ext = "." + comp_ext.lstrip(".")
+    outfile = infile + comp_ext
+    bioconvert.logger.info("Compressing output into {}".format(comp_ext))
+    compress_file(infile, outfile, threads=threads)
+    os.remove(infile)
+    return outfile
@@ -28,7 +28,7 @@ from Bio import SeqIO
 
 from bioconvert import ConvBase
 from bioconvert.core.decorators import requires
-from bioconvert.core.decorators import compressor
+from bioconvert.core.decorators import compressor, streamable
 
 _log = colorlog.getLogger(__name__)
 
@@ -53,6 +53,7 @@ class FASTA2CLUSTAL(ConvBase):
 
     @requires(python_library="biopython")
     @compressor
+    @streamable
     def _method_biopython(self, *args, **kwargs):
         """
         Convert :term:`FASTA` interleaved file in :term:`CLUSTAL` format using biopython.
@@ -64,6 +65,7 @@ class FASTA2CLUSTAL(ConvBase):
 
     @requires("squizz")
     @compressor
+    @streamable
     def _method_squizz(self, *args, **kwargs):
         """
         Convert :term:`FASTA` file in :term:`CLUSTAL` format using squizz tool.
@@ -23,13 +23,14 @@
 # If not, see <http://www.gnu.org/licenses/>.                             #
 ###########################################################################
 """Convert :term:`FASTA` format to :term:`FAA` format"""
-import textwrap
+import re
+
 import colorlog
 
 from bioconvert import ConvBase
-from bioconvert.core.decorators import compressor
+from bioconvert.core.decorators import compressor, fasta_selection, streamable
 from bioconvert.core.decorators import requires
-from bioconvert.io.fasta import Fasta
+from bioconvert.io.fasta import Fasta, get_selection_arguments
 
 _log = colorlog.getLogger(__name__)
 
@@ -37,6 +38,15 @@ _log = colorlog.getLogger(__name__)
 __all__ = ["FASTA2FAA"]
 
 
+_codon = re.compile(b"...", re.DOTALL)
+
+
+class _Codons(dict):
+    """Codon (bytes) to amino acid (bytes) table, X for unknown codons"""
+    def __missing__(self, key):
+        return b"X"
+
+
 class FASTA2FAA(ConvBase):
     """
 
@@ -71,19 +81,30 @@ class FASTA2FAA(ConvBase):
             'TGC':'C', 'TGT':'C', 'TGA':'_', 'TGG':'W',
         }
 
+    @classmethod
+    def get_additional_arguments(cls):
+        yield from get_selection_arguments()
+
+    def translate(self, sequence, window=3 << 20):
+        """Return the translation of the *sequence* (bytes)
 
+        Codons are looked up by windows of the sequence so that the
+        translation of a chromosome does not need a list of all its codons.
+        """
+        codons = _Codons((k.encode(), v.encode()) for k, v in self.codons.items())
+        aa = [b"".join(map(codons.__getitem__, _codon.findall(sequence[i:i + window])))
+              for i in range(0, len(sequence), window)]
+        if len(sequence) % 3:
+            # incomplete last codon
+            aa.append(b"X")
+        return b"".join(aa)
+
+    @fasta_selection
     @compressor
+    @streamable
     def _method_bioconvert(self, *args, **kwargs):
-        data = Fasta(self.infile)
-        with open(self.outfile, "w") as fout:
-            for line in data.read():
-                fout.write(">{}\t{}\n".format(line['id'], line['comment']))
-                seq = line['value']
-
-                # translate the sequence
-                aa = "".join((self.codons.get(seq[i:i+3], "X") for i in range(0, len(seq), 3)))
-                fout.write("\n".join(textwrap.wrap(aa, 60)) + "\n")
-
-
-
-
+        with open(self.outfile, "wb") as fout:
+            for record in Fasta(self.infile, threads=self.threads):
+                fout.write(b">" + record.name + b"\t" + record.comment + b"\n")
+                aa = self.translate(record.sequence)
+                fout.write(b"\n".join(aa[i:i + 60] for i in range(0, len(aa), 60)) + b"\n")
@@ -27,9 +27,14 @@ from bioconvert.core.base import ConvArg
 from bioconvert import ConvBase
 from bioconvert import requires
 from bioconvert.core.decorators import requires, requires_nothing
+from bioconvert.io.fasta import Fasta, count_sequences
 
 from math import log10
 
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
 __all__ = ["FASTA2FASTA_AGP"]
 
 
@@ -137,11 +142,7 @@ https://github.com/bcgsc/abyss/blob/master/bin/abyss-fatoagp
         stretch_of_Ns = "N" * stretch_of_Ns
 
         # First, we need to figure out number of sequences
-        counter = 0
-        with open(self.infile, "r") as fin:
-            for line in fin.readlines():
-                if line.startswith(">"):
-                    counter += 1
+        counter = count_sequences(self.infile)
 
         # a simple lambda function 
         ZFILL = int(log10(counter)) + 1
@@ -151,7 +152,6 @@ https://github.com/bcgsc/abyss/blob/master/bin/abyss-fatoagp
 
         # We scan the input scaffold file and create (1) the contig fasta file 
         # and (2) the AGP file.
-        scaffold_counter = 0
         contig_counter = 0
 
         # given a scaffold AAANNNCCCNNNTTT :
@@ -162,58 +162,26 @@ https://github.com/bcgsc/abyss/blob/master/bin/abyss-fatoagp
 
         # mask scaftigs shorter than -S threshold with "N"s
 
-
-        with open(self.infile, "r") as fin:
-            fout_fasta = open(self.outfile_fasta, "w")
-            fout_agp = open(self.outfile_agp, "w")
+        stretch_of_Ns = stretch_of_Ns.encode()
+        with open(self.outfile_fasta, "wb") as fout_fasta, \
+                open(self.outfile_agp, "w") as fout_agp:
             fout_agp.write("##agp-version   2.0\n")
 
-            for line in fin.readlines():
-                if line.startswith(">") and scaffold_counter != 0:
-                    # a new line and we already read the first sequence.
-                    # So, so we need to save the contig now and the
-                    # AGP information into a file
-                    fout_fasta.write(">contig_" + _frmt(scaffold_counter) + "\n")
-                    fout_fasta.write("{}\n".format(current))
-
-                    # Save the previous AGP line if required
-                    L = len(current)
-                    data = ["scaffold_" + _frmt(scaffold_counter), 1, L, 1, "W", 
-                            "contig_" + _frmt(contig_counter), 1, L, "+"]
-                    data = [str(x) for x in data]
-                    fout_agp.write("\t".join(data) + "\n")
-
-                    # reset the current sequence
-                    current = ""
-
-                    # now we increment the counter
-                    scaffold_counter += 1
-
-                elif line.startswith(">") is False:
-                    # accumulating the sequence with upper case
-                    current += line.strip().upper()
-                    # Do we have Ns
-                    indexN = current.find(stretch_of_Ns)
-                    if indexN != -1:
-                        print("Found Ns")
-
-                elif line.startswith(">"):
-                    # This is the first line of the file
-                    current = ""
-                    scaffold_counter += 1
-                else:
-                    raise IOError("Not a valid FASTA file")
-
-            # finally, the last line in the AGP file
-            fout_fasta.write(">contig_" + _frmt(scaffold_counter) + "\n")
-            fout_fasta.write("{}\n".format(current))
-            L = len(current)
-            data = ["scaffold_" + _frmt(scaffold_counter), 1, L, 1, "W", 
-                    "contig_" + _frmt(contig_counter), 1, L, "+"]
-            data = [str(x) for x in data]
-            fout_agp.write("\t".join(data)+"\n")
-            fout_agp.close()
-            fout_fasta.close()
+            for scaffold_counter, record in enumerate(Fasta(self.infile), start=1):
+                # the sequence with upper case
+                current = record.sequence.upper()
+                # Do we have Ns
+                if stretch_of_Ns in current:
+                    _log.debug("Found Ns in scaffold {}".format(scaffold_counter))
+
+                # save the contig and the AGP information
+                fout_fasta.write(">contig_{}\n".format(_frmt(scaffold_counter)).encode())
+                fout_fasta.write(current + b"\n")
+                L = len(current)
+                data = ["scaffold_" + _frmt(scaffold_counter), 1, L, 1, "W", 
+                        "contig_" + _frmt(contig_counter), 1, L, "+"]
+                data = [str(x) for x in data]
+                fout_agp.write("\t".join(data) + "\n")
 
     @classmethod
     def get_additional_arguments(cls):
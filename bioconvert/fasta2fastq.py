@@ -26,7 +26,8 @@
 from bioconvert import ConvBase
 import colorlog
 from bioconvert.core.decorators import compressor
-from bioconvert.core.decorators import requires
+from bioconvert.core.decorators import fasta_selection, requires
+from bioconvert.io.fasta import get_selection_arguments
 
 _log = colorlog.getLogger(__name__)
 
@@ -49,7 +50,12 @@ class FASTA2FASTQ(ConvBase):
         """
         super(FASTA2FASTQ, self).__init__(infile, outfile)
 
+    @classmethod
+    def get_additional_arguments(cls):
+        yield from get_selection_arguments()
+
     @requires(python_library="pysam")
+    @fasta_selection
     @compressor
     def _method_pysam(self, quality_file=None, *args, **kwargs):
         from pysam import FastxFile
@@ -28,8 +28,8 @@ from math import log, floor
 
 from bioconvert import ConvBase
 from bioconvert.core.decorators import requires, requires_nothing
-from bioconvert.core.decorators import compressor
-from bioconvert.io.fasta import Fasta
+from bioconvert.core.decorators import compressor, fasta_selection
+from bioconvert.io.fasta import Fasta, get_selection_arguments
 
 
 __all__ = ["FASTA2GENBANK"]
@@ -56,7 +56,12 @@ class FASTA2GENBANK(ConvBase):
         """
         super(FASTA2GENBANK, self).__init__(infile, outfile, *args, **kargs)
 
+    @classmethod
+    def get_additional_arguments(cls):
+        yield from get_selection_arguments()
+
     @requires("squizz")
+    @fasta_selection
     @compressor
     def _method_squizz(self, *args, **kwargs):
         """Header is less informative than the one obtained with biopython"""
@@ -64,6 +69,7 @@ class FASTA2GENBANK(ConvBase):
         self.execute(cmd)
 
     @requires(python_library="biopython")
+    @fasta_selection
     @compressor
     def _method_biopython(self, *args, **kwargs):
         print("Using DNA alphabet for now")
@@ -74,45 +80,38 @@ class FASTA2GENBANK(ConvBase):
     # --- Pure python methods ---
 
     @requires_nothing
+    @fasta_selection
     def _method_bioconvert(self, *args, **kwargs):
         print("Using DNA alphabet for now")
-        reader = Fasta(self.infile)
+        reader = Fasta(self.infile, threads=self.threads)
 
-        with open(self.outfile, "w") as writer:
-            for sequence in reader.read():
-                seq_size = len(sequence["value"])
+        with open(self.outfile, "wb") as writer:
+            for sequence in reader:
+                name = sequence.name.decode()
+                value = sequence.sequence
+                seq_size = len(value)
                 num_digit = floor(log(seq_size, 10)) + 1
 
                 # Sequence header
                 now = datetime.datetime.now()
                 writer.write("LOCUS       {}{}{} bp DNA              XXX {}-{}-{}\n".format(
-                    sequence["id"],
-                    " "*(max(1, 28 - len(sequence["id"]) - num_digit)),
+                    name,
+                    " "*(max(1, 28 - len(name) - num_digit)),
                     seq_size,
-                    now.day, now.month, now.year))
-                writer.write("DEFINITION  {}\n".format(sequence["comment"]))
-                writer.write("ORIGIN      \n")
+                    now.day, now.month, now.year).encode())
+                writer.write(b"DEFINITION  " + sequence.comment + b"\n")
+                writer.write(b"ORIGIN      \n")
 
-                # Print sequence
+                # Print sequence: the position in the sequence then 6 slices
+                # of 10 bases per line. Lines are written by batches.
+                lines = []
                 for seq_idx in range(0, seq_size, 60):
-                    # Write line header (idx in the sequence)
-                    idx_num_digit = floor(log(seq_idx+1, 10)) + 1
-                    writer.write("{}{}".format(" "*(9 - idx_num_digit), seq_idx+1))
-
-                    # write the sequence itself
-                    for i in range(6):
-                        begin = seq_idx+i*10
-                        end = seq_idx+(i+1)*10
-
-                        # sequence over before this slice
-                        if begin >= seq_size:
-                            break
-                        # sequence over during this slice
-                        elif end > seq_size:
-                            writer.write(" {}".format(sequence["value"][begin:seq_size]))
-                        else:
-                            writer.write(" {}".format(sequence["value"][begin:end]))
-
-                    # newline
-                    writer.write("\n")
-                writer.write("//\n")
+                    line = value[seq_idx:seq_idx + 60]
+                    lines.append(b"%9d " % (seq_idx + 1) + b" ".join(
+                        [line[i:i + 10] for i in range(0, len(line), 10)]))
+                    if len(lines) == 10000:
+                        writer.write(b"\n".join(lines) + b"\n")
+                        lines = []
+                if lines:
+                    writer.write(b"\n".join(lines) + b"\n")
+                writer.write(b"//\n")
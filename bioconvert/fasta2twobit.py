@@ -28,7 +28,8 @@ from Bio import SeqIO
 
 from bioconvert import ConvBase
 from bioconvert.core.decorators import requires
-from bioconvert.core.decorators import compressor
+from bioconvert.core.decorators import compressor, fasta_selection
+from bioconvert.io.fasta import get_selection_arguments
 
 _log = colorlog.getLogger(__name__)
 
@@ -52,7 +53,12 @@ class FASTA2TWOBIT(ConvBase):
         """
         super(FASTA2TWOBIT, self).__init__(infile, outfile)
 
+    @classmethod
+    def get_additional_arguments(cls):
+        yield from get_selection_arguments()
+
     @requires("faToTwoBit")
+    @fasta_selection
     @compressor
     def _method_ucsc(self, *args, **kwargs):
         """
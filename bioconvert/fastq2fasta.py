@@ -26,7 +26,8 @@
 from bioconvert import ConvBase, bioconvert_script
 # from bioconvert.core.base import ConvArg
 from bioconvert.core.decorators import compressor, in_gz
-from bioconvert.core.decorators import requires, requires_nothing
+from bioconvert.core.decorators import requires, requires_nothing, streamable
+from bioconvert.io.fastq import Fastq
 
 from mappy import fastx_read
 import mmap
@@ -79,42 +80,16 @@ class FASTQ2FASTA(ConvBase):
                 FastaIO.FastaWriter(fasta_out, wrap=None).write_file(
                     SeqIO.parse(infile, 'fasta'))
 
-    # Adapted from the readfq code by Heng Li
-    # (https://raw.githubusercontent.com/lh3/readfq/master/readfq.py)
-    @staticmethod
-    def readfq(fp):  # this is a generator function
-        last = None  # this is a buffer keeping the last unprocessed line
-        while True:  # mimic closure; is it a bad idea?
-            if not last:  # the first record or a record following a fastq
-                for l in fp:  # search for the start of the next record
-                    if l[0] == "@":  # fastq header line
-                        last = l[:-1]  # save this line
-                        break
-            if not last:
-                break
-            header, seqs, last = last[1:], [], None
-            for l in fp:  # read the sequence
-                if l[0] in '@+':
-                    last = l[:-1]
-                    break
-                seqs.append(l[:-1])
-            seq, leng, seqs = ''.join(seqs), 0, []
-            for l in fp:  # read the quality
-                seqs.append(l[:-1])
-                leng += len(l) - 1
-                if leng >= len(seq):  # have read enough quality
-                    last = None
-                    yield header, seq, ''.join(seqs)  # yield a fastq record
-                    break
-
     @requires(python_library="biopython")
     @compressor
+    @streamable
     def _method_biopython(self, *args, **kwargs):
         from Bio import SeqIO
         records = SeqIO.parse(self.infile, 'fastq')
         SeqIO.write(records, self.outfile, 'fasta')
 
     @requires(external_binary="seqtk")
+    @streamable
     def _method_seqtk(self, *args, **kwargs):
         # support gz files natively
         cmd = "seqtk seq -A {} > {}".format(self.infile, self.outfile)
@@ -122,10 +97,12 @@ class FASTQ2FASTA(ConvBase):
 
     @requires_nothing
     @compressor
+    @streamable
     def _method_readfq(self, *args, **kwargs):
-        with open(self.outfile, "w") as fasta, open(self.infile, "r") as fastq:
-            for (name, seq, _) in FASTQ2FASTA.readfq(fastq):
-                fasta.write(">{}\n{}\n".format(name, seq))
+        with open(self.outfile, "wb") as fasta:
+            for records in Fastq(self.infile, threads=self.threads).batches():
+                fasta.write(b"".join(b">%s\n%s\n" % (name, seq)
+                                     for (name, seq, _) in records))
 
     # Does not give access to the comment part of the header
     @requires(python_library="mappy")
@@ -136,6 +113,7 @@ class FASTQ2FASTA(ConvBase):
 
     @requires("awk")
     @compressor
+    @streamable
     def _method_awk(self, *args, **kwargs):
         # Note1: since we use .format, we need to escape the { and } characters
         # Note2: the \n need to be escaped for Popen to work
@@ -145,6 +123,7 @@ class FASTQ2FASTA(ConvBase):
 
     @requires("mawk")
     @compressor
+    @streamable
     def _method_mawk(self, *args, **kwargs):
         """This variant of the awk method uses mawk, a lighter and faster
         implementation of awk."""
@@ -172,30 +151,35 @@ class FASTQ2FASTA(ConvBase):
     #     self.execute(cmd)
 
     @requires("awk")
+    @streamable
     def _method_awk_v2(self, *args, **kwargs):
         awkcmd = """awk '{{print ">"substr($0,2);getline;print;getline;getline}}'"""
         cmd = "{} {} > {}".format(awkcmd, self.infile, self.outfile)
         self.execute(cmd)
 
     @requires("mawk")
+    @streamable
     def _method_mawk_v2(self, *args, **kwargs):
         awkcmd = """mawk '{{print ">"substr($0,2);getline;print;getline;getline}}'"""
         cmd = "{} {} > {}".format(awkcmd, self.infile, self.outfile)
         self.execute(cmd)
 
     @requires("sed")
+    @streamable
     def _method_sed(self, *args, **kwargs):
         cmd = """sed -n '1~4s/^@/>/p;2~4p' """
         cmd = "{} {} > {}".format(cmd, self.infile, self.outfile)
         self.execute(cmd)
 
     @requires("sed")
+    @streamable
     def _method_sed_v2(self, *args, **kwargs):
         cmd = """sed -n 's/^@/>/p;n;p;n;n'"""
         cmd = "{} {} > {}".format(cmd, self.infile, self.outfile)
         self.execute(cmd)
 
     @requires("mawk")
+    @streamable
     def _method_mawk_v3(self, *args, **kwargs):
         awkcmd = """mawk '(++n<=0){next}(n!=1){print;n=-2;next}{print">"substr($0,2)}'"""
         cmd = "{} {} > {}".format(awkcmd, self.infile, self.outfile)
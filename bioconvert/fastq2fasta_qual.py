@@ -27,6 +27,7 @@ from bioconvert import ConvBase, bioconvert_script
 from bioconvert.core.base import ConvArg
 from bioconvert.core.decorators import compressor, in_gz
 from bioconvert.core.decorators import requires, requires_nothing
+from bioconvert.io.fastq import Fastq
 
 from mappy import fastx_read
 import mmap
@@ -59,39 +60,15 @@ class FASTQ2FASTA_QUAL(ConvBase):
         self.outfile = outfile[0]
         self.outfile2 = outfile[1]
 
-    @staticmethod
-    def _readfq(fp):  # this is a generator function
-        last = None  # this is a buffer keeping the last unprocessed line
-        while True:  # mimic closure; is it a bad idea?
-            if not last:  # the first record or a record following a fastq
-                for l in fp:  # search for the start of the next record
-                    if l[0] == "@":  # fastq header line
-                        last = l[:-1]  # save this line
-                        break
-            if not last:
-                break
-            header, seqs, last = last[1:], [], None
-            for l in fp:  # read the sequence
-                if l[0] in '@+':
-                    last = l[:-1]
-                    break
-                seqs.append(l[:-1])
-            seq, leng, seqs = ''.join(seqs), 0, []
-            for l in fp:  # read the quality
-                seqs.append(l[:-1])
-                leng += len(l) - 1
-                if leng >= len(seq):  # have read enough quality
-                    last = None
-                    yield header, seq, ''.join(seqs)  # yield a fastq record
-                    break
-
     @requires_nothing
     @compressor
     def _method_python(self, *args, **kwargs):
-        with open(self.outfile, "w") as fasta, open(self.outfile2, "w") as quality, open(self.infile, "r") as fastq:
-            for (name, seq, qual) in FASTQ2FASTA_QUAL._readfq(fastq):
-                fasta.write(">{}\n{}\n".format(name, seq))
-                quality.write(">{}\n{}\n".format(name, qual))
+        with open(self.outfile, "wb") as fasta, open(self.outfile2, "wb") as quality:
+            for records in Fastq(self.infile, threads=self.threads).batches():
+                fasta.write(b"".join(b">%s\n%s\n" % (name, seq)
+                                     for (name, seq, _) in records))
+                quality.write(b"".join(b">%s\n%s\n" % (name, qual)
+                                       for (name, _, qual) in records))
 
     @staticmethod
     def get_IO_arguments():
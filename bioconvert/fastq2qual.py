@@ -26,6 +26,8 @@
 from bioconvert import ConvBase, bioconvert_script
 from bioconvert.core.base import ConvArg
 from bioconvert.core.decorators import compressor, out_compressor, in_gz, requires, requires_nothing
+from bioconvert.core.decorators import streamable
+from bioconvert.io.fastq import Fastq
 from bioconvert import logger
 logger.__name__ = "fastq2qual"
 
@@ -38,33 +40,6 @@ class FASTQ2QUAL(ConvBase):
     # Make sure that the default handles also the compresssion
     _default_method = "readfq"
 
-    # (https://raw.githubusercontent.com/lh3/readfq/master/readfq.py)
-    @staticmethod
-    def _readfq(fp):  # this is a generator function
-        last = None  # this is a buffer keeping the last unprocessed line
-        while True:  # mimic closure; is it a bad idea?
-            if not last:  # the first record or a record following a fastq
-                for l in fp:  # search for the start of the next record
-                    if l[0] == "@":  # fastq header line
-                        last = l[:-1]  # save this line
-                        break
-            if not last:
-                break
-            header, seqs, last = last[1:], [], None
-            for l in fp:  # read the sequence
-                if l[0] in '@+':
-                    last = l[:-1]
-                    break
-                seqs.append(l[:-1])
-            seq, leng, seqs = ''.join(seqs), 0, []
-            for l in fp:  # read the quality
-                seqs.append(l[:-1])
-                leng += len(l) - 1
-                if leng >= len(seq):  # have read enough quality
-                    last = None
-                    yield header, seq, ''.join(seqs)  # yield a fastq record
-                    break
-
     def __init__(self, infile, outfile):
         """
         :param str infile: The path to the input FASTA file.
@@ -75,10 +50,12 @@ class FASTQ2QUAL(ConvBase):
 
     @requires_nothing
     @compressor
+    @streamable
     def _method_readfq(self, *args, **kwargs):
-        with open(self.outfile, "w") as outfile, open(self.infile, "r") as fastq:
-            for (name, seq, qual) in FASTQ2QUAL._readfq(fastq):
-                outfile.write(">{}\n{}\n".format(name, qual))
+        with open(self.outfile, "wb") as outfile:
+            for records in Fastq(self.infile, threads=self.threads).batches():
+                outfile.write(b"".join(b">%s\n%s\n" % (name, qual)
+                                       for (name, _, qual) in records))
 
 
 
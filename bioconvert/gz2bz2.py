@@ -24,11 +24,11 @@
 ###########################################################################
 
 """Convert :term:`GZ` file to :term:`BZ2` format"""
-import bz2
-import gzip
+import shutil
 
 from bioconvert import ConvBase
 from bioconvert.core.base import ConvArg
+from bioconvert.core.compression import open_compressed
 from bioconvert.core.decorators import requires, requires_nothing
 
 __all__ = ["GZ2BZ2"]
@@ -75,6 +75,9 @@ class GZ2BZ2(ConvBase):
 
     @requires_nothing
     def _method_python(self):
-        with gzip.open(self.infile, 'rb') as f, bz2.open(self.outfile, 'wb')as g:
-            g.write(f.read())
+        with open_compressed(self.infile, "rb", self.threads,
+                             compression=".gz") as f, \
+                open_compressed(self.outfile, "wb", self.threads,
+                                compression=".bz2") as g:
+            shutil.copyfileobj(f, g, 1 << 20)
 
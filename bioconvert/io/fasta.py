@@ -22,42 +22,531 @@
 # along with this program (COPYING file).                                 #
 # If not, see <http://www.gnu.org/licenses/>.                             #
 ###########################################################################
+"""Block-based reader and index of :term:`FASTA` files
 
+:class:`Fasta` reads a FASTA file sequentially. :class:`FastaIndex` gives a
+random access to the sequences and regions of a file through a samtools
+compatible index (.fai, plus .gzi for files compressed with bgzip) so that
+extracting a few regions does not require reading the whole file::
 
-class Fasta():
-    """Read a fasta file"""
-    def __init__(self, filename):
+    with FastaIndex("genome.fa") as index:
+        sequence = index.fetch("chr1", 999, 2000)
+
+"""
+import os
+from collections import namedtuple
+
+import colorlog
+
+from bioconvert.core.compression import get_compression, open_compressed
+
+_log = colorlog.getLogger(__name__)
+
+
+__all__ = ["Fasta", "FastaRecord", "FastaIndex", "FaiEntry",
+           "count_sequences", "extract", "get_selection_arguments"]
+
+
+#: size of the blocks read from the FASTA files
+BLOCK_SIZE = 1 << 20
+
+# characters removed from the sequence lines
+_WHITESPACE = b" \t\r\n\v\f"
+
+
+class FastaRecord(object):
+    """A sequence of a FASTA file
+
+    The *name*, *comment* and *sequence* attributes are bytes. For
+    compatibility with the former reader, ``record["id"]``,
+    ``record["comment"]`` and ``record["value"]`` return them as strings.
+    """
+    __slots__ = ("name", "comment", "sequence")
+
+    _keys = {"id": "name", "comment": "comment", "value": "sequence"}
+
+    def __init__(self, name, comment, sequence):
+        self.name = name
+        self.comment = comment
+        self.sequence = sequence
+
+    def __getitem__(self, key):
+        return getattr(self, self._keys[key]).decode()
+
+    def __repr__(self):
+        return "<FastaRecord {} ({} bp)>".format(self.name.decode(),
+                                                len(self.sequence))
+
+
+class Fasta(object):
+    """Read a FASTA file, possibly compressed (.gz, .bz2)
+
+    The file is read by blocks of bytes. The lines of a sequence are
+    joined once, whatever their number, so that reading a chromosome is
+    linear in its length::
+
+        for record in Fasta("genome.fa.gz"):
+            print(record.name, len(record.sequence))
+
+    If *names* or *regions* are given, only these sequences and regions
+    are read, in this order, through the index of the file (see
+    :class:`FastaIndex`). The records of the regions are named after the
+    region (e.g., chr1:1000-2000) and have no comment.
+    """
+    def __init__(self, filename, threads=1, block_size=BLOCK_SIZE,
+                 names=None, regions=None):
+        """.. rubric:: constructor
+
+        :param str filename: the FASTA file
+        :param int threads: number of threads used to decompress the file
+        :param int block_size: size of the blocks read from the file
+        :param list names: names of the sequences to read
+        :param list regions: regions to read (e.g., chr1:1,000-2,000, see
+            :meth:`FastaIndex.parse_region`)
+        """
         self.filename = filename
+        self.threads = threads
+        self.block_size = block_size
+        self.names = _as_list(names)
+        self.regions = _as_list(regions)
 
-    def read(self):
-        """ Read fasta sequence by sequence creating a generator """
-        sequence = {"id":"", "comment":"", "value":""}
-
-        with open(self.filename) as reader:
-            line = None
-
-            for line in reader:
-                # Remove line return and useless spaces
-                line = " ".join(line.split())
-
-                # Header case
-                if line[0] == ">":
-                    if len(sequence["id"]) > 0:
-                        yield sequence
-
-                    # create new sequence
-                    sequence = {"id":"", "comment":"", "value":""}
-                    # Parse header to split into id and comment
-                    idx = line.find(" ")
-                    if idx == -1:
-                        sequence["id"] = line[1:]
+    def __iter__(self):
+        if self.names or self.regions:
+            return self._iter_selection()
+        return self._iter_blocks()
+
+    def _iter_selection(self):
+        with FastaIndex(self.filename) as index:
+            for name in self.names:
+                yield FastaRecord(name.encode(), index.get_comment(name),
+                                  index.fetch(name))
+            for region in self.regions:
+                name, start, end = index.parse_region(region)
+                end = min(end, index[name].length)
+                yield FastaRecord("{}:{}-{}".format(name, start + 1, end).encode(),
+                                  b"", index.fetch(name, start, end))
+
+    def _iter_blocks(self):
+        # the sequence lines of a block are added to the sequence even if
+        # the last one is not complete, so that a long sequence on a single
+        # line is not copied at each block. Only an unfinished header line
+        # is carried over to the next block.
+        name = None
+        comment = b""
+        parts = []
+        # parts of the header line being read (None outside of a header)
+        header = None
+        line_start = True
+        with open_compressed(self.filename, "rb", self.threads) as fin:
+            for data in iter(lambda: fin.read(self.block_size), b""):
+                size = len(data)
+                pos = 0
+                while pos < size:
+                    if header is None and line_start and data[pos] == 62:  # ">"
+                        header = []
+                        pos += 1
+                    if header is not None:
+                        end = data.find(b"\n", pos)
+                        if end == -1:
+                            header.append(data[pos:])
+                            break
+                        header.append(data[pos:end])
+                        if name:
+                            yield FastaRecord(name, comment, b"".join(parts))
+                        name, comment = _parse_header(b"".join(header))
+                        parts = []
+                        header = None
+                        line_start = True
+                        pos = end + 1
                     else:
-                        sequence["id"] = line[1:idx]
-                        sequence["comment"] = line[idx+1:]
+                        # all the sequence lines up to the next header
+                        stop = data.find(b"\n>", pos)
+                        stop = size if stop == -1 else stop + 1
+                        parts.append(data[pos:stop].translate(None, _WHITESPACE))
+                        line_start = data[stop - 1] == 10  # "\n"
+                        pos = stop
+        if header is not None:
+            # last line without end of line
+            if name:
+                yield FastaRecord(name, comment, b"".join(parts))
+            name, comment = _parse_header(b"".join(header))
+            parts = []
+        if name:
+            yield FastaRecord(name, comment, b"".join(parts))
+
+    def read(self):
+        """Read the FASTA file sequence by sequence (generator of
+        :class:`FastaRecord`)"""
+        return iter(self)
+
+
+def _parse_header(line):
+    """Return the name and the comment of a header line (without ">")"""
+    fields = line.split(None, 1)
+    name = fields[0] if fields else b""
+    comment = b" ".join(fields[1].split()) if len(fields) > 1 else b""
+    return name, comment
+
+
+def _as_list(values):
+    """Return *values* as a list (a single string is a list of one item)"""
+    if not values:
+        return []
+    if isinstance(values, str):
+        return [values]
+    return list(values)
+
+
+def _is_bgzf(filename):
+    """Tell whether *filename* is compressed with bgzip (blocked gzip)"""
+    with open(filename, "rb") as fin:
+        header = fin.read(18)
+    # gzip magic number with the FEXTRA flag and the BC extra subfield
+    return len(header) == 18 and header[:4] == b"\x1f\x8b\x08\x04" \
+        and header[12:14] == b"BC"
+
+
+#: an entry of a .fai index: the name and length of the sequence, the
+#: offset of its first base in the file, the number of bases per line and
+#: the number of bytes per line (including the end of line)
+FaiEntry = namedtuple("FaiEntry", ["name", "length", "offset", "linebases",
+                                   "linewidth"])
+
+
+class FastaIndex(object):
+    """Random access to the sequences of a FASTA file
+
+    The index is a samtools compatible .fai file (*filename* + .fai). It is
+    built the first time the file is indexed and reused afterwards, as long
+    as it is newer than the FASTA file. If the index cannot be written
+    (e.g., read-only directory), it is kept in memory.
+
+    Uncompressed files are read directly: fetching a region is a single
+    seek, whatever its position in the file. Files compressed with bgzip
+    are read with pysam, which also builds the .gzi index of the
+    compressed blocks. Other compressed files cannot be indexed.
+
+    ::
+
+        with FastaIndex("genome.fa") as index:
+            for name in index.names:
+                print(name, index[name].length)
+            index.fetch(*index.parse_region("chr1:1,000-2,000"))
+
+    """
+    def __init__(self, filename):
+        """.. rubric:: constructor
+
+        :param str filename: the FASTA file (uncompressed or compressed
+            with bgzip)
+        """
+        self.filename = filename
+        self.index_filename = filename + ".fai"
+        self._handle = None
+        self._faidx = None
+
+        compression = get_compression(filename)
+        if compression:
+            if compression != ".gz" or not _is_bgzf(filename):
+                raise ValueError(
+                    "{} cannot be indexed: random access needs an uncompressed "
+                    "file or a file compressed with bgzip".format(filename))
+            # pysam builds the .fai and .gzi indexes if needed
+            import pysam
+            self._faidx = pysam.FastaFile(filename)
+            self.entries = self._read_index()
+        elif self._is_index_valid():
+            self.entries = self._read_index()
+        else:
+            self.entries = self._build_index()
+            self._write_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __getitem__(self, name):
+        try:
+            return self.entries[name]
+        except KeyError:
+            raise ValueError("Unknown sequence {} in {}".format(
+                name, self.filename)) from None
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def names(self):
+        """names of the sequences, in the order of the file"""
+        return list(self.entries)
+
+    def close(self):
+        """Close the FASTA file"""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._faidx is not None:
+            self._faidx.close()
+            self._faidx = None
+
+    def _is_index_valid(self):
+        try:
+            return os.path.getmtime(self.index_filename) >= \
+                os.path.getmtime(self.filename)
+        except OSError:
+            return False
+
+    def _read_index(self):
+        entries = {}
+        with open(self.index_filename) as fin:
+            for line in fin:
+                fields = line.rstrip("\n").split("\t")
+                entry = FaiEntry(fields[0], *(int(x) for x in fields[1:5]))
+                entries[entry.name] = entry
+        return entries
+
+    def _write_index(self):
+        tmpfile = "{}.{}.tmp".format(self.index_filename, os.getpid())
+        try:
+            with open(tmpfile, "w") as fout:
+                for entry in self.entries.values():
+                    fout.write("\t".join(str(x) for x in entry) + "\n")
+            os.replace(tmpfile, self.index_filename)
+        except OSError as err:
+            _log.warning("Index of {} kept in memory: {}".format(
+                self.filename, err))
+
+    def _build_index(self):
+        """Read the whole file by blocks and return the entries of its
+        sequences"""
+        _log.info("Indexing {}".format(self.filename))
+        entries = {}
+        name = None
+
+        def add_entry():
+            # empty sequences are not indexed (as with samtools)
+            if not length:
+                return
+            if not linebases:
+                raise ValueError("Cannot index {}: empty line in sequence "
+                                 "{}".format(self.filename, name))
+            # all lines but the last one must have the same length
+            full, rest = divmod(length, linebases)
+            expected = full * linewidth
+            if rest:
+                expected += rest + linewidth - linebases
+            if not expected - (linewidth - linebases) <= nbytes <= expected:
+                raise ValueError("Cannot index {}: lines of sequence {} have "
+                                 "different lengths".format(self.filename, name))
+            if name in entries:
+                raise ValueError("Cannot index {}: duplicated sequence "
+                                 "{}".format(self.filename, name))
+            entries[name] = FaiEntry(name, length, offset, linebases, linewidth)
+
+        # the blocks are not joined so that a long sequence on a single line
+        # is not copied at each block: the bases of a line split across two
+        # blocks are counted block by block, and only an unfinished header
+        # line is carried over to the next block
+        with open(self.filename, "rb") as fin:
+            # offset in the file of the first byte of the block
+            block_offset = 0
+            # parts of the header line being read (None outside of a header)
+            header = None
+            line_start = True
+            for data in iter(lambda: fin.read(BLOCK_SIZE), b""):
+                size = len(data)
+                pos = 0
+                while pos < size:
+                    if header is None and line_start and data[pos] == 62:  # ">"
+                        if name is not None:
+                            add_entry()
+                        header = []
+                        pos += 1
+                    if header is not None:
+                        end = data.find(b"\n", pos)
+                        if end == -1:
+                            header.append(data[pos:])
+                            break
+                        header.append(data[pos:end])
+                        fields = b"".join(header).split(None, 1)
+                        name = fields[0].decode() if fields else ""
+                        offset = block_offset + end + 1
+                        length = nbytes = 0
+                        linebases = linewidth = None
+                        # bytes of the first line of the sequence read so
+                        # far and whether the last one is a "\r"
+                        first_line = 0
+                        last_cr = False
+                        header = None
+                        line_start = True
+                        pos = end + 1
+                        continue
+
+                    stop = data.find(b"\n>", pos)
+                    stop = size if stop == -1 else stop + 1
+                    line_start = data[stop - 1] == 10  # "\n"
+                    chunk = data[pos:stop]
+                    pos = stop
+                    if name is None:
+                        if chunk.strip():
+                            raise ValueError("Cannot index {}: data before "
+                                             "the first sequence".format(
+                                                 self.filename))
+                        continue
+                    if linewidth is None:
+                        eol = chunk.find(b"\n")
+                        if eol == -1:
+                            first_line += len(chunk)
+                            last_cr = chunk.endswith(b"\r")
+                        else:
+                            if eol:
+                                last_cr = chunk[eol - 1] == 13  # "\r"
+                            linewidth = first_line + eol + 1
+                            linebases = linewidth - 1 - last_cr
+                    length += len(chunk) - chunk.count(b"\n") - chunk.count(b"\r")
+                    nbytes += len(chunk)
+                block_offset += size
+        # (a last header line without end of line is an empty sequence,
+        # not indexed)
+        if header is None and name is not None:
+            if linewidth is None:
+                # a last line without end of line counts as a complete line
+                # (as with samtools)
+                linebases = first_line - last_cr
+                linewidth = linebases + 1
+            add_entry()
+        return entries
+
+    def _get_handle(self):
+        if self._handle is None:
+            self._handle = open(self.filename, "rb")
+        return self._handle
+
+    def parse_region(self, region):
+        """Return the sequence name and the 0-based, half-open coordinates
+        of a samtools-like *region*
+
+        The region is *name*, *name:begin* or *name:begin-end* with 1-based,
+        inclusive coordinates (commas are ignored). For instance,
+        chr1:1,000-2,000 is returned as ("chr1", 999, 2000). The end is the
+        length of the sequence if not given.
+
+        :param str region: the region
+        """
+        if region in self.entries:
+            return region, 0, self.entries[region].length
+        name, sep, interval = region.rpartition(":")
+        if not sep or name not in self.entries:
+            raise ValueError("Unknown sequence in region {}".format(region))
+        begin, _, end = interval.replace(",", "").partition("-")
+        try:
+            start = int(begin) - 1
+            end = int(end) if end else self.entries[name].length
+        except ValueError:
+            raise ValueError("Invalid region {}".format(region)) from None
+        if start < 0 or end <= start:
+            raise ValueError("Invalid region {}".format(region))
+        return name, start, end
+
+    def fetch(self, name, start=0, end=None):
+        """Return the bases of a sequence between *start* and *end*
+        (0-based, half-open coordinates) as bytes
+
+        :param str name: the name of the sequence
+        :param int start: first position
+        :param int end: position after the last one (defaults to the end of
+            the sequence)
+        """
+        entry = self[name]
+        end = entry.length if end is None else min(end, entry.length)
+        start = max(start, 0)
+        if start >= end:
+            return b""
+        if self._faidx is not None:
+            return self._faidx.fetch(name, start, end).encode()
+        first = entry.offset + start // entry.linebases * entry.linewidth \
+            + start % entry.linebases
+        last = entry.offset + (end - 1) // entry.linebases * entry.linewidth \
+            + (end - 1) % entry.linebases + 1
+        handle = self._get_handle()
+        handle.seek(first)
+        return handle.read(last - first).translate(None, b"\r\n")
+
+    def get_comment(self, name):
+        """Return the comment of the header of a sequence (empty for files
+        compressed with bgzip)"""
+        entry = self[name]
+        if self._faidx is not None:
+            return b""
+        handle = self._get_handle()
+        # the header line ends just before the first base
+        size = 1024
+        while True:
+            start = max(entry.offset - size, 0)
+            handle.seek(start)
+            data = handle.read(entry.offset - start)
+            header = data.rfind(b">")
+            if header != -1 and (header > 0 and data[header - 1] == 10 or start == 0):
+                break
+            if start == 0:
+                return b""
+            size *= 4
+        fields = data[header + 1:].split(None, 1)
+        return b" ".join(fields[1].split()) if len(fields) > 1 else b""
+
+
+def extract(filename, outfile, names=None, regions=None, width=60):
+    """Write the sequences *names* and the *regions* of a FASTA file into
+    *outfile*, without reading the rest of the file (see
+    :class:`FastaIndex`)
+
+    :param str filename: the input FASTA file
+    :param str outfile: the output FASTA file
+    :param list names: names of the sequences
+    :param list regions: regions (e.g., chr1:1,000-2,000)
+    :param int width: number of bases per line
+    """
+    with open(outfile, "wb") as fout:
+        for record in Fasta(filename, names=names, regions=regions):
+            fout.write(b">" + record.name)
+            if record.comment:
+                fout.write(b" " + record.comment)
+            fout.write(b"\n")
+            sequence = record.sequence
+            fout.write(b"".join(sequence[i:i + width] + b"\n"
+                                for i in range(0, len(sequence), width)))
+
+
+def get_selection_arguments():
+    """The --names and --regions arguments of the converters of FASTA files
+    (see :func:`~bioconvert.core.decorators.fasta_selection`)"""
+    from bioconvert.core.base import ConvArg
+    yield ConvArg(
+        names="--names",
+        nargs="+",
+        default=None,
+        help="convert only these sequences (the input FASTA file is indexed)",
+    )
+    yield ConvArg(
+        names="--regions",
+        nargs="+",
+        default=None,
+        help="convert only these regions (e.g., chr1:1,000-2,000) of the "
+             "sequences (the input FASTA file is indexed)",
+    )
 
-                # Sequence case
-                else:
-                    sequence["value"] = "{}{}".format(sequence["value"], line)
 
-        if len(sequence["id"]) > 0:
-            yield sequence
+def count_sequences(filename, threads=1):
+    """Return the number of sequences (header lines) of a FASTA file"""
+    count = 0
+    last = b"\n"
+    with open_compressed(filename, "rb", threads) as fin:
+        for block in iter(lambda: fin.read(BLOCK_SIZE), b""):
+            count += block.count(b"\n>") + (last == b"\n" and block[:1] == b">")
+            last = block[-1:]
+    return count
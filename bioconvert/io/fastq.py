@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+"""Block-based reader of :term:`FASTQ` files
+
+The records are parsed from large buffers filled with ``readinto`` and
+returned as bytes, without decoding::
+
+    for name, sequence, quality in Fastq("reads.fastq.gz"):
+        print(name, len(sequence))
+
+    # or by batches of records
+    for records in Fastq("reads.fastq.gz").batches(10000):
+        print(len(records))
+
+"""
+from itertools import repeat
+from operator import itemgetter
+
+from bioconvert.core.compression import open_compressed
+
+__all__ = ["Fastq"]
+
+
+#: initial size of the buffer (grown for records that do not fit in it)
+BLOCK_SIZE = 1 << 20
+
+#: default number of records of the batches
+BATCH_SIZE = 10000
+
+# removes the @ of the header lines
+_remove_at = itemgetter(slice(1, None))
+
+
+class Fastq(object):
+    """Read a FASTQ file, possibly compressed (.gz, .bz2, .dsrc)
+
+    The records are (name, sequence, quality) tuples of bytes. The name is
+    the whole header line without the leading @ (i.e., including the
+    comment, if any).
+
+    Records are expected to have 4 lines. If *multiline* is True (the
+    default), records whose sequence and quality are wrapped over several
+    lines are also accepted: the records that are not 4-line records are
+    parsed line by line. Otherwise, they raise a ValueError.
+    """
+    def __init__(self, filename, threads=1, multiline=True,
+                 block_size=BLOCK_SIZE):
+        """.. rubric:: constructor
+
+        :param str filename: the FASTQ file
+        :param int threads: number of threads used to decompress the file
+        :param bool multiline: accept sequences and qualities on several
+            lines
+        :param int block_size: initial size of the buffer
+        """
+        self.filename = filename
+        self.threads = threads
+        self.multiline = multiline
+        self.block_size = block_size
+
+    def __iter__(self):
+        for records in self._read_buffers():
+            yield from records
+
+    def read(self):
+        """Read the FASTQ file record by record (generator of (name,
+        sequence, quality) tuples)"""
+        return iter(self)
+
+    def batches(self, size=BATCH_SIZE):
+        """Read the FASTQ file by batches (generator of lists of *size*
+        records, the last one may be shorter)"""
+        batch = []
+        for records in self._read_buffers():
+            batch.extend(records)
+            while len(batch) >= size:
+                yield batch[:size]
+                batch = batch[size:]
+        if batch:
+            yield batch
+
+    def _read_buffers(self):
+        """Fill a buffer from the file and yield the list of records parsed
+        from each filling. The incomplete record at the end of the buffer is
+        moved at its beginning before the next filling."""
+        buf = bytearray(self.block_size)
+        view = memoryview(buf)
+        filled = 0
+        eof = False
+        with open_compressed(self.filename, "rb", self.threads) as fin:
+            while not eof:
+                if filled == len(buf):
+                    # a record does not fit in the buffer
+                    view.release()
+                    buf.extend(bytes(len(buf)))
+                    view = memoryview(buf)
+                size = fin.readinto(view[filled:])
+                if size:
+                    filled += size
+                else:
+                    eof = True
+                    if not filled:
+                        break
+                    if buf[filled - 1] != 10:  # last line without \n
+                        view.release()
+                        del buf[filled:]
+                        buf.append(10)
+                        view = memoryview(buf)
+                        filled += 1
+
+                data = view[:filled].tobytes()
+                records, pos = self._parse(data)
+                if records:
+                    yield records
+                if eof and data[pos:].strip():
+                    raise ValueError("Truncated FASTQ record at the end of "
+                                     "{}".format(self.filename))
+                buf[:filled - pos] = data[pos:]
+                filled -= pos
+
+    def _parse(self, data):
+        """Return the complete records of *data* and the position of the
+        first byte not parsed
+
+        The lines of *data* are split at once and checked to be 4-line
+        records. Otherwise (e.g., multi-line records, blank lines or Windows
+        line endings), the records are parsed one by one (see
+        :meth:`_parse_records`).
+        """
+        lines = data.split(b"\n")
+        size = (len(lines) - 1) // 4 * 4
+        names = lines[0:size:4]
+        sequences = lines[1:size:4]
+        separators = lines[2:size:4]
+        qualities = lines[3:size:4]
+        if names and not names[0].endswith(b"\r") \
+                and sum(map(bytes.startswith, names, repeat(b"@"))) == len(names) \
+                and sum(map(bytes.startswith, separators, repeat(b"+"))) == len(names) \
+                and list(map(len, sequences)) == list(map(len, qualities)):
+            rest = lines[size:]
+            pos = len(data) - sum(map(len, rest)) - len(rest) + 1
+            return list(zip(map(_remove_at, names), sequences, qualities)), pos
+        return self._parse_records(data)
+
+    def _parse_records(self, data):
+        """Parse *data* record by record (see :meth:`_parse`)"""
+        records = []
+        append = records.append
+        find = data.find
+        end = len(data)
+        pos = 0
+        while pos < end:
+            if data[pos] != 64:  # "@"
+                if data[pos] not in b"\r\n":
+                    raise ValueError("Invalid FASTQ record in {}: {}".format(
+                        self.filename, data[pos:find(b"\n", pos)][:80]))
+                # blank line between records
+                pos += 1
+                continue
+            # the 4 lines of the record
+            i1 = find(b"\n", pos)
+            i2 = find(b"\n", i1 + 1) if i1 != -1 else -1
+            i3 = find(b"\n", i2 + 1) if i2 != -1 else -1
+            i4 = find(b"\n", i3 + 1) if i3 != -1 else -1
+            if i4 == -1:
+                # incomplete record
+                break
+            if data[i2 + 1] == 43 and i4 - i3 == i2 - i1:  # "+"
+                name = data[pos + 1:i1]
+                if name.endswith(b"\r"):
+                    append((name[:-1], data[i1 + 1:i2 - 1], data[i3 + 1:i4 - 1]))
+                else:
+                    append((name, data[i1 + 1:i2], data[i3 + 1:i4]))
+                pos = i4 + 1
+                continue
+
+            if not self.multiline:
+                raise ValueError("Invalid 4-line FASTQ record in {}: "
+                                 "{}".format(self.filename, data[pos:i1]))
+            record, pos_next = self._parse_multiline(data, pos)
+            if record is None:
+                break
+            append(record)
+            pos = pos_next
+        return records, pos
+
+    def _parse_multiline(self, data, pos):
+        """Parse the record at *pos* line by line. Return the record and the
+        position of the next one (None and *pos* if the record is not
+        complete)"""
+        find = data.find
+        end = find(b"\n", pos)
+        if end == -1:
+            return None, pos
+        name = data[pos + 1:end].rstrip(b"\r")
+
+        # sequence lines up to the + line
+        lines = []
+        start = end + 1
+        while True:
+            end = find(b"\n", start)
+            if end == -1:
+                return None, pos
+            if data[start] == 43:  # "+"
+                break
+            lines.append(data[start:end].rstrip(b"\r"))
+            start = end + 1
+        sequence = b"".join(lines)
+
+        # quality lines up to the length of the sequence
+        lines = []
+        length = 0
+        start = end + 1
+        while length < len(sequence):
+            end = find(b"\n", start)
+            if end == -1:
+                return None, pos
+            lines.append(data[start:end].rstrip(b"\r"))
+            length += len(lines[-1])
+            start = end + 1
+        if length != len(sequence):
+            raise ValueError("Sequence and quality of {} in {} have different "
+                             "lengths".format(name.decode(), self.filename))
+        return (name, sequence, b"".join(lines)), start
@@ -25,7 +25,7 @@
 
 """Convert :term:`SAM` file to :term:`BAM` format"""
 from bioconvert import ConvBase
-from bioconvert.core.decorators import requires
+from bioconvert.core.decorators import requires, streamable
 
 import colorlog
 
@@ -49,6 +49,7 @@ class SAM2BAM(ConvBase):
         super(SAM2BAM, self).__init__(infile, outfile, *args, **kargs)
 
     @requires("samtools")
+    @streamable
     def _method_samtools(self, *args, **kwargs):
         """ Do the conversion :term:`SAM` -> :term:`BAM` using samtools"""
         # -S means ignored (input format is auto-detected)
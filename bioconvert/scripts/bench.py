@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+###########################################################################
+# Bioconvert is a project to facilitate the interconversion               #
+# of life science data from one format to another.                        #
+#                                                                         #
+# Authors: see CONTRIBUTORS.rst                                           #
+# Copyright © 2018  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                      #
+#                                                                         #
+# bioconvert is free software: you can redistribute it and/or modify      #
+# it under the terms of the GNU General Public License as published by    #
+# the Free Software Foundation, either version 3 of the License, or       #
+# (at your option) any later version.                                     #
+#                                                                         #
+# bioconvert is distributed in the hope that it will be useful,           #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+# GNU General Public License for more details.                            #
+#                                                                         #
+# You should have received a copy of the GNU General Public License       #
+# along with this program (COPYING file).                                 #
+# If not, see <http://www.gnu.org/licenses/>.                             #
+###########################################################################
+""".. rubric:: Standalone application benchmarking all the converters"""
+import argparse
+import sys
+
+import bioconvert
+from bioconvert.core.benchmark_store import BenchmarkStore
+from bioconvert.core.benchmark_suite import BenchmarkSuite
+
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+
+    arg_parser = argparse.ArgumentParser(prog="bioconvert_bench",
+                                         description="""Benchmark the
+                                         methods of all converters (or a
+                                         selection) on inputs of several
+                                         sizes and report the throughput
+                                         matrix together with the scaling
+                                         exponent of each method (1 for
+                                         linear methods, 2 for quadratic
+                                         ones).""",
+                                         formatter_class=argparse.RawDescriptionHelpFormatter,
+                                         epilog="""
+FASTQ and FASTA inputs are simulated. Inputs of other text formats made of
+records (SAM, BED, VCF, GFF, ...) are made by repeating the records of the
+test files of bioconvert. Other formats are only benchmarked on their test
+file. For instance:
+
+    bioconvert_bench --sizes 1M 100M 1G --converters fastq2fasta sam2bam \\
+        --report bench.md bench.json
+
+""")
+    arg_parser.add_argument("-v", "--verbosity",
+                            default=bioconvert.logger.level,
+                            help="Set the outpout verbosity.",
+                            choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+                            )
+    arg_parser.add_argument("--sizes", nargs="+", default=["1M", "10M", "100M"],
+                            help="Input sizes (default: 1M 10M 100M)")
+    arg_parser.add_argument("--converters", nargs="+", default=None,
+                            help="Converters to benchmark, e.g. fastq2fasta "
+                                 "(default: all)")
+    arg_parser.add_argument("--methods", nargs="+", default=None,
+                            help="Methods to benchmark (default: all)")
+    arg_parser.add_argument("-N", "--replicates", type=int, default=3,
+                            help="Number of trials for each method and size")
+    arg_parser.add_argument("--warmup", type=int, default=0,
+                            help="Number of untimed runs of each method")
+    arg_parser.add_argument("--cache-mode", default="warm",
+                            choices=["warm", "cold"],
+                            help="Page cache state of the trials (see "
+                                 "bioconvert --benchmark-cache-mode)")
+    arg_parser.add_argument("--directory", default=None,
+                            help="Where the inputs are created (default: a "
+                                 "temporary directory removed at the end)")
+    arg_parser.add_argument("--store", default=None,
+                            help="Save the timings in this benchmark store "
+                                 "(see bioconvert benchmark --help)")
+    arg_parser.add_argument("--label", default=None,
+                            help="Name of the run in the store")
+    arg_parser.add_argument("--report", nargs="+", default=[],
+                            help="Save the results in these files (.json, "
+                                 ".csv or .md)")
+
+    args = arg_parser.parse_args(args)
+    bioconvert.logger.level = args.verbosity
+
+    suite = BenchmarkSuite(sizes=args.sizes, converters=args.converters,
+                           methods=args.methods, N=args.replicates,
+                           warmup=args.warmup, cache_mode=args.cache_mode,
+                           directory=args.directory,
+                           store=BenchmarkStore(args.store) if args.store else None,
+                           label=args.label)
+    suite.run()
+    for filename in args.report:
+        suite.write_report(filename)
+    print()
+    print(suite.to_markdown())
+
+
+if __name__ == "__main__":
+    main()
@@ -25,9 +25,12 @@
 """.. rubric:: Standalone application dedicated to conversion"""
 import os
 import argparse
+import concurrent.futures
+import copy
 import glob
 import json
 import sys
+import time
 import colorlog
 import textwrap
 
@@ -35,10 +38,14 @@ import bioconvert
 from bioconvert import ConvBase
 from bioconvert.core import graph
 from bioconvert.core import utils
-from bioconvert.core.base import ConvMeta
+from bioconvert.core.base import ConvMeta, _get_input_size
+from bioconvert.core.benchmark import Benchmark
+from bioconvert.core.benchmark_store import BenchmarkStore, compare
+from bioconvert.core.cache import ConversionCache
 from bioconvert.core.converter import Bioconvert
 from bioconvert.core.decorators import get_known_dependencies_with_availability
-from bioconvert.core.registry import Registry
+from bioconvert.core.registry import get_registry
+from bioconvert.core.utils import get_jobs_and_threads
 
 _log = colorlog.getLogger(__name__)
 
@@ -55,7 +62,7 @@ class ParserHelper():
     """
 
     def __init__(self, args):
-        registry = Registry()
+        registry = get_registry()
         self.args = args[:]
         if len(self.args) == 0:
             error("Please provide at least some arguments. See --help")
@@ -87,14 +94,110 @@ class ParserHelper():
             return positional[1:]
 
 
-def main(args=None):
+def get_sub_parser_name(in_fmt, out_fmt):
+    """Return the sub-command name of a conversion (e.g. fastq2fasta)
+
+    :param tuple in_fmt: the input formats
+    :param tuple out_fmt: the output formats
+    """
+    in_fmt = "_".join(ConvBase.lower_tuple(in_fmt))
+    out_fmt = "_".join(ConvBase.lower_tuple(out_fmt))
+    return "{}2{}".format(in_fmt, out_fmt)
+
+
+def get_sub_command(registry, name, allow_indirect=False):
+    """Return the conversion of the sub-command *name* as a list of one
+    item of :meth:`~bioconvert.core.registry.Registry.iter_converters`
+    (empty if *name* is not a sub-command)"""
+    requested = [item for item in registry.iter_converters()
+                 if get_sub_parser_name(item[0], item[1]) == name]
+    if requested or not allow_indirect:
+        return requested
+    try:
+        in_fmt, out_fmt = ConvMeta.split_converter_to_format(name)
+    except TypeError:
+        return []
+    steps = registry.get_indirect_path(in_fmt, out_fmt)
+    if steps is None or get_sub_parser_name(in_fmt, out_fmt) != name:
+        return []
+    return [(in_fmt, out_fmt, None, steps)]
+
+
+def add_sub_parser(subparsers, in_fmt, out_fmt, converter, path,
+                   max_converter_width):
+    """Add the sub-command of a direct or indirect conversion
+
+    :param subparsers: the object returned by argparse add_subparsers
+    :param tuple in_fmt: the input formats
+    :param tuple out_fmt: the output formats
+    :param converter: the converter class (direct conversion) or None
+    :param list path: the conversion steps (indirect conversion) or None
+    :param int max_converter_width: used to align the help
+    """
+    sub_parser_name = get_sub_parser_name(in_fmt, out_fmt)
+
+    # used in the help
+    in_fmt = "_".join(ConvBase.lower_tuple(in_fmt))
+    out_fmt = "_".join(ConvBase.lower_tuple(out_fmt))
+
+    if converter:
+        link_char = '-'
+        if len(converter.available_methods) < 1:
+            help_details = " (no available methods please see the doc" \
+                           " for install the necessary libraries) "
+        else:
+            help_details = " (%i methods)" % len(converter.available_methods)
+    else :#if path:
+        link_char = '~'
+        if len(path) == 2:
+            help_details = " (w/ 1 intermediate)"
+        else:
+            help_details = " (w/ %i intermediates)" % (len(path) - 1)
+
+    help_text = '{}to{}> {}{}'.format(
+        (in_fmt + ' ').ljust(max_converter_width, link_char),
+        link_char,
+        out_fmt,
+        help_details,
+    )
+    sub_parser = subparsers.add_parser(
+        sub_parser_name,
+        help=help_text,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        # aliases=["{}_to_{}".format(in_fmt.lower(), out_fmt.lower()), ],
+        epilog="""Bioconvert is an open source collaborative project. 
+Please feel free to join us at https://github/biokit/bioconvert
+""",
+    )
+    if converter:
+        converter.add_argument_to_parser(sub_parser=sub_parser)
+    elif path:
+        for a in ConvBase.get_IO_arguments():
+            a.add_to_sub_parser(sub_parser)
+        for a in ConvBase.get_common_arguments():
+            a.add_to_sub_parser(sub_parser)
 
-    # used later on
-    registry = Registry()
+
+def main(args=None):
 
     if args is None:
         args = sys.argv[1:]
 
+    # sub commands that do not need the registry
+    if args and args[0] == "--client":
+        return client_main(args[1:])
+    if args and args[0] == "serve":
+        return serve_main(args[1:])
+    if args and args[0] == "cache":
+        return cache_main(args[1:])
+    if args and args[0] == "benchmark":
+        return benchmark_main(args[1:])
+    if args and args[0] == "autotune":
+        return autotune_main(args[1:])
+
+    # used later on
+    registry = get_registry()
+
     # convenient variable to check implicit/explicit mode and
     # get information about the arguments.
     ph = ParserHelper(args)
@@ -152,22 +255,15 @@ def main(args=None):
                 msg = '\nBioconvert does not support conversion {} -> {}. \n\n'
                 msg = msg.format(in_ext, out_ext)
 
-                # maybe it is an indirect conversion ? let us look at the
-                # digraph
-                try:
-                    _path = registry._path_dict_ext[in_ext][out_ext]
-                    #Here, we have a transitive list of tuples to go from A to C
-                    # example from fq to clustal returns:
-                    # [('fq',), ('fa',), ('clustal',)]
-                    # If we naively build the converter from those names
-                    # (fq2clustal), this is a non official converter name. The
-                    # official one is fastq2clustal, so we need some hack here:
-                    in_name, int_name, out_name  = _path
-                    a = registry._ext_registry[in_name, int_name][0].__name__.split("2")[0]
-                    b = registry._ext_registry[int_name, out_name][0].__name__.split("2")[1]
-
-                    convname = "2".join([a, b]).lower()
-
+                # maybe it is an indirect conversion ? The cheapest path
+                # between the formats of the extensions is searched
+                convname = None
+                for in_fmt in registry.get_formats_from_ext(in_ext):
+                    for out_fmt in registry.get_formats_from_ext(out_ext):
+                        if convname is None and \
+                                registry.conversion_path(in_fmt, out_fmt):
+                            convname = get_sub_parser_name(in_fmt, out_fmt)
+                if convname is not None:
                     msg += "\n".join(textwrap.wrap(
                         "Note, however, that an indirect conversion through"
                         " an intermediate format is possible for your input and "
@@ -179,8 +275,6 @@ def main(args=None):
                     msg += "For help and with your input/output most probably"
                     msg += "the command should be: \n\n    bioconvert {} {} -a\n\n ".format(
                             convname, " ".join(ph.get_filelist()))
-                except KeyError:
-                    pass # not converter found in the path 
                 error(msg)
 
             # if the ext_pair matches a single converter
@@ -260,6 +354,26 @@ shows all possible indirect conversions:
 
     bioconvert --help -a
 
+Outputs of previous conversions can be reused with --cache. The cache is
+managed with:
+
+    bioconvert cache --help
+
+The timings of --benchmark are saved and can be compared between runs
+(e.g., after the upgrade of a tool) with:
+
+    bioconvert benchmark compare --baseline <label>
+
+The default method of the converters can be replaced by the fastest
+method on this machine (see bioconvert autotune --help):
+
+    bioconvert autotune --converters fastq2fasta --sizes 1M 100M
+
+Many small conversions can be sent to a resident server (see bioconvert
+serve --help) with:
+
+    bioconvert --client test.fastq test.fasta
+
 Please visit http://bioconvert.readthedocs.org for more information about the
 project or formats available. Would you wish to help, please join our open 
 source collaborative project at https://github/bioconvert/bioconvert
@@ -276,53 +390,23 @@ source collaborative project at https://github/bioconvert/bioconvert
         if type(item) is str:
             return item[0]
 
-    # show all possible conversion including indirect conversion
-    for in_fmt, out_fmt, converter, path in \
-            sorted(registry.iter_converters(allow_indirect_conversion), key=sorting_tuple_string):
-        in_fmt= ConvBase.lower_tuple(in_fmt)
-        in_fmt = ["_".join(in_fmt)]
-
-        out_fmt=ConvBase.lower_tuple(out_fmt)
-        out_fmt = ["_".join(out_fmt)]
+    # Lazy mode: if the sub-command is already known, only its sub-parser is
+    # built so that only the module of the requested converter is imported
+    # (and the paths of the other indirect conversions are not searched).
+    # The full list of sub-parsers is built otherwise (e.g. for --help or
+    # when the sub-command is unknown).
+    all_converters = []
+    if args and not args[0].startswith("-"):
+        all_converters = get_sub_command(registry, args[0],
+                                         allow_indirect_conversion)
+    if not all_converters:
+        all_converters = sorted(registry.iter_converters(allow_indirect_conversion),
+                                key=sorting_tuple_string)
 
-        sub_parser_name = "{}2{}".format("_".join(in_fmt), "_".join(out_fmt))
-
-        if converter:
-            link_char = '-'
-            if len(converter.available_methods) < 1:
-                help_details = " (no available methods please see the doc" \
-                               " for install the necessary libraries) "
-            else:
-                help_details = " (%i methods)" % len(converter.available_methods)
-        else :#if path:
-            link_char = '~'
-            if len(path) == 3:
-                help_details = " (w/ 1 intermediate)"
-            else:
-                help_details = " (w/ %i intermediates)" % (len(path) - 2)
-
-        help_text = '{}to{}> {}{}'.format(
-            ("_".join(in_fmt) + ' ').ljust(max_converter_width, link_char),
-            link_char,
-            ("_".join(out_fmt)),
-            help_details,
-        )
-        sub_parser = subparsers.add_parser(
-            sub_parser_name,
-            help=help_text,
-            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-            # aliases=["{}_to_{}".format(in_fmt.lower(), out_fmt.lower()), ],
-            epilog="""Bioconvert is an open source collaborative project. 
-Please feel free to join us at https://github/biokit/bioconvert
-""",
-        )
-        if converter:
-            converter.add_argument_to_parser(sub_parser=sub_parser)
-        elif path:
-            for a in ConvBase.get_IO_arguments():
-                a.add_to_sub_parser(sub_parser)
-            for a in ConvBase.get_common_arguments():
-                a.add_to_sub_parser(sub_parser)
+    # show all possible conversion including indirect conversion
+    for in_fmt, out_fmt, converter, path in all_converters:
+        add_sub_parser(subparsers, in_fmt, out_fmt, converter, path,
+                       max_converter_width)
 
 
     # arguments when no explicit conversion provided.
@@ -391,11 +475,7 @@ Please feel free to join us at https://github/biokit/bioconvert
 
         conversions = []
         for in_fmt, out_fmt, converter, path in registry.iter_converters(allow_indirect_conversion):
-            in_fmt = ConvBase.lower_tuple(in_fmt)
-            in_fmt = ["_".join(in_fmt)]
-            out_fmt = ConvBase.lower_tuple(out_fmt)
-            out_fmt = ["_".join(out_fmt)]
-            conversion_name = "{}2{}".format("_".join(in_fmt), "_".join(out_fmt))
+            conversion_name = get_sub_parser_name(in_fmt, out_fmt)
             conversions.append((lev(conversion_name, sub_command), conversion_name))
 
         conversions = [x for x in conversions if x[0]<=3]
@@ -443,14 +523,15 @@ Please feel free to join us at https://github/biokit/bioconvert
         msg += "You can list all converters by using:\n\n\tbioconvert --help"
         arg_parser.error(msg)
 
-    if getattr(args, "show_methods", False) is False and args.input_file is None:
+    if getattr(args, "show_methods", False) is False and \
+            getattr(args, "explain", False) is False and args.input_file is None:
         arg_parser.error('Either specify an input_file (<INPUT_FILE>) or '
                          'ask for available methods (--show-methods)')
 
     # do we want to know the available methods ? If so, print info and quit
     if getattr(args, "show_methods", False) is True:
         in_fmt, out_fmt = ConvMeta.split_converter_to_format(args.converter)
-        class_converter = Registry()[(in_fmt, out_fmt)]
+        class_converter = registry[(in_fmt, out_fmt)]
         print("\nMethods available for this converter ({}) are: {}".format(
             args.converter, class_converter.available_methods))
         print("\nPlease see http://bioconvert.readthedocs.io/en/master/"
@@ -469,22 +550,30 @@ Please feel free to join us at https://github/biokit/bioconvert
                          'you have to accept that we chain converter to do'
                          ' so (--allow-indirect-conversion or -a)'.format(args.converter))
 
+    # print the conversion path and its estimated time, then quit
+    if getattr(args, "explain", False) is True:
+        in_fmt, out_fmt = ConvMeta.split_converter_to_format(args.converter)
+        size = _get_input_size(args.input_file) if args.input_file else None
+        print(format_explanation(registry.explain_path(in_fmt, out_fmt, size), size))
+        if args.raise_exception:
+            return
+        sys.exit(0)
+
     args.raise_exception = args.raise_exception or args.verbosity == "DEBUG"
 
     # Set the logging level
     bioconvert.logger.level = args.verbosity
     # Figure out whether we have several input files or not
     if "*" in args.input_file or "?" in args.input_file: 
-        filenames = glob.glob(args.input_file)
+        filenames = sorted(glob.glob(args.input_file))
     else:
         filenames = [args.input_file]
 
 
-    N = len(filenames)
-    for i, filename in enumerate(filenames):
-        if N > 1:
-            _log.info("Converting {} ({}/{})".format(filename, i+1, N))
-        args.input_file = filename
+    if len(filenames) == 0:
+        error("No input file matches {}".format(args.input_file))
+    elif len(filenames) == 1:
+        args.input_file = filenames[0]
         try:
             analysis(args)
         except Exception as e:
@@ -493,6 +582,320 @@ Please feel free to join us at https://github/biokit/bioconvert
             else:
                 bioconvert.logger.error(e)
             sys.exit(1)
+        return
+
+    results = run_batch(args, filenames)
+    print(format_batch_summary(results))
+    failures = [x for x in results if x["error"] is not None]
+    if failures:
+        for result in failures:
+            bioconvert.logger.error("{}: {}".format(result["filename"],
+                                                    result["error"]))
+        bioconvert.logger.error("{}/{} conversions failed".format(
+            len(failures), len(results)))
+        if args.raise_exception:
+            raise RuntimeError(failures[0]["error"])
+        sys.exit(1)
+
+
+def _convert_file(args, filename):
+    """Convert one file of the --batch mode (run in a worker process)"""
+    args = copy.copy(args)
+    args.input_file = filename
+    t1 = time.time()
+    error = None
+    try:
+        analysis(args)
+    except (Exception, SystemExit) as err:
+        # analysis() exits on some errors
+        error = str(err) or err.__class__.__name__
+    return {
+        "filename": filename,
+        "size": os.path.getsize(filename) if os.path.isfile(filename) else 0,
+        "time": time.time() - t1,
+        "error": error,
+    }
+
+
+def run_batch(args, filenames):
+    """Convert *filenames* with a pool of --jobs worker processes
+
+    Failures do not stop the other conversions. They are reported in the
+    returned list of results (one dictionary per file with the keys
+    filename, size, time and error).
+    """
+    # --threads is shared with --jobs only if it was not set by the user
+    threads = getattr(args, "threads", None)
+    jobs, threads = get_jobs_and_threads(args.jobs, threads or 1,
+                                         threads_set=threads is not None,
+                                         max_jobs=len(filenames))
+    args.threads = threads
+    _log.info("Converting {} files with {} jobs of {} threads".format(
+        len(filenames), jobs, threads))
+
+    results = []
+    if jobs == 1:
+        for i, filename in enumerate(filenames):
+            _log.info("Converting {} ({}/{})".format(filename, i + 1, len(filenames)))
+            results.append(_convert_file(args, filename))
+        return results
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_convert_file, args, filename)
+                   for filename in filenames]
+        for i, future in enumerate(concurrent.futures.as_completed(futures)):
+            result = future.result()
+            _log.info("Converted {} ({}/{})".format(result["filename"], i + 1,
+                                                    len(filenames)))
+            results.append(result)
+    # keep the order of the input files
+    order = {filename: i for i, filename in enumerate(filenames)}
+    return sorted(results, key=lambda x: order[x["filename"]])
+
+
+def format_batch_summary(results):
+    """Return a table with the time and throughput of each conversion"""
+    width = max([len("file")] + [len(x["filename"]) for x in results])
+    lines = ["{:<{}}  {:>6}  {:>10}  {:>9}  {:>8}".format(
+        "file", width, "status", "size (MB)", "time (s)", "MB/s")]
+    total_size = total_time = 0
+    for result in results:
+        size = result["size"] / 1e6
+        total_size += size
+        total_time += result["time"]
+        lines.append("{:<{}}  {:>6}  {:>10.2f}  {:>9.2f}  {:>8.2f}".format(
+            result["filename"], width,
+            "ok" if result["error"] is None else "FAILED", size,
+            result["time"], size / result["time"] if result["time"] else 0))
+    lines.append("{:<{}}  {:>6}  {:>10.2f}  {:>9.2f}".format(
+        "total (cumulated)", width, "", total_size, total_time))
+    return "\n".join(lines)
+
+
+def format_explanation(steps, size=None):
+    """Return the conversion path returned by
+    :meth:`~bioconvert.core.registry.Registry.explain_path` as a table
+
+    :param list steps: the steps of the conversion
+    :param int size: the size of the input in bytes (None for 1MB)
+    """
+    if not steps:
+        return "No conversion path available"
+    path = [steps[0]["input_fmt"]] + [x["output_fmt"] for x in steps]
+    lines = ["path: {}".format(" -> ".join("_".join(x) for x in path))]
+    width = max(len(x["converter"]) for x in steps)
+    lines.append("{:>4}  {:<{}}  {:<15}  {:>8}  {:>8}  {}".format(
+        "step", "converter", width, "method", "MB/s", "time (s)", "source"))
+    for i, step in enumerate(steps, start=1):
+        lines.append("{:>4}  {:<{}}  {:<15}  {:>8.2f}  {:>8.3f}  {}".format(
+            i, step["converter"], width, step["method"], step["throughput"],
+            step["time"], "benchmark" if step["measured"] else "default"))
+    lines.append("estimated time for {:.2f} MB: {:.3f}s".format(
+        (1e6 if size is None else size) / 1e6, sum(x["time"] for x in steps)))
+    return "\n".join(lines)
+
+
+def serve_main(args):
+    """The bioconvert serve sub command: start a conversion server"""
+    from bioconvert.core.server import ConversionServer, get_socket_filename
+    arg_parser = argparse.ArgumentParser(prog="bioconvert serve",
+        description="Start a server running conversions requested by "
+                    "'bioconvert --client ...' commands. The registry and "
+                    "the converters are loaded once so that the conversion "
+                    "of small files is not slowed down by the start of "
+                    "bioconvert.")
+    arg_parser.add_argument("--socket", default=get_socket_filename(),
+                            help="the Unix socket of the server (default: "
+                                 "%(default)s, or the BIOCONVERT_SOCKET "
+                                 "environment variable)")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None,
+                            help="number of conversions run concurrently "
+                                 "(default: number of cores)")
+    args = arg_parser.parse_args(args)
+
+    server = ConversionServer(args.socket, max_workers=args.workers)
+    _log.info("Listening on {}".format(args.socket))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def client_main(args):
+    """Forward a bioconvert command to the server started with
+    'bioconvert serve' (the command is run locally if there is no server)"""
+    from bioconvert.core.server import ConversionClient
+    with ConversionClient() as client:
+        if not client.is_alive():
+            _log.warning("No bioconvert server on {}. Running the command "
+                         "locally".format(client.socket_filename))
+            return main(args)
+        reply = client.run(args)
+    sys.stdout.write(reply.get("stdout", ""))
+    if reply.get("returncode"):
+        if reply.get("error"):
+            _log.error(reply["error"])
+        sys.exit(reply["returncode"])
+
+
+def cache_main(args):
+    """The bioconvert cache sub command: inspect and prune the cache"""
+    arg_parser = argparse.ArgumentParser(prog="bioconvert cache",
+        description="Inspect and prune the cache of conversions (enabled "
+                    "with the --cache option). The cache directory and "
+                    "maximum size can be set with the BIOCONVERT_CACHE_DIR "
+                    "and BIOCONVERT_CACHE_SIZE environment variables.")
+    arg_parser.add_argument("action", nargs="?", default="list",
+                            choices=["list", "prune", "clear"],
+                            help="list the entries (default), remove the "
+                                 "least recently used entries or all entries")
+    arg_parser.add_argument("--max-size", default=None,
+                            help="size of the cache after pruning (e.g., 500M "
+                                 "or 10G). Defaults to the maximum size of "
+                                 "the cache")
+    args = arg_parser.parse_args(args)
+
+    cache = ConversionCache.from_environment()
+    if args.action == "list":
+        entries = cache.entries()
+        for entry in entries:
+            print("{}  {:>10.2f} MB  {}  {} ({})  {}".format(
+                entry["key"][:12], entry["size"] / 1e6,
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"])),
+                entry.get("converter"), entry.get("method"), entry.get("inputs")))
+        print("{} entries, {:.2f} MB in {} (maximum {:.2f} MB)".format(
+            len(entries), sum(x["size"] for x in entries) / 1e6,
+            cache.directory, cache.max_size / 1e6))
+    elif args.action == "prune":
+        removed = cache.prune(args.max_size)
+        print("{} entries removed ({:.2f} MB)".format(
+            len(removed), sum(x["size"] for x in removed) / 1e6))
+    else:
+        removed = cache.clear()
+        print("{} entries removed".format(len(removed)))
+
+
+def benchmark_main(args):
+    """The bioconvert benchmark sub command: list and compare the runs of
+    --benchmark"""
+    arg_parser = argparse.ArgumentParser(prog="bioconvert benchmark",
+        description="List and compare the benchmark results saved by the "
+                    "--benchmark option. The store can be set with the "
+                    "BIOCONVERT_BENCHMARK_STORE environment variable.")
+    arg_parser.add_argument("action", nargs="?", default="list",
+                            choices=["list", "compare"],
+                            help="list the runs (default) or compare the "
+                                 "current run to the baseline")
+    arg_parser.add_argument("--store", default=None,
+                            help="the file of benchmark results")
+    arg_parser.add_argument("--baseline", default=None,
+                            help="run identifier or label of the baseline "
+                                 "(default: the previous run of each method)")
+    arg_parser.add_argument("--current", default=None,
+                            help="run identifier or label of the run to "
+                                 "check (default: the latest run of each "
+                                 "method)")
+    arg_parser.add_argument("--converter", default=None,
+                            help="compare only this converter (e.g., fastq2fasta)")
+    arg_parser.add_argument("--method", default=None,
+                            help="compare only this method")
+    arg_parser.add_argument("--threshold", default=0.1, type=float,
+                            help="minimum slowdown reported as a regression "
+                                 "(default: 0.1 for 10%%)")
+    arg_parser.add_argument("--alpha", default=0.05, type=float,
+                            help="significance level of the Mann-Whitney U "
+                                 "test (default: 0.05)")
+    args = arg_parser.parse_args(args)
+
+    store = BenchmarkStore(args.store)
+    if args.action == "list":
+        runs = store.runs()
+        for run, label, start, count in runs:
+            print("{}  {}  {:>4} methods  {}".format(
+                run, time.strftime("%Y-%m-%d %H:%M", time.localtime(start)),
+                count, label or ""))
+        print("{} runs in {}".format(len(runs), store.filename))
+        return
+
+    rows = compare(store.records(args.converter, args.method),
+                   baseline=args.baseline, current=args.current,
+                   threshold=args.threshold, alpha=args.alpha)
+    if not rows:
+        print("Nothing to compare in {}".format(store.filename))
+        return
+    for row in rows:
+        print("{:<25} {:<20} {:>9.3f}s {:>9.3f}s {:>+7.1%}  p={:.3f}  {}".format(
+            row["converter"], row["method"], row["baseline"], row["current"],
+            row["ratio"] - 1, row["pvalue"],
+            "REGRESSION" if row["regression"] else "ok"))
+        for tool, (before, after) in sorted(row["tools"].items()):
+            print("    {}: {} -> {}".format(tool, before, after))
+    regressions = [x for x in rows if x["regression"]]
+    if regressions:
+        _log.error("{}/{} methods are significantly slower than the "
+                   "baseline".format(len(regressions), len(rows)))
+        sys.exit(1)
+
+
+def autotune_main(args):
+    """The bioconvert autotune sub command: choose the default methods of
+    the converters by benchmarking them on this machine"""
+    from bioconvert.core import autotune
+
+    arg_parser = argparse.ArgumentParser(prog="bioconvert autotune",
+        description="Benchmark the methods of the converters on this "
+                    "machine and use the fastest one as default method. "
+                    "The ranking of the methods is stored in the user "
+                    "config directory for each kind of node (CPU model and "
+                    "number of CPUs), one ranking per input size.")
+    arg_parser.add_argument("--converters", nargs="+", default=None,
+                            help="converters to tune, e.g. fastq2fasta "
+                                 "(default: all)")
+    arg_parser.add_argument("--sizes", nargs="+", default=["10M"],
+                            help="input sizes (e.g., 1M 100M). The default "
+                                 "method is chosen for each size bucket "
+                                 "(default: 10M)")
+    arg_parser.add_argument("--methods", nargs="+", default=None,
+                            help="methods to benchmark (default: all)")
+    arg_parser.add_argument("-N", "--replicates", type=int, default=3,
+                            help="number of trials of each method")
+    arg_parser.add_argument("--cache-mode", default="warm",
+                            choices=["warm", "cold"],
+                            help="page cache state of the trials")
+    arg_parser.add_argument("--show", action="store_true",
+                            help="show the tuned methods of this node")
+    arg_parser.add_argument("--reset", action="store_true",
+                            help="remove the tuned methods (of --converters "
+                                 "or all) and use the defaults of bioconvert")
+    args = arg_parser.parse_args(args)
+
+    if args.reset:
+        autotune.reset(args.converters)
+        return
+
+    if not args.show:
+        autotune.autotune(converters=args.converters, sizes=args.sizes,
+                          N=args.replicates, methods=args.methods,
+                          cache_mode=args.cache_mode)
+
+    key, node = autotune.get_node_type()
+    tuned = autotune.load_profile().get("nodes", {}).get(key, {}).get(
+        "converters", {})
+    print("Tuned methods of {} ({} CPUs) in {}".format(
+        node["cpu"], node["cpu_count"], autotune.get_profile_filename()))
+    for converter in sorted(tuned):
+        if args.converters and converter.lower() not in [
+                x.lower() for x in args.converters]:
+            continue
+        for bucket in tuned[converter]["buckets"]:
+            size = "any size" if bucket["max_size"] is None \
+                else "up to {:.3g} MB".format(bucket["max_size"] / 1e6)
+            cores = tuned[converter].get("cores")
+            if cores is not None:
+                size += ", tuned with {} cores".format(cores)
+            print("{:<25} {:<20} ({})".format(converter, bucket["ranking"][0], size))
 
 
 def analysis(args):
@@ -544,6 +947,10 @@ def analysis(args):
     if "extra_arguments" in args:
         extra_arguments = args.extra_arguments
 
+    cache = None
+    if getattr(args, "cache", None):
+        cache = ConversionCache.from_environment(args.cache)
+
     # Call a generic wrapper of all available conversion
     conv = Bioconvert(
         infile,
@@ -552,12 +959,38 @@ def analysis(args):
         #out_fmt=out_fmt,
         force=args.force,
         threads=threads,
-        extra=extra_arguments
+        extra=extra_arguments,
+        cache=cache,
     )
 
     if args.benchmark:
+        store = None
+        if (args.benchmark_store or "").lower() != "none":
+            store = BenchmarkStore(args.benchmark_store)
+
+        if args.benchmark_report:
+            # headless mode: matplotlib is not imported
+            to_include = args.benchmark_methods
+            if to_include == "all":
+                to_include = []
+            bench = Benchmark(conv.converter, N=args.benchmark_N,
+                              to_include=to_include, store=store,
+                              label=args.benchmark_label,
+                              warmup=args.benchmark_warmup,
+                              cache_mode=args.benchmark_cache_mode)
+            bench.run_methods()
+            for filename in args.benchmark_report:
+                bench.write_report(filename)
+            print()
+            print(bench.to_markdown())
+            return
+
         conv.boxplot_benchmark(N=args.benchmark_N,
-            to_include=args.benchmark_methods)
+            to_include=args.benchmark_methods, store=store,
+            label=args.benchmark_label, warmup=args.benchmark_warmup,
+            cache_mode=args.benchmark_cache_mode)
+        if store is not None:
+            bioconvert.logger.info("Benchmark saved in {}".format(store.filename))
 
         print(args.benchmark_methods)
         import pylab
@@ -568,7 +1001,7 @@ def analysis(args):
         except:
             outpng = "benchmark_{}.png".format(conv.converter.name)
             pylab.savefig(outpng, dpi=200)
-        bioconvert.logger.info("File {} created")
+        bioconvert.logger.info("File {} created".format(outpng))
     else:
         # params["method"] = args.method
         conv(**vars(args))
@@ -67,8 +67,8 @@ join us at https://github/biokit/bioconvert
     args = arg_parser.parse_args(args)
 
 
-    from bioconvert.core.registry import Registry
-    r = Registry()
+    from bioconvert.core.registry import get_registry
+    r = get_registry()
     info = r.get_info()
 
     # The available unique converters
@@ -66,7 +66,11 @@ setup(
     zip_safe=False,
     packages=find_packages(),
     install_requires=requirements,
-    extras_require={'dev': open("requirements_dev.txt").read().split()},
+    extras_require={
+        'dev': open("requirements_dev.txt").read().split(),
+        # faster (multi-threaded) gzip backends of bioconvert.core.compression
+        'compression': open("requirements_compression.txt").read().split(),
+    },
 
     # This is recursive include of data files
     exclude_package_data={"": ["__pycache__"]},
@@ -83,7 +87,8 @@ setup(
            #'proto_sub_cmd=bioconvert.scripts.proto_sub_cmd:main',
            'bioconvert_init=bioconvert.scripts.init_convert:main',
            'bioconvert_stats=bioconvert.scripts.stats:main',
-           'bioconvert_sniffer=bioconvert.scripts.sniffer:main'
+           'bioconvert_sniffer=bioconvert.scripts.sniffer:main',
+           'bioconvert_bench=bioconvert.scripts.bench:main'
         ]
     }
     )
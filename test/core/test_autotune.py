@@ -0,0 +1,64 @@
+import pytest
+
+from bioconvert import bioconvert_data
+from bioconvert.core import autotune
+
+
+@pytest.fixture
+def profile(tmpdir, monkeypatch):
+    filename = str(tmpdir.join("autotune.json"))
+    monkeypatch.setenv("BIOCONVERT_AUTOTUNE_PROFILE", filename)
+    return filename
+
+
+def test_get_buckets():
+    assert autotune.get_buckets([100, 10000]) == [1000, None]
+    assert autotune.get_buckets([10]) == [None]
+
+
+def test_tuned_default_method(profile, tmpdir):
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    conv = FASTQ2FASTA(infile, str(tmpdir.join("test.fasta")))
+    default = conv.default
+    assert autotune.get_tuned_method("FASTQ2FASTA", conv.available_methods) is None
+
+    key, node = autotune.get_node_type()
+    autotune.save_profile({"nodes": {key: {"node": node, "converters": {
+        "FASTQ2FASTA": {"buckets": [
+            {"max_size": 1000, "ranking": ["not_installed", "awk"]},
+            {"max_size": None, "ranking": ["biopython"]}]}}}}})
+    # small input (the first method is not available)
+    assert conv.default == "awk"
+    assert autotune.get_tuned_method("FASTQ2FASTA", conv.available_methods,
+                                     size=10 ** 6) == "biopython"
+    # without input, the bucket of the largest inputs
+    assert FASTQ2FASTA._get_default_method(FASTQ2FASTA) == "biopython"
+
+    autotune.reset(["fastq2fasta"])
+    assert conv.default == default
+
+
+def test_autotune(profile):
+    tuned = autotune.autotune(converters=["fastq2fasta"], sizes=["10K", "100K"],
+                              N=1, methods=["awk", "python_internal"])
+    buckets = tuned["FASTQ2FASTA"]["buckets"]
+    assert [x["max_size"] for x in buckets] == [32381, None]
+    assert sorted(buckets[0]["ranking"]) == ["awk", "python_internal"]
+    assert autotune.get_tuned_method("FASTQ2FASTA", ["awk", "python_internal"],
+                                     size=1) == buckets[0]["ranking"][0]
+
+
+def test_autotune_allocated_cores(profile, monkeypatch):
+    monkeypatch.setenv("BIOCONVERT_CORES", "1")
+    tuned = autotune.autotune(converters=["fastq2fasta"], sizes=["10K"],
+                              N=1, methods=["awk"])
+    assert tuned["FASTQ2FASTA"]["cores"] == 1
+    key, node = autotune.get_node_type()
+    assert "cores" not in node
+
+    # a job with more cores runs on the same kind of node
+    monkeypatch.setenv("BIOCONVERT_CORES", "3")
+    assert autotune.get_node_type()[0] == key
+    assert autotune.get_tuned_method("FASTQ2FASTA", ["awk"]) == "awk"
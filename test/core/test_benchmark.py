@@ -44,3 +44,118 @@ def test_benchmark():
         bench.include_dummy = True
         bench.run_methods()
         bench.plot()
+
+
+def test_benchmark_report(tmpdir):
+    import csv
+    import json
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    input_file = bioconvert_data("test_fastq2fasta_v1.fastq")
+    conv = FASTQ2FASTA(input_file, str(tmpdir.join("test.fasta")))
+    bench = Benchmark(conv, N=3, warmup=1, to_include=["biopython", "readfq"])
+    summary = bench.summary()
+    assert summary["records"] == 2
+    assert summary["input_size"] == os.path.getsize(input_file)
+    # the fastest method (median time) first
+    assert sorted(x["method"] for x in summary["methods"]) == ["biopython", "readfq"]
+    medians = [x["median"] for x in summary["methods"]]
+    assert medians == sorted(medians)
+    stats = summary["methods"][0]
+    assert stats["N"] == 3
+    assert stats["ci_low"] <= stats["median"] <= stats["ci_high"]
+    assert stats["q1"] <= stats["median"] <= stats["q3"]
+    assert stats["records_per_second"] == pytest.approx(2 / stats["median"])
+
+    for ext in (".json", ".csv", ".md"):
+        bench.write_report(str(tmpdir.join("report" + ext)))
+    with open(str(tmpdir.join("report.json"))) as fin:
+        assert len(json.load(fin)["methods"]) == 2
+    with open(str(tmpdir.join("report.csv"))) as fin:
+        rows = list(csv.DictReader(fin))
+    assert {x["method"] for x in rows} == {"biopython", "readfq"}
+    with pytest.raises(ValueError):
+        bench.write_report(str(tmpdir.join("report.png")))
+
+
+def test_count_records():
+    from bioconvert.core.benchmark import count_records
+    assert count_records(bioconvert_data("test_fastq2fasta_v1.fastq")) == 2
+    assert count_records(bioconvert_data("test_fastq2fasta_v1.fastq.gz")) == 2
+    assert count_records(bioconvert_data("test_fastq2fasta_v1.fasta")) == 2
+    assert count_records(bioconvert_data("test_measles.sorted.bam")) is None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_run_isolated():
+    from bioconvert.core.benchmark import run_isolated
+    from bioconvert.core.shell import shell
+
+    duration, usage = run_isolated(lambda: shell("dd if=/dev/zero of=/dev/null bs=1M count=50 2>/dev/null"))
+    assert duration > 0
+    assert usage["max_rss"] > 0
+    assert usage["cpu_time"] == usage["user_time"] + usage["system_time"]
+    if os.path.exists("/proc/self/io"):
+        # the I/O of the grandchild is included
+        assert usage["read_chars"] >= 50 * 2 ** 20
+
+    with pytest.raises(RuntimeError, match="ValueError: test"):
+        def fail():
+            raise ValueError("test")
+        run_isolated(fail)
+
+
+def test_benchmark_usages(tmpdir):
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    conv = FASTQ2FASTA(bioconvert_data("test_fastq2fasta_v1.fastq"),
+                       str(tmpdir.join("test.fasta")))
+    bench = Benchmark(conv, N=2, to_include=["awk"])
+    if not bench.isolate:
+        pytest.skip("requires fork")
+    stats = bench.summary()["methods"][0]
+    assert len(bench.usages["awk"]) == 2
+    assert stats["max_rss"] > 0
+    assert stats["cpu_time"] > 0
+    assert "peak RSS" in bench.to_markdown()
+
+
+def test_benchmark_cold_cache(tmpdir):
+    from bioconvert.core.benchmark import evict_from_page_cache
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    input_file = bioconvert_data("test_fastq2fasta_v1.fastq")
+    if hasattr(os, "posix_fadvise"):
+        assert evict_from_page_cache([input_file, str(tmpdir.join("missing"))]) == 1
+
+    conv = FASTQ2FASTA(input_file, str(tmpdir.join("test.fasta")))
+    with pytest.raises(ValueError):
+        Benchmark(conv, cache_mode="hot")
+    bench = Benchmark(conv, N=3, cache_mode="cold", seed=1, isolate=False,
+                      to_include=["awk", "readfq"])
+    assert bench.shuffle
+    schedule = bench._get_schedule(["awk", "readfq"])
+    # each round runs all methods once
+    assert sorted(schedule) == [(m, i) for m in ["awk", "readfq"] for i in range(3)]
+    assert [i for _, i in schedule] == [0, 0, 1, 1, 2, 2]
+    assert schedule == bench._get_schedule(["awk", "readfq"])
+
+    bench.run_methods()
+    assert {k: len(v) for k, v in bench.results.items()} == {"awk": 3, "readfq": 3}
+    assert bench.summary()["cache_mode"] == "cold"
+
+
+def test_benchmark_cache_disabled(tmpdir, monkeypatch):
+    from bioconvert.core.cache import ConversionCache
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    monkeypatch.setenv("BIOCONVERT_CACHE", "content")
+    monkeypatch.setenv("BIOCONVERT_CACHE_DIR", str(tmpdir.join("cache")))
+    conv = FASTQ2FASTA(bioconvert_data("test_fastq2fasta_v1.fastq"),
+                       str(tmpdir.join("test.fasta")))
+    bench = Benchmark(conv, N=2, warmup=1, isolate=False, to_include=["awk"])
+    bench.run_methods()
+    assert len(bench.results["awk"]) == 2
+    # the replicates ran the conversion instead of fetching it from the cache
+    assert ConversionCache(str(tmpdir.join("cache"))).entries() == []
+    assert conv.cache is None
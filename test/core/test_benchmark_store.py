@@ -0,0 +1,82 @@
+import pytest
+
+from bioconvert import bioconvert_data
+from bioconvert.core.benchmark import Benchmark
+from bioconvert.core.benchmark_store import (BenchmarkStore, compare,
+                                             get_host_fingerprint,
+                                             mann_whitney_u)
+from bioconvert.fastq2fasta import FASTQ2FASTA
+
+
+def test_mann_whitney_u():
+    # exact p-value: 1 ranking out of C(10, 5) = 252
+    u, pvalue = mann_whitney_u([6, 7, 8, 9, 10], [1, 2, 3, 4, 5])
+    assert u == 25
+    assert pvalue == pytest.approx(1 / 252)
+    _, pvalue = mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+    assert pvalue == 1
+    # normal approximation with ties
+    _, pvalue = mann_whitney_u([2, 2, 3, 3, 3], [1, 1, 2, 2, 2])
+    assert 0 < pvalue < 0.1
+
+
+def test_benchmark_store(tmpdir):
+    store = BenchmarkStore(str(tmpdir.join("benchmarks.jsonl")))
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    converter = FASTQ2FASTA(infile, str(tmpdir.join("test.fasta")))
+    bench = Benchmark(converter, N=2, to_include=["biopython", "python_internal"],
+                      store=store, label="baseline")
+    bench.run_methods()
+
+    records = store.records()
+    assert sorted(x["method"] for x in records) == ["biopython", "python_internal"]
+    record = records[0]
+    assert record["converter"] == "FASTQ2FASTA"
+    assert record["label"] == "baseline"
+    assert len(record["times"]) == 2
+    assert record["input_size"] > 0
+    assert record["host"]["fingerprint"] == get_host_fingerprint()["fingerprint"]
+    assert store.records(method="biopython")[0]["method"] == "biopython"
+    assert len(store.runs()) == 1
+
+
+def test_benchmark_store_default_filename(tmpdir, monkeypatch):
+    monkeypatch.delenv("BIOCONVERT_BENCHMARK_STORE", raising=False)
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmpdir))
+    store = BenchmarkStore()
+    assert store.filename.startswith(str(tmpdir))
+
+    converter = FASTQ2FASTA(bioconvert_data("test_fastq2fasta_v1.fastq"),
+                            str(tmpdir.join("test.fasta")))
+    Benchmark(converter, N=1, to_include=["readfq"], store=store).run_methods()
+    assert [x["method"] for x in store.records()] == ["readfq"]
+
+
+def test_compare(tmpdir):
+    store = BenchmarkStore(str(tmpdir.join("benchmarks.jsonl")))
+    converter = FASTQ2FASTA(bioconvert_data("test_fastq2fasta_v1.fastq"),
+                            str(tmpdir.join("test.fasta")))
+    store.add(converter, "biopython", [1.0, 1.1, 0.9, 1.0, 1.05], label="v1", run_id="1")
+    store.add(converter, "python", [1.0, 1.1, 0.9, 1.0, 1.05], label="v1", run_id="1")
+    store.add(converter, "biopython", [1.5, 1.4, 1.6, 1.45, 1.5], run_id="2")
+    store.add(converter, "python", [1.0, 0.95, 1.05, 1.1, 1.0], run_id="2")
+
+    rows = {x["method"]: x for x in compare(store.records(), baseline="v1")}
+    assert rows["biopython"]["regression"]
+    assert rows["biopython"]["ratio"] == pytest.approx(1.5)
+    assert not rows["python"]["regression"]
+    # below the threshold
+    rows = compare(store.records(), baseline="v1", threshold=0.6)
+    assert not any(x["regression"] for x in rows)
+    # the previous run is the default baseline
+    assert len(compare(store.records())) == 2
+    assert compare(store.records(), baseline="unknown") == []
+
+
+def test_tool_versions(tmpdir):
+    from bioconvert.core.benchmark_store import get_tool_versions
+    converter = FASTQ2FASTA(bioconvert_data("test_fastq2fasta_v1.fastq"),
+                            str(tmpdir.join("test.fasta")))
+    versions = get_tool_versions(converter, "biopython")
+    assert versions["biopython"]
+    assert get_tool_versions(converter, "python_internal") == {}
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from bioconvert.core.benchmark import count_records
+from bioconvert.core.benchmark_suite import (BenchmarkSuite, fit_scaling,
+                                             make_input)
+
+
+def test_fit_scaling():
+    sizes = [1e6, 1e7, 1e8]
+    assert fit_scaling(sizes, [0.1, 1, 10]) == pytest.approx(1)
+    assert fit_scaling(sizes, [0.01, 1, 100]) == pytest.approx(2)
+    assert fit_scaling([1e6], [1]) is None
+
+
+def test_make_input(tmpdir):
+    fastq = str(tmpdir.join("test.fastq"))
+    assert make_input("FASTQ", 100000, fastq) is True
+    assert 100000 <= os.path.getsize(fastq) < 101000
+    assert count_records(fastq) > 0
+
+    sam = str(tmpdir.join("test.sam"))
+    assert make_input("SAM", 200000, sam) is True
+    assert os.path.getsize(sam) >= 200000
+    with open(sam) as fin:
+        lines = fin.readlines()
+    headers = [i for i, x in enumerate(lines) if x.startswith("@")]
+    # the header is kept once, at the beginning
+    assert headers == list(range(len(headers)))
+
+    # binary formats are not scaled
+    bam = str(tmpdir.join("test.bam"))
+    assert make_input("BAM", 10 ** 9, bam) is False
+    assert os.path.getsize(bam) < 10 ** 9
+    assert make_input("unknown", 1000, str(tmpdir.join("test.unknown"))) is None
+
+
+def test_benchmark_suite(tmpdir):
+    suite = BenchmarkSuite(sizes=["20K", "200K"], converters=["FASTQ2FASTA"],
+                           methods=["python_internal"], N=1,
+                           directory=str(tmpdir))
+    results = suite.run()
+    assert [(x["method"], x["size"]) for x in results] == [
+        ("python_internal", 20 * 1024), ("python_internal", 200 * 1024)]
+    assert all(x["error"] is None and x["bytes_per_second"] > 0 for x in results)
+
+    matrix = suite.get_matrix()
+    assert len(matrix) == 1
+    assert matrix[0]["exponent"] is not None
+    assert "| FASTQ2FASTA | python_internal |" in suite.to_markdown()
+
+    suite.write_report(str(tmpdir.join("suite.json")))
+    with open(str(tmpdir.join("suite.json"))) as fin:
+        assert json.load(fin)["sizes"] == [20 * 1024, 200 * 1024]
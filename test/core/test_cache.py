@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from bioconvert import Bioconvert, bioconvert_data
+from bioconvert.core.cache import ConversionCache, parse_size
+from bioconvert.scripts import converter
+
+
+def test_parse_size():
+    assert parse_size("500") == 500
+    assert parse_size("2K") == 2048
+    assert parse_size("1.5G") == int(1.5 * 1024 ** 3)
+    with pytest.raises(ValueError):
+        parse_size("big")
+
+
+@pytest.mark.parametrize("mode", ["content", "fast"])
+def test_conversion_cache(tmpdir, mode):
+    cache = ConversionCache(str(tmpdir.join("cache")), mode=mode)
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    outfile1 = str(tmpdir.join("test1.fasta"))
+    outfile2 = str(tmpdir.join("test2.fasta"))
+
+    c = Bioconvert(infile, outfile1, cache=cache)
+    c(method="biopython")
+    entries = cache.entries()
+    assert len(entries) == 1
+    assert entries[0]["converter"] == "FASTQ2FASTA"
+
+    # the second conversion is retrieved from the cache
+    c = Bioconvert(infile, outfile2, cache=cache)
+    c.converter._method_biopython = None
+    c(method="biopython")
+    assert open(outfile1).read() == open(outfile2).read()
+    assert len(cache.entries()) == 1
+
+    # another method is another entry
+    c = Bioconvert(infile, outfile2, cache=cache, force=True)
+    c(method="readfq")
+    assert len(cache.entries()) == 2
+
+    # least recently used entries are removed first
+    key = cache.entries()[1]["key"]
+    removed = cache.prune(cache.get_size() - 1)
+    assert [x["key"] for x in removed] == [key]
+    assert cache.clear() and cache.entries() == []
+
+
+def test_conversion_cache_default_directory(tmpdir, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmpdir))
+    cache = ConversionCache()
+    assert cache.directory.startswith(str(tmpdir))
+
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    c = Bioconvert(infile, str(tmpdir.join("test.fasta")), cache=cache)
+    c(method="readfq")
+    assert len(cache.entries()) == 1
+
+
+def test_conversion_cache_disabled(tmpdir):
+    cache = ConversionCache(str(tmpdir.join("cache")))
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    c = Bioconvert(infile, str(tmpdir.join("test.fasta")), cache=False)
+    c(method="biopython")
+    assert cache.entries() == []
+
+
+def test_cache_command(tmpdir, monkeypatch, capsys):
+    monkeypatch.setenv("BIOCONVERT_CACHE_DIR", str(tmpdir))
+    cache = ConversionCache.from_environment()
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    c = Bioconvert(infile, str(tmpdir.join("test.fasta")), cache=cache)
+    c(method="biopython")
+    converter.main(["cache"])
+    assert "1 entries" in capsys.readouterr().out
+    converter.main(["cache", "clear"])
+    assert cache.entries() == []
@@ -0,0 +1,96 @@
+import bz2
+import gzip
+import os
+
+import pytest
+from easydev import TempFile
+
+from bioconvert.core.compression import (open_compressed, get_backend,
+                                         get_compression, compress_file,
+                                         decompress_file)
+from bioconvert.core.utils import compressor
+
+
+data = b"".join(b"@read%d\nACGTACGT\n+\nIIIIIIII\n" % i for i in range(20000))
+
+
+def test_get_compression():
+    assert get_compression("test.fastq.gz") == ".gz"
+    assert get_compression("test.fastq.bz2") == ".bz2"
+    assert get_compression("test.fastq") is None
+    with pytest.raises(ValueError):
+        get_backend(".zip")
+    with pytest.raises(ValueError):
+        get_backend(".gz", backend="unknown")
+
+
+@pytest.mark.parametrize("backend", ["isal", "zlib-ng", "python-threaded", "python"])
+@pytest.mark.parametrize("threads", [1, 4])
+def test_open_compressed_gz(backend, threads):
+    if backend == "isal":
+        pytest.importorskip("isal")
+    if backend == "zlib-ng":
+        pytest.importorskip("zlib_ng")
+    with TempFile(suffix=".fastq.gz") as fout:
+        with open_compressed(fout.name, "wb", threads=threads, backend=backend) as fh:
+            fh.write(data)
+        with gzip.open(fout.name, "rb") as fh:
+            assert fh.read() == data
+        with open_compressed(fout.name, "rt", threads=threads, backend=backend) as fh:
+            assert fh.read() == data.decode()
+
+
+@pytest.mark.parametrize("backend,compression", [("pigz", ".gz"), ("pbzip2", ".bz2")])
+def test_open_compressed_tools(tmpdir, backend, compression):
+    from bioconvert.core.compression import _is_installed
+    if not _is_installed(backend):
+        pytest.skip("{} not installed".format(backend))
+    # the filename is not interpreted by a shell
+    filename = str(tmpdir.join("a b; touch x$(echo y).fastq" + compression))
+    with open_compressed(filename, "wb", threads=2, backend=backend) as fh:
+        fh.write(data)
+    with open_compressed(filename, "rb", threads=2, backend=backend) as fh:
+        assert fh.read() == data
+    assert sorted(x.basename for x in tmpdir.listdir()) == [os.path.basename(filename)]
+
+
+def test_pipe_file(tmpdir):
+    from bioconvert.core.compression import _PipeFile
+    import io
+    filename = str(tmpdir.join("a b; touch x.gz"))
+    with io.BufferedWriter(_PipeFile(["gzip", "-c"], "w", outfile=filename)) as fh:
+        fh.write(data)
+    with io.BufferedReader(_PipeFile(["gzip", "-dc", filename], "r")) as fh:
+        assert fh.read() == data
+    assert [x.basename for x in tmpdir.listdir()] == ["a b; touch x.gz"]
+    with pytest.raises(IOError):
+        with io.BufferedReader(_PipeFile(["gzip", "-dc", filename + "missing"], "r")) as fh:
+            fh.read()
+
+
+def test_open_compressed_bz2():
+    with TempFile(suffix=".fastq.bz2") as fout:
+        with open_compressed(fout.name, "wt") as fh:
+            fh.write(data.decode())
+        with bz2.open(fout.name, "rb") as fh:
+            assert fh.read() == data
+
+
+def test_compress_file():
+    with TempFile(suffix=".fastq") as fin, TempFile(suffix=".fastq.gz") as fgz:
+        with open(fin.name, "wb") as fh:
+            fh.write(data)
+        compress_file(fin.name, fgz.name, threads=2)
+        decompress_file(fgz.name, fin.name, threads=2)
+        with open(fin.name, "rb") as fh:
+            assert fh.read() == data
+
+    # compress in place as done by bam2fastq
+    with TempFile(suffix=".fastq.bz2") as fout:
+        infile = fout.name[:-4]
+        with open(infile, "wb") as fh:
+            fh.write(data)
+        assert compressor(infile, "bz2", threads=1) == fout.name
+        assert not os.path.exists(infile)
+        with bz2.open(fout.name, "rb") as fh:
+            assert fh.read() == data
@@ -1,3 +1,5 @@
+import os
+
 from bioconvert import Bioconvert
 from bioconvert import bioconvert_data
 from easydev import TempFile
@@ -54,3 +56,203 @@ def test_indirect_conversion():
     with TempFile(suffix=".clustal") as fout:
         c = Bioconvert(infile, fout.name, force=True)
         c()
+
+
+def test_indirect_conversion_streaming():
+    infile = bioconvert_data("ERR3295124.fastq")
+    with TempFile(suffix=".clustal") as fout1, TempFile(suffix=".clustal") as fout2:
+        c = Bioconvert(infile, fout1.name, force=True)
+        c.converter.streaming = False
+        c()
+        c = Bioconvert(infile, fout2.name, force=True)
+        assert c.converter.streaming is True
+        c()
+        assert open(fout1.name).read() == open(fout2.name).read()
+
+
+def test_indirect_conversion_streaming_error():
+    with TempFile(suffix=".fastq") as fin, TempFile(suffix=".clustal") as fout:
+        with open(fin.name, "w") as fastq:
+            fastq.write("@read1\nACGT\n+\n!!!!\n@read2\nACG\n+\n!!!\n")
+        c = Bioconvert(fin.name, fout.name, force=True)
+        # sequences of different lengths cannot be aligned
+        with pytest.raises(ValueError):
+            c()
+
+
+def test_indirect_conversion_missing_output(tmpdir, monkeypatch):
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+    # the first step ends without error and without writing its output
+    monkeypatch.setattr(FASTQ2FASTA, "__call__", lambda self, *args, **kwargs: None)
+    infile = bioconvert_data("ERR3295124.fastq")
+    c = Bioconvert(infile, str(tmpdir.join("out.clustal")), force=True)
+    c.converter.streaming = False
+    with pytest.raises(IOError):
+        c()
+
+
+def test_intermediate_dir_binary_input(tmpdir, monkeypatch):
+    import collections
+    import os
+    from bioconvert.core.base import make_chain
+    from bioconvert.fasta2clustal import FASTA2CLUSTAL
+
+    infile = bioconvert_data("test_measles.sorted.bam")
+    size = os.path.getsize(infile)
+    chain = make_chain([((("BAM",), ("FASTA",)), BAM2FASTA),
+                        ((("FASTA",), ("CLUSTAL",)), FASTA2CLUSTAL)])
+    c = chain(infile, str(tmpdir.join("out.clustal")))
+    # two files of the size of the input fit in /dev/shm, not the
+    # uncompressed data
+    statvfs = collections.namedtuple("statvfs", "f_bavail f_frsize")
+    monkeypatch.setattr(os, "statvfs", lambda path: statvfs(4 * size, 1))
+    assert c.intermediate_dir() is None
+    monkeypatch.setattr(os, "statvfs", lambda path: statvfs(16 * size, 1))
+    assert c.intermediate_dir() == "/dev/shm"
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="requires /dev/shm")
+def test_indirect_conversion_no_space(tmpdir, monkeypatch):
+    import errno
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    call = FASTQ2FASTA.__call__
+    outfiles = []
+
+    def no_space(self, *args, **kwargs):
+        # /dev/shm is full
+        outfiles.append(self.outfile)
+        if self.outfile.startswith("/dev/shm"):
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+        return call(self, *args, **kwargs)
+
+    monkeypatch.setattr(FASTQ2FASTA, "__call__", no_space)
+    infile = bioconvert_data("ERR3295124.fastq")
+    outfile = str(tmpdir.join("out.clustal"))
+    c = Bioconvert(infile, outfile, force=True)
+    c.converter.streaming = False
+    monkeypatch.setattr(type(c.converter), "intermediate_dir",
+                        lambda self, nb_files=2: "/dev/shm")
+    c()
+    assert os.path.exists(outfile)
+    assert outfiles[0].startswith("/dev/shm")
+    assert not outfiles[1].startswith("/dev/shm")
+
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_bioconvert_map(tmpdir, executor):
+    infile = bioconvert_data("ERR3295124.fastq")
+    pairs = [(infile, str(tmpdir.join("test{}.fasta".format(i)))) for i in range(3)]
+    # the output exists already
+    tmpdir.join("test2.fasta").write("")
+    results = list(Bioconvert.map(pairs, executor=executor, max_workers=2,
+                                  method="biopython", ordered=True))
+    assert [x.outfile for x in results] == [x[1] for x in pairs]
+    assert [x.ok for x in results] == [True, True, False]
+    assert isinstance(results[2].error, ValueError)
+    assert results[0].converter == "FASTQ2FASTA"
+    assert open(pairs[0][1]).read() == open(pairs[1][1]).read() != ""
+
+
+def test_bioconvert_get_formats():
+    assert Bioconvert.get_formats("test.fastq.gz", "test.fasta") == (("FASTQ",), ("FASTA",))
+    assert Bioconvert.get_formats("test.fastq.gz", "test.fastq.bz2") == (("GZ",), ("BZ2",))
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_indirect_conversion_compressed(tmpdir, streaming):
+    import gzip
+    infile = bioconvert_data("ERR3295124.fastq")
+    gzfile = str(tmpdir.join("test.fastq.gz"))
+    with open(infile, "rb") as fin, gzip.open(gzfile, "wb") as fout:
+        fout.write(fin.read())
+    expected = str(tmpdir.join("expected.clustal"))
+    Bioconvert(infile, expected, force=True)()
+
+    outfile = str(tmpdir.join("test.clustal.gz"))
+    c = Bioconvert(gzfile, outfile, force=True)
+    c.converter.streaming = streaming
+    c.converter.intermediate_directory = str(tmpdir)
+    kind = "fifo" if streaming else "file"
+    # (de)compression is done once by the chain, not by the steps
+    assert c.converter.chain_plan() == {"decompress": kind, "compress": kind,
+                                        "links": [kind]}
+    assert c.converter.intermediate_dir() == str(tmpdir)
+    c()
+    with gzip.open(outfile) as fin:
+        assert fin.read() == open(expected, "rb").read()
+    # intermediate files are removed
+    assert sorted(x.basename for x in tmpdir.listdir()) == [
+        "expected.clustal", "test.clustal.gz", "test.fastq.gz"]
+
+
+@pytest.mark.parametrize("max_size,method,kind", [
+    (1, "readfq", "fifo"), (10 ** 9, "python_internal", "file")])
+def test_indirect_conversion_tuned(tmpdir, monkeypatch, max_size, method, kind):
+    import gzip
+    from bioconvert.core import autotune
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    # python_internal (not streamable) is the fastest method for the
+    # inputs up to max_size bytes, readfq (streamable) for larger inputs
+    monkeypatch.setenv("BIOCONVERT_AUTOTUNE_PROFILE", str(tmpdir.join("autotune.json")))
+    key, node = autotune.get_node_type()
+    autotune.save_profile({"nodes": {key: {"node": node, "converters": {
+        "FASTQ2FASTA": {"buckets": [
+            {"max_size": max_size, "ranking": ["python_internal"]},
+            {"max_size": None, "ranking": ["readfq"]}]}}}}})
+    methods = []
+    call = FASTQ2FASTA.__call__
+
+    def record_method(self, *args, **kwargs):
+        methods.append(kwargs.get("method"))
+        return call(self, *args, **kwargs)
+
+    monkeypatch.setattr(FASTQ2FASTA, "__call__", record_method)
+    infile = bioconvert_data("ERR3295124.fastq")
+    gzfile = str(tmpdir.join("test.fastq.gz"))
+    with open(infile, "rb") as fin, gzip.open(gzfile, "wb") as fout:
+        fout.write(fin.read())
+    c = Bioconvert(gzfile, str(tmpdir.join("test.clustal")), force=True)
+    # the method of each step is chosen from the size of the input of the
+    # chain, not from the size of a named pipe
+    assert c.converter.get_step_methods()[0] == method
+    assert c.converter.chain_plan()["decompress"] == kind
+    c()
+    assert methods == [method]
+    assert os.path.getsize(str(tmpdir.join("test.clustal")))
+
+
+def test_indirect_conversion_compressed_error(tmpdir):
+    infile = tmpdir.join("test.fastq.gz")
+    infile.write("not compressed")
+    c = Bioconvert(str(infile), str(tmpdir.join("test.clustal")), force=True)
+    with pytest.raises(Exception):
+        c()
+
+
+def test_wire_chain():
+    from bioconvert.core.base import _wire_chain
+    steps = [((("FASTQ",), ("FASTA", "QUAL")), None),
+             ((("FASTA",), ("CLUSTAL",)), None)]
+    wiring, outputs = _wire_chain(steps, ("FASTQ",), ("CLUSTAL", "QUAL"))
+    assert wiring == [([0], [1, 2]), ([1], [3])]
+    assert outputs == [3, 2]
+    with pytest.raises(ValueError):
+        _wire_chain(steps, ("FASTQ",), ("CLUSTAL", "FASTA"))
+
+
+def test_indirect_conversion_multiple_outputs(tmpdir):
+    infile = bioconvert_data("ERR3295124.fastq")
+    expected = str(tmpdir.join("expected.clustal"))
+    Bioconvert(infile, expected, force=True)()
+    outfiles = (str(tmpdir.join("test.clustal")), str(tmpdir.join("test.qual")))
+    c = Bioconvert(infile, outfiles, force=True)
+    assert [x for x, _ in c.converter.converter_map] == [
+        (("FASTQ",), ("FASTA", "QUAL")), (("FASTA",), ("CLUSTAL",))]
+    c.converter.intermediate_directory = str(tmpdir)
+    c()
+    assert open(outfiles[0]).read() == open(expected).read()
+    assert open(outfiles[1]).read().startswith(">")
+    # the intermediate FASTA file is removed
+    assert len(tmpdir.listdir()) == 3
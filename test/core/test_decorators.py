@@ -1,4 +1,6 @@
-from bioconvert.core.decorators import requires
+import json
+
+from bioconvert.core.decorators import requires, DependencyCache
 
 
 def test_require_binaries():
@@ -62,3 +64,29 @@ def test_require_both():
 
     g = requires(python_library="tagada7", external_binary="tagada8")(f)
     assert g.is_disabled
+
+
+def test_dependency_cache(tmpdir):
+    filename = str(tmpdir.join("dependencies.json"))
+    cache = DependencyCache(filename=filename)
+    assert cache.is_binary_missing("ls") is False
+    assert cache.is_binary_missing("tagada9") is True
+    assert cache.is_library_missing("pandas") is False
+    assert cache.is_library_missing("tagada10") is True
+    cache.save()
+
+    # a new cache reads the results from disk
+    cache = DependencyCache(filename=filename)
+    cache.load()
+    assert cache.binaries == {"ls": False, "tagada9": True}
+    assert cache.libraries == {"pandas": False, "tagada10": True}
+
+    # results are discarded if the environment changed
+    with open(filename) as fin:
+        data = json.load(fin)
+    data["key"] = {}
+    with open(filename, "w") as fout:
+        json.dump(data, fout)
+    cache = DependencyCache(filename=filename)
+    cache.load()
+    assert cache.binaries == {}
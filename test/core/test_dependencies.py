@@ -236,3 +236,18 @@ def _test_require_all_and_print_test():
 """)
     for d, s, t in get_known_dependencies_with_availability():
         assert d in known_missing_dependencies or s
+
+
+def test_known_dependencies_probe_all_converters(tmpdir, monkeypatch):
+    import sys
+    from bioconvert.core import decorators, registry
+    # a cache filled by a run that imported a single converter
+    cache = decorators.DependencyCache(str(tmpdir.join("dependencies.json")))
+    cache._loaded = True
+    cache.binaries["awk"] = False
+    monkeypatch.setattr(decorators, "dependency_cache", cache)
+    monkeypatch.delitem(sys.modules, "bioconvert.bam2sam", raising=False)
+    monkeypatch.setattr(registry, "get_registry", lambda: registry.Registry())
+
+    known = get_known_dependencies_with_availability(as_dict=True)
+    assert "samtools" in known["external_binaries"]
@@ -1,7 +1,11 @@
+import json
+import os
+import threading
+
 import pytest
 
 from bioconvert.bam2cov import BAM2COV
-from bioconvert.core.registry import Registry
+from bioconvert.core.registry import Registry, ConverterProxy, get_registry
 from bioconvert.sra2fastq import SRA2FASTQ
 
 
@@ -75,3 +79,180 @@ def test_rgistry():
 
 
 
+
+
+def test_registry_manifest(tmpdir):
+    manifest = str(tmpdir.join("manifest.json"))
+    scanned = Registry(use_manifest=False)
+
+    # first call scans the modules and writes the manifest
+    rr = Registry(manifest_file=manifest)
+    assert os.path.exists(manifest)
+
+    # second call reads the manifest only
+    rr = Registry(manifest_file=manifest)
+    assert sorted(rr.get_conversions()) == sorted(scanned.get_conversions())
+    assert sorted(rr.get_conversions_from_ext()) == \
+        sorted(scanned.get_conversions_from_ext())
+    assert isinstance(rr._fmt_registry[('FASTQ',), ('FASTA',)], ConverterProxy)
+    assert rr[('FASTQ',), ('FASTA',)] is scanned[('FASTQ',), ('FASTA',)]
+    assert rr.conversion_path(('FASTQ',), ('CLUSTAL',)) == \
+        scanned.conversion_path(('FASTQ',), ('CLUSTAL',))
+
+    # an outdated manifest is rebuilt
+    with open(manifest, "w") as fout:
+        fout.write('{"key": {}, "converters": []}')
+    rr = Registry(manifest_file=manifest)
+    assert sorted(rr.get_conversions()) == sorted(scanned.get_conversions())
+
+
+def test_get_registry():
+    rr = get_registry()
+    assert rr is get_registry()
+
+    path = rr.conversion_path(('FASTQ',), ('CLUSTAL',))
+    assert path
+    assert rr.conversion_path(('FASTQ',), ('CLUSTAL',)) == path
+    # memoized results are copies
+    path.pop()
+    assert rr.conversion_path(('FASTQ',), ('CLUSTAL',)) != path
+
+    converters = [(i, o) for i, o, _, _ in rr.iter_converters()]
+    assert rr.get_ext((('fastq',), ('fasta',)))
+
+    rr.refresh()
+    assert [(i, o) for i, o, _, _ in rr.iter_converters()] == converters
+    assert rr.get_ext((('fastq',), ('fasta',)))
+
+
+def test_refresh_concurrent_readers():
+    rr = Registry()
+    errors = []
+    done = threading.Event()
+
+    def read():
+        try:
+            while not done.is_set():
+                rr[(('FASTQ',), ('FASTA',))]
+                rr.get_ext((('fastq',), ('fasta',)))
+                assert rr.conversion_path(('FASTQ',), ('CLUSTAL',))
+        except Exception as err:
+            errors.append(err)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(3):
+            rr.refresh()
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+
+
+def test_refresh_probes_dependencies(tmpdir, monkeypatch):
+    from bioconvert.core import decorators
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    available = "seqtk" in FASTQ2FASTA.available_methods
+    find_executable = decorators.find_executable
+
+    def toggle_seqtk(name):
+        if name == "seqtk":
+            return None if available else "/fake/seqtk"
+        return find_executable(name)
+
+    monkeypatch.setattr(decorators, "find_executable", toggle_seqtk)
+    monkeypatch.setattr(decorators.dependency_cache, "filename",
+                        str(tmpdir.join("dependencies.json")))
+    rr = Registry(manifest_file=str(tmpdir.join("manifest.json")))
+    try:
+        rr.refresh()
+        assert ("seqtk" in FASTQ2FASTA.available_methods) is not available
+        proxy = [c for c in rr._get_all_converters(None)
+                 if c.__name__ == "FASTQ2FASTA"][0]
+        assert ("seqtk" in proxy.available_methods) is not available
+    finally:
+        monkeypatch.undo()
+        rr.refresh()
+    assert ("seqtk" in FASTQ2FASTA.available_methods) is available
+
+
+def test_weighted_conversion_path(tmpdir, monkeypatch):
+    from bioconvert.core.benchmark_store import get_host_fingerprint
+    monkeypatch.setenv("BIOCONVERT_AUTOTUNE_PROFILE", "0")
+    store = str(tmpdir.join("benchmarks.jsonl"))
+    host = get_host_fingerprint()
+
+    def add_record(converter, seconds):
+        method, _, _ = rr.get_step_cost(converter)
+        record = {"run": "1", "time": 1, "converter": converter.__name__,
+                  "method": method, "input_size": 10 ** 7,
+                  "times": [seconds] * 3, "host": host}
+        with open(store, "a") as fout:
+            fout.write(json.dumps(record) + "\n")
+
+    fasta, stockholm = ("FASTA",), ("STOCKHOLM",)
+    rr = Registry(benchmark_store=store)
+    paths = [[(fasta, (x,)), ((x,), stockholm)] for x in ("CLUSTAL", "PHYLIP")]
+    if rr.conversion_path(fasta, stockholm) not in paths:
+        pytest.skip("missing dependencies")
+
+    # the slower FASTA2CLUSTAL converter is avoided
+    add_record(rr[fasta, ("CLUSTAL",)], 0.3)
+    rr = Registry(benchmark_store=store)
+    assert rr.conversion_path(fasta, stockholm) == paths[1]
+
+    add_record(rr[fasta, ("PHYLIP",)], 1000)
+    rr = Registry(benchmark_store=store)
+    assert rr.conversion_path(fasta, stockholm) == paths[0]
+
+    steps = rr.explain_path(fasta, stockholm, size=10 ** 7)
+    assert [x["converter"] for x in steps] == ["FASTA2CLUSTAL", "CLUSTAL2STOCKHOLM"]
+    assert steps[0]["measured"] and steps[0]["time"] == pytest.approx(0.3)
+    assert steps[0]["throughput"] == pytest.approx(10 / 0.3)
+    assert not steps[1]["measured"]
+
+    # direct conversions are not replaced by a path
+    steps = rr.explain_path(fasta, ("PHYLIP",))
+    assert len(steps) == 1 and steps[0]["time"] == pytest.approx(100)
+
+
+def test_multiple_formats_conversion_path():
+    rr = get_registry()
+    fastq, fasta = ("FASTQ",), ("FASTA",)
+    if not rr.conversion_exists(fastq, ("FASTA", "QUAL")) \
+            or not rr.conversion_exists(fasta, ("CLUSTAL",)):
+        pytest.skip("missing dependencies")
+    # a step may convert one of the files only
+    assert rr.conversion_path(fastq, ("CLUSTAL", "QUAL")) == [
+        (fastq, ("FASTA", "QUAL")), (fasta, ("CLUSTAL",))]
+    assert rr.conversion_path(("FASTA", "QUAL"), ("CLUSTAL",)) == [
+        (fasta, ("CLUSTAL",))]
+    # discarding outputs costs more than a direct path
+    assert rr.conversion_path(fastq, ("CLUSTAL",)) == [
+        (fastq, fasta), (fasta, ("CLUSTAL",))]
+    assert rr.conversion_path(fastq, ("NOTHING",)) == []
+
+
+def test_get_formats_from_ext():
+    rr = Registry()
+    assert ("FASTQ",) in rr.get_formats_from_ext(("fq",))
+    assert rr.get_formats_from_ext(("unknown",)) == []
+
+
+def test_indirect_paths_agree():
+    rr = Registry()
+    indirect = [(i, o, steps) for i, o, c, steps in rr.iter_converters(True)
+                if c is None]
+    if not indirect:
+        pytest.skip("missing dependencies")
+    for in_fmt, out_fmt, steps in indirect:
+        # the path of the sub-command is the one explained and run
+        assert len(steps) > 1
+        assert steps == rr.conversion_path(in_fmt, out_fmt)
+        assert [(x["input_fmt"], x["output_fmt"])
+                for x in rr.explain_path(in_fmt, out_fmt)] == steps
+        assert rr.get_indirect_path(in_fmt, out_fmt) == steps
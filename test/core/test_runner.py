@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+from bioconvert.core.runner import run, run_async, needs_shell
+
+
+def test_needs_shell():
+    assert needs_shell("ls -l") is False
+    assert needs_shell("ls | wc -l")
+    assert needs_shell("gzip -c in > out")
+    assert needs_shell("TMPDIR=/tmp ls")
+
+
+def test_run():
+    result = run("echo hello")
+    assert result.returncode == 0
+    assert result.stdout == "hello\n"
+    assert result.rusage["max_rss"] > 0
+    assert result.timed_out is False
+
+    result = run("echo error >&2; exit 3")
+    assert result.returncode == 3
+    assert result.stderr == "error\n"
+
+
+def test_run_callback_and_buffer():
+    lines = []
+    result = run("seq 1 10000", stdout_callback=lines.append, max_buffer_size=100)
+    assert lines == [str(i) for i in range(1, 10001)]
+    assert len(result.stdout) == 100
+    assert result.stdout.endswith("9999\n10000\n")
+
+
+def test_run_timeout():
+    t1 = time.time()
+    result = run("sleep 10 | sleep 10", timeout=0.5)
+    assert time.time() - t1 < 5
+    assert result.timed_out is True
+    assert result.returncode != 0
+
+
+def test_run_cancel():
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(run_async("sleep 10"), 0.5)
+    t1 = time.time()
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+    assert time.time() - t1 < 5
+
+
+def test_run_exit_status():
+    assert run("sh -c 'exit 3'", timeout=10).returncode == 3
+    # killed by a signal
+    assert run("kill -9 $$", timeout=10).returncode == -9
@@ -0,0 +1,67 @@
+import os
+import subprocess
+
+import pytest
+
+from bioconvert.core import scheduler
+from bioconvert.core.scheduler import ThreadScheduler, get_available_cores
+
+
+def test_get_available_cores(monkeypatch):
+    assert get_available_cores() >= 1
+    monkeypatch.setenv("BIOCONVERT_CORES", "3")
+    assert get_available_cores() == 3
+    monkeypatch.setenv("BIOCONVERT_CORES", "0")
+    assert get_available_cores() == 1
+
+
+def test_scheduler_budget(tmpdir):
+    sched = ThreadScheduler(cores=8, directory=str(tmpdir))
+    assert sched.get_budget([]) == 8
+
+    with sched.lease() as first:
+        assert first.threads == 8
+        # all cores are used, the next conversion gets a fair share
+        with sched.lease() as second:
+            assert second.threads == 4
+            assert sorted(x[1] for x in sched.get_leases()) == [4, 8]
+        # explicit requests are not capped
+        with sched.lease(16) as third:
+            assert third.threads == 16
+    assert sched.get_leases() == []
+    assert sched.acquire(2).threads == 2
+
+
+def test_scheduler_dead_process(tmpdir):
+    process = subprocess.Popen(["true"])
+    process.wait()
+    with open(os.path.join(str(tmpdir), "{}-0".format(process.pid)), "w") as fout:
+        fout.write("8")
+
+    sched = ThreadScheduler(cores=8, directory=str(tmpdir))
+    assert sched.get_leases() == []
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_converter_threads(tmpdir, monkeypatch):
+    from bioconvert import bioconvert_data
+    from bioconvert.fastq2fasta import FASTQ2FASTA
+
+    sched = ThreadScheduler(cores=4, directory=str(tmpdir))
+    monkeypatch.setattr(scheduler, "_scheduler", sched)
+
+    outfile = str(tmpdir.join("test.fasta"))
+    converter = FASTQ2FASTA(bioconvert_data("test_fastq2fasta_v1.fastq"), outfile)
+    used = []
+    monkeypatch.setattr(converter, "_method_dummy",
+                        lambda *args, **kwargs: used.append(converter.threads))
+    converter(method="dummy")
+    # the share of the cores is only set during the conversion
+    assert used == [4]
+    assert "threads" not in converter.__dict__
+
+    converter.threads = 2
+    converter(method="dummy")
+    assert used == [4, 2]
+    assert converter.threads == 2
+    assert sched.get_leases() == []
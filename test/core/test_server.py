@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from bioconvert import bioconvert_data
+from bioconvert.core.server import ConversionServer, ConversionClient
+
+
+@pytest.fixture
+def server(tmpdir):
+    server = ConversionServer(str(tmpdir.join("bioconvert.sock")), max_workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_server(server, tmpdir):
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    with ConversionClient(server.socket_filename) as client:
+        assert client.is_alive()
+        reply = client.convert(infile, str(tmpdir.join("test1.fasta")),
+                               method="biopython")
+        assert reply["ok"] is True
+        assert reply["converter"] == "FASTQ2FASTA"
+
+        # relative paths and explicit converter
+        tmpdir.join("test.txt").write(open(infile).read())
+        with tmpdir.as_cwd():
+            reply = client.convert("test.txt", "test2.fasta",
+                                   converter="fastq2fasta", method="biopython")
+        assert reply["ok"] is True
+        assert tmpdir.join("test2.fasta").read() == tmpdir.join("test1.fasta").read()
+
+        # the output exists already
+        reply = client.convert(infile, str(tmpdir.join("test1.fasta")))
+        assert reply["ok"] is False
+        assert "exists" in reply["error"]
+
+        # command lines
+        reply = client.run(["fastq2fasta", infile, str(tmpdir.join("test3.fasta")),
+                            "-m", "biopython"])
+        assert reply["returncode"] == 0
+        assert tmpdir.join("test3.fasta").read() == tmpdir.join("test1.fasta").read()
+        reply = client.run(["fastq2fasta", infile, str(tmpdir.join("test3.fasta"))])
+        assert reply["returncode"] == 1
+
+
+def test_client_without_server(tmpdir):
+    with ConversionClient(str(tmpdir.join("none.sock"))) as client:
+        assert client.is_alive() is False
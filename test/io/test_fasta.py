@@ -0,0 +1,157 @@
+import gzip
+import os
+
+import pytest
+
+from bioconvert.io.fasta import (Fasta, FaiEntry, FastaIndex, count_sequences,
+                                 extract)
+
+
+data = (b">seq1  first   comment\r\nACGTACGTAA\r\nacgtNNNN\r\n"
+        b">seq2\nATGAAATTTGG\n\nCCC\n>seq3 x\tTab\nATG")
+
+
+@pytest.fixture
+def fasta(tmpdir):
+    filename = tmpdir.join("test.fasta")
+    filename.write_binary(data)
+    return str(filename)
+
+
+def get_records(reader):
+    return [(x.name, x.comment, x.sequence) for x in reader]
+
+
+def test_read_fasta(fasta):
+    assert get_records(Fasta(fasta)) == [
+        (b"seq1", b"first comment", b"ACGTACGTAAacgtNNNN"),
+        (b"seq2", b"", b"ATGAAATTTGGCCC"),
+        (b"seq3", b"x Tab", b"ATG")]
+    # headers and lines split across blocks
+    for block_size in (1, 2, 5, 13):
+        assert get_records(Fasta(fasta, block_size=block_size)) == \
+            get_records(Fasta(fasta))
+    assert count_sequences(fasta) == 3
+
+
+def test_read_fasta_single_line(tmpdir):
+    # a sequence on a single line much longer than the blocks
+    filename = tmpdir.join("long.fasta")
+    filename.write_binary(b">chr1 long\n" + b"ACGT" * 1000 + b"\n>chr2 last")
+    assert get_records(Fasta(str(filename), block_size=7)) == [
+        (b"chr1", b"long", b"ACGT" * 1000), (b"chr2", b"last", b"")]
+
+
+def test_read_fasta_compat(fasta):
+    record = next(Fasta(fasta).read())
+    assert record["id"] == "seq1"
+    assert record["comment"] == "first comment"
+    assert record["value"] == "ACGTACGTAAacgtNNNN"
+
+
+def test_read_fasta_gz(fasta, tmpdir):
+    gzfile = str(tmpdir.join("test.fasta.gz"))
+    with gzip.open(gzfile, "wb") as fout:
+        fout.write(data)
+    assert get_records(Fasta(gzfile)) == get_records(Fasta(fasta))
+    assert count_sequences(gzfile) == 3
+
+
+indexed_data = (b">chr1 first chromosome\nACGTA\nCGTAC\nGT\n"
+                b">chr2\r\nAAAACCCC\r\nGG\r\n>chr3\nTTT")
+
+
+@pytest.fixture
+def indexed_fasta(tmpdir):
+    filename = tmpdir.join("indexed.fasta")
+    filename.write_binary(indexed_data)
+    return str(filename)
+
+
+def test_fasta_index(indexed_fasta):
+    with FastaIndex(indexed_fasta) as index:
+        assert index.names == ["chr1", "chr2", "chr3"]
+        assert index["chr2"] == FaiEntry("chr2", 10, 45, 8, 10)
+        assert index.fetch("chr1") == b"ACGTACGTACGT"
+        assert index.fetch("chr1", 3, 11) == b"TACGTACG"
+        assert index.fetch("chr2", 6) == b"CCGG"
+        assert index.fetch("chr3", 1, 100) == b"TT"
+        assert index.get_comment("chr1") == b"first chromosome"
+        assert index.get_comment("chr2") == b""
+        with pytest.raises(ValueError):
+            index.fetch("chr4")
+
+    # samtools compatible index, reused as long as it is up to date
+    with open(indexed_fasta + ".fai") as fin:
+        assert fin.read() == ("chr1\t12\t23\t5\t6\n"
+                              "chr2\t10\t45\t8\t10\n"
+                              "chr3\t3\t65\t3\t4\n")
+    with open(indexed_fasta + ".fai", "a") as fout:
+        fout.write("chr4\t1\t0\t1\t2\n")
+    assert "chr4" in FastaIndex(indexed_fasta)
+    os.utime(indexed_fasta + ".fai", (0, 0))
+    assert "chr4" not in FastaIndex(indexed_fasta)
+
+
+def test_fasta_index_blocks(indexed_fasta, tmpdir, monkeypatch):
+    from bioconvert.io import fasta
+    expected = FastaIndex(indexed_fasta)
+    # lines and headers split across blocks
+    monkeypatch.setattr(fasta, "BLOCK_SIZE", 3)
+    os.remove(indexed_fasta + ".fai")
+    index = FastaIndex(indexed_fasta)
+    assert [index[x] for x in index.names] == [expected[x] for x in expected.names]
+
+    filename = str(tmpdir.join("long.fasta"))
+    with open(filename, "wb") as fout:
+        fout.write(b">chr1\r\n" + b"ACGT" * 1000 + b"\r\n>chr2\nAC")
+    index = FastaIndex(filename)
+    assert index["chr1"] == FaiEntry("chr1", 4000, 7, 4000, 4002)
+    assert index["chr2"] == FaiEntry("chr2", 2, 4015, 2, 3)
+    assert index.fetch("chr1", 3998) == b"GT"
+
+
+def test_fasta_index_regions(indexed_fasta):
+    index = FastaIndex(indexed_fasta)
+    assert index.parse_region("chr1") == ("chr1", 0, 12)
+    assert index.parse_region("chr1:2") == ("chr1", 1, 12)
+    assert index.parse_region("chr1:2-1,0") == ("chr1", 1, 10)
+    for region in ("chr4:1-2", "chr1:0-2", "chr1:5-4", "chr1:a-b"):
+        with pytest.raises(ValueError):
+            index.parse_region(region)
+
+    records = Fasta(indexed_fasta, names=["chr2", "chr1"],
+                    regions=["chr1:11-20", "chr3:2"])
+    assert get_records(records) == [
+        (b"chr2", b"", b"AAAACCCCGG"),
+        (b"chr1", b"first chromosome", b"ACGTACGTACGT"),
+        (b"chr1:11-12", b"", b"GT"),
+        (b"chr3:2-3", b"", b"TT")]
+
+
+def test_fasta_index_invalid(tmpdir, fasta):
+    # blank line within a sequence
+    with pytest.raises(ValueError):
+        FastaIndex(fasta)
+    gzfile = str(tmpdir.join("test.fasta.gz"))
+    with gzip.open(gzfile, "wb") as fout:
+        fout.write(indexed_data)
+    with pytest.raises(ValueError):
+        FastaIndex(gzfile)
+
+
+def test_fasta_index_bgzf(indexed_fasta):
+    pysam = pytest.importorskip("pysam")
+    pysam.tabix_compress(indexed_fasta, indexed_fasta + ".gz")
+    with FastaIndex(indexed_fasta + ".gz") as index:
+        assert index.fetch("chr1", 3, 11) == b"TACGTACG"
+    assert os.path.exists(indexed_fasta + ".gz.gzi")
+
+
+def test_extract(indexed_fasta, tmpdir):
+    outfile = str(tmpdir.join("out.fasta"))
+    extract(indexed_fasta, outfile, names=["chr1"], regions=["chr2:3-9"],
+            width=5)
+    with open(outfile, "rb") as fin:
+        assert fin.read() == (b">chr1 first chromosome\nACGTA\nCGTAC\nGT\n"
+                              b">chr2:3-9\nAACCC\nCG\n")
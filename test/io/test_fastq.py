@@ -0,0 +1,65 @@
+import bz2
+
+import pytest
+
+from bioconvert.io.fastq import Fastq
+
+
+records = [(b"read1 first", b"ACGTN", b"II#II"),
+           (b"read2", b"", b""),
+           (b"read3", b"ACGTACGT", b"@+@+IIII")]
+
+data = b"".join(b"@%s\n%s\n+\n%s\n" % x for x in records)
+
+
+@pytest.fixture
+def fastq(tmpdir):
+    filename = tmpdir.join("test.fastq")
+    filename.write_binary(data)
+    return str(filename)
+
+
+def test_read_fastq(fastq):
+    assert list(Fastq(fastq)) == records
+    # records split across buffers
+    for block_size in (1, 2, 5, 13):
+        assert list(Fastq(fastq, block_size=block_size)) == records
+    assert [len(x) for x in Fastq(fastq).batches(2)] == [2, 1]
+
+
+def test_read_fastq_variants(tmpdir):
+    variants = [
+        # multi-line records
+        b"@read1 first\nACG\nTN\n+read1\nII\n#I\nI\n@read2\n\n+\n\n"
+        b"@read3\nACGTACGT\n+\n@+@+\nIIII\n",
+        # windows line endings, blank lines, no final end of line
+        data.replace(b"\n", b"\r\n").replace(b"\r\n@read3", b"\r\n\r\n@read3")[:-2],
+    ]
+    for variant in variants:
+        filename = tmpdir.join("variant.fastq")
+        filename.write_binary(variant)
+        for block_size in (1, 7, 1000):
+            assert list(Fastq(str(filename), block_size=block_size)) == records
+
+
+def test_read_fastq_errors(tmpdir):
+    filename = tmpdir.join("error.fastq")
+    # truncated record
+    filename.write_binary(data[:-3])
+    with pytest.raises(ValueError):
+        list(Fastq(str(filename)))
+    # multi-line records are rejected if not expected
+    filename.write_binary(b"@read1\nAC\nG\n+\nIII\n")
+    with pytest.raises(ValueError):
+        list(Fastq(str(filename), multiline=False))
+    # quality longer than the sequence
+    filename.write_binary(b"@read1\nACG\n+\nIIII\n")
+    with pytest.raises(ValueError):
+        list(Fastq(str(filename)))
+
+
+def test_read_fastq_bz2(tmpdir):
+    filename = str(tmpdir.join("test.fastq.bz2"))
+    with bz2.open(filename, "wb") as fout:
+        fout.write(data)
+    assert list(Fastq(filename, block_size=4)) == records
@@ -374,6 +374,23 @@ def test_indirect_conversion():
         converter.main()
 
 
+def test_indirect_conversion_output(tmpdir):
+    infile = bioconvert_data("ERR3295124.fastq")
+    outfile = str(tmpdir.join("out.clustal"))
+    sys.argv = ["bioconvert", "fastq2clustal", infile, outfile, "--force", "-a"]
+    converter.main()
+    assert os.path.getsize(outfile) > 0
+
+    # sequences of different lengths cannot be aligned: the last step fails
+    infile = tmpdir.join("unaligned.fastq")
+    infile.write("@read1\nACGT\n+\n!!!!\n@read2\nACG\n+\n!!!\n")
+    outfile = str(tmpdir.join("unaligned.clustal"))
+    sys.argv = ["bioconvert", "fastq2clustal", str(infile), outfile, "--force", "-a"]
+    with pytest.raises(SystemExit) as err:
+        converter.main()
+    assert err.value.code != 0
+
+
 def test_conversion_graph_error():
     import sys
     sys.argv = ["bioconvert", "--conversion-graph", "toto"]
@@ -416,3 +433,125 @@ def test_converter_benchmark():
         sys.argv = ["bioconvert", "fastq2fasta", infile, tempfile2.name, "--force", "-b"]
         converter.main()
         assert md5(tempfile1.name) == md5(tempfile2.name)
+
+
+def test_get_sub_parser_name():
+    assert converter.get_sub_parser_name(("FASTQ",), ("FASTA",)) == "fastq2fasta"
+    assert converter.get_sub_parser_name(("FASTA", "QUAL"), ("FASTQ",)) == \
+        "fasta_qual2fastq"
+
+
+def test_lazy_sub_parser(tmpdir, monkeypatch):
+    calls = []
+    add_sub_parser = converter.add_sub_parser
+
+    def record(subparsers, in_fmt, out_fmt, *args):
+        calls.append(converter.get_sub_parser_name(in_fmt, out_fmt))
+        return add_sub_parser(subparsers, in_fmt, out_fmt, *args)
+
+    monkeypatch.setattr(converter, "add_sub_parser", record)
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    outfile = str(tmpdir.join("out.fasta"))
+    converter.main(["fastq2fasta", infile, outfile, "--force"])
+    # only the sub-parser of the requested conversion is built
+    assert calls == ["fastq2fasta"]
+    assert os.path.exists(outfile)
+
+
+def test_get_jobs_and_threads():
+    assert converter.get_jobs_and_threads(4, 64, cores=64) == (4, 16)
+    assert converter.get_jobs_and_threads(0, 64, cores=64) == (64, 1)
+    assert converter.get_jobs_and_threads(4, 2, threads_set=True, cores=64) == (4, 2)
+    assert converter.get_jobs_and_threads(4, None, cores=64) == (4, None)
+    # the cores are shared between the files only
+    assert converter.get_jobs_and_threads(0, 1, cores=64, max_jobs=2) == (2, 32)
+
+
+def test_batch_jobs_few_files(monkeypatch):
+    import argparse
+    import concurrent.futures
+    monkeypatch.setenv("BIOCONVERT_CORES", "64")
+    workers = []
+
+    def executor(max_workers):
+        workers.append(max_workers)
+        return concurrent.futures.ThreadPoolExecutor(max_workers)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", executor)
+    monkeypatch.setattr(converter, "_convert_file",
+                        lambda args, filename: {"filename": filename})
+    # -j 0 with 2 files on 64 cores: 2 jobs of 32 threads
+    args = argparse.Namespace(jobs=0, threads=None)
+    filenames = ["test1.fastq", "test2.fastq"]
+    results = converter.run_batch(args, filenames)
+    assert [x["filename"] for x in results] == filenames
+    assert workers == [2]
+    assert args.threads == 32
+
+
+def test_batch_jobs(tmpdir):
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    for i in range(4):
+        tmpdir.join("test{}.fastq".format(i)).write(open(infile).read())
+    # cannot be read
+    tmpdir.mkdir("test4.fastq")
+    sys.argv = ["bioconvert", "fastq2fasta", str(tmpdir.join("test*.fastq")),
+                "--force", "--batch", "--jobs", "2"]
+    with pytest.raises(SystemExit):
+        converter.main()
+    for i in range(4):
+        assert tmpdir.join("test{}.fasta".format(i)).check()
+
+
+def test_explain(capsys):
+    import sys
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    sys.argv = ["bioconvert", "fastq2clustal", infile, "-a", "--explain"]
+    with pytest.raises(SystemExit) as err:
+        converter.main()
+    assert err.value.code == 0
+    output = capsys.readouterr().out
+    assert "path: FASTQ -> FASTA -> CLUSTAL" in output
+    assert "FASTQ2FASTA" in output and "estimated time" in output
+
+
+def test_autotune_show(tmpdir, monkeypatch, capsys):
+    from bioconvert.core import autotune
+    monkeypatch.setenv("BIOCONVERT_AUTOTUNE_PROFILE", str(tmpdir.join("autotune.json")))
+    monkeypatch.setenv("BIOCONVERT_CORES", "1")
+    key, node = autotune.get_node_type()
+    autotune.save_profile({"nodes": {key: {"node": node, "converters": {
+        "FASTQ2FASTA": {"cores": 1, "buckets": [
+            {"max_size": None, "ranking": ["awk"]}]}}}}})
+
+    monkeypatch.setenv("BIOCONVERT_CORES", "3")
+    converter.main(["autotune", "--show"])
+    output = capsys.readouterr().out
+    assert "FASTQ2FASTA" in output and "tuned with 1 cores" in output
+
+
+def test_indirect_conversion_hint(tmpdir, caplog):
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    outfile = str(tmpdir.join("out.clustal"))
+    # the implicit mode only finds direct conversions
+    with pytest.raises(SystemExit) as err:
+        converter.main([infile, outfile])
+    assert err.value.code == 1
+    assert "bioconvert fastq2clustal {} {} -a".format(infile, outfile) in caplog.text
+
+
+def test_indirect_sub_command_path(capsys):
+    from bioconvert.core.registry import get_registry
+    steps = get_registry().conversion_path(("FASTQ",), ("CLUSTAL",))
+    subcommands = converter.get_sub_command(get_registry(), "fastq2clustal",
+                                            allow_indirect=True)
+    assert subcommands == [(("FASTQ",), ("CLUSTAL",), None, steps)]
+    assert converter.get_sub_command(get_registry(), "fastq2clustal") == []
+
+    sys.argv = ["bioconvert", "fastq2clustal", bioconvert_data("ERR3295124.fastq"),
+                "-a", "--explain"]
+    with pytest.raises(SystemExit):
+        converter.main()
+    path = [steps[0][0]] + [x[1] for x in steps]
+    assert "path: {}".format(" -> ".join("_".join(x) for x in path)) in \
+        capsys.readouterr().out
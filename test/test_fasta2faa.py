@@ -2,6 +2,7 @@ from bioconvert.fasta2faa import FASTA2FAA
 from bioconvert import bioconvert_data
 from easydev import TempFile, md5
 import pytest
+import shutil
 
 
 def test_conv():
@@ -13,3 +14,20 @@ def test_conv():
         convert(method="bioconvert")
         assert md5(outfile.name) == md5(expected_outfile)
 
+
+
+def test_conv_selection(tmpdir):
+    # the input file is copied since it is indexed
+    infile = str(tmpdir.join("test.fasta"))
+    shutil.copy(bioconvert_data("test_fasta2faa.fasta"), infile)
+    with open(bioconvert_data("test_fasta2faa.faa")) as fin:
+        expected = fin.read().split(">")[1]
+
+    with TempFile(suffix=".faa") as outfile:
+        convert = FASTA2FAA(infile, outfile.name)
+        convert(method="bioconvert", names=["LinJ.28.2950"])
+        with open(outfile.name) as fin:
+            assert fin.read() == ">" + expected
+        convert(method="bioconvert", regions=["LinJ.28.2950:1-12"])
+        with open(outfile.name) as fin:
+            assert fin.read() == ">LinJ.28.2950:1-12\t\nMPWY\n"
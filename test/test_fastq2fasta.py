@@ -88,3 +88,25 @@ def test_more_samples(method):
                 outfile.name, unwrapped.name, strip_comment=True)
             assert md5(unwrapped.name) == md5out, \
                 "{} failed for {}".format(method, sample_name)
+
+
+@pytest.mark.parametrize("compression", [".gz", ".bz2"])
+def test_streaming_compression(compression):
+    # readfq is streamable: (de)compression is performed through pipes
+    import bz2
+    import gzip
+    opener = {".gz": gzip.open, ".bz2": bz2.open}[compression]
+    infile = bioconvert_data("test_fastq2fasta_v1.fastq")
+    with TempFile(suffix=".fasta") as expected, \
+            TempFile(suffix=".fastq" + compression) as compressed_in, \
+            TempFile(suffix=".fasta" + compression) as compressed_out:
+        FASTQ2FASTA(infile, expected.name)(method="readfq")
+        with open(infile, "rb") as fin, opener(compressed_in.name, "wb") as fout:
+            fout.write(fin.read())
+
+        convert = FASTQ2FASTA(compressed_in.name, compressed_out.name)
+        convert(method="readfq")
+        assert convert.infile == compressed_in.name
+        assert convert.outfile == compressed_out.name
+        with opener(compressed_out.name, "rb") as fin:
+            assert fin.read() == open(expected.name, "rb").read()